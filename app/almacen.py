@@ -0,0 +1,82 @@
+"""Almacén de archivos direccionado por contenido para las versiones de proyectos.
+
+Cada contenido distinto se guarda una sola vez en `UPLOAD_DIR/objetos/ab/cd/<sha256>`,
+aunque varios estudiantes o versiones suban el mismo archivo. La tabla
+`ArchivoContenido` lleva el recuento de referencias (ProyectoVersion que lo usan).
+
+El archivo se mueve al almacén antes del commit de la versión: si la transacción se
+deshace, el objeto queda sin fila ni referencias (huérfano). No se borra en línea
+porque otra subida puede estar usando el mismo contenido; `deduplicar_uploads.py`
+los elimina. Las versiones no se borran, así que las referencias solo crecen.
+"""
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.models import ArchivoContenido
+from app.uploads import UPLOAD_DIR, ArchivoGuardado, recibir_upload
+
+DIR_OBJETOS = UPLOAD_DIR / "objetos" if UPLOAD_DIR is not None else None
+
+
+def ruta_objeto(sha256: str) -> Path:
+    return DIR_OBJETOS / sha256[:2] / sha256[2:4] / sha256
+
+
+def es_objeto(ruta: Optional[str]) -> bool:
+    return bool(ruta) and DIR_OBJETOS is not None and Path(ruta).parent.parent.parent == DIR_OBJETOS
+
+
+def nombre_original(nombre: str) -> str:
+    """Recupera el nombre original de un archivo guardado con el esquema de nombres antiguo.
+
+    Patrones: "{id}_nombre", "{id}_v{num}_nombre" o "{id}_est{id}_v{num}_nombre".
+    """
+    m = re.match(r"^\d+(?:_est\d+)?_v\d+_(.+)$", nombre)
+    if m:
+        return m.group(1)
+    m2 = re.match(r"^(\d+)_(.+)$", nombre)
+    return m2.group(2) if m2 else nombre
+
+
+def incorporar(session, tmp: Path, sha256: str, tamano: int) -> ArchivoGuardado:
+    """Mueve el archivo temporal `tmp` al almacén (o lo descarta si el contenido ya existe)
+    y suma una referencia. No hace commit: la referencia se confirma junto con la versión.
+    """
+    destino = ruta_objeto(sha256)
+    if destino.exists():
+        os.unlink(tmp)
+    else:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, destino)
+    agregar_referencia(session, sha256, destino, tamano)
+    return ArchivoGuardado(path=destino, sha256=sha256, tamano=tamano)
+
+
+def guardar(session, origen, max_bytes: int = None) -> ArchivoGuardado:
+    """Recibe un archivo subido (file-like) y lo guarda en el almacén."""
+    DIR_OBJETOS.mkdir(parents=True, exist_ok=True)
+    recibido = recibir_upload(origen, DIR_OBJETOS, max_bytes)
+    return incorporar(session, recibido.path, recibido.sha256, recibido.tamano)
+
+
+def agregar_referencia(session, sha256: str, ruta: Path, tamano: int):
+    """Incrementa atómicamente las referencias del contenido, creando la fila si no existe."""
+    stmt = (
+        update(ArchivoContenido)
+        .where(ArchivoContenido.sha256 == sha256)
+        .values(referencias=ArchivoContenido.referencias + 1)
+    )
+    if session.exec(stmt).rowcount:
+        return
+    try:
+        with session.begin_nested():
+            session.add(ArchivoContenido(sha256=sha256, ruta=str(ruta), tamano=tamano, referencias=1))
+    except IntegrityError:
+        # Otra petición creó la fila en paralelo
+        session.exec(stmt)
+
@@ -1,17 +1,39 @@
+import os
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.cache import CacheMemoria
+from app.metrics import REGISTRO
+
 # Secret para JWT (en producción usar variable de entorno)
 SECRET_KEY = "cambiame_esta_clave_por_una_segura"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# Caché de tokens ya verificados: evita repetir la verificación HMAC en cada petición
+# de un cliente que consulta la API a menudo. Cada entrada caduca a los TOKEN_CACHE_TTL
+# segundos o al `exp` del token, lo que ocurra antes.
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "300"))
+
 # Use a pure-Python safe hashing scheme to avoid compiled bcrypt issues inside
 # slim containers. pbkdf2_sha256 is widely supported and doesn't require
 # the native bcrypt C extension.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Coste del hash (PBKDF2 iterations). Los hashes con otro número de rondas se
+# marcan para actualizar y se rehacen al iniciar sesión (ver app.hashing).
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "29000"))
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
 
 users_db = {
     # Ejemplo: usuario: {"id":1, "email":"...", "password_hash":... , "role":"estudiante"}
@@ -20,6 +42,10 @@ users_db = {
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """(coincide, hash nuevo o None si el guardado ya usa la configuración actual)."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -39,3 +65,58 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+_TOKENS_CACHE = REGISTRO.contador("auth_token_cache_total", "Bearer token lookups by cache result")
+
+# Siempre en memoria del proceso: es una caché de CPU, no hace falta compartirla
+cache_tokens = CacheMemoria(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+def decode_access_token_cached(token: str):
+    """Como decode_access_token, pero reutiliza los claims de tokens ya verificados."""
+    payload = cache_tokens.obtener(token)
+    if payload is not None:
+        _TOKENS_CACHE.inc(resultado="hit")
+        return payload
+    _TOKENS_CACHE.inc(resultado="miss")
+    payload = decode_access_token(token)
+    if payload:
+        ttl = TOKEN_CACHE_TTL
+        if isinstance(payload.get("exp"), (int, float)):
+            ttl = min(ttl, payload["exp"] - time.time())
+        cache_tokens.guardar(token, payload, ttl)
+    return payload
+
+
+class Identidad(NamedTuple):
+    """Usuario del token Bearer de la petición (todo None si no hay token válido)."""
+    rol: Optional[str] = None
+    id: Optional[int] = None
+    email: Optional[str] = None
+
+    @property
+    def estudiante_id(self) -> Optional[int]:
+        return self.id if self.rol == "estudiante" else None
+
+    @property
+    def es_profesor(self) -> bool:
+        return self.rol == "profesor"
+
+
+ANONIMO = Identidad()
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def usuario_actual(credenciales: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Identidad:
+    """Dependencia FastAPI: identidad del token Bearer, o ANONIMO si falta o no es válido.
+
+    FastAPI la resuelve una vez por petición aunque la usen varias dependencias.
+    """
+    if credenciales is None:
+        return ANONIMO
+    payload = decode_access_token_cached(credenciales.credentials)
+    if not payload:
+        return ANONIMO
+    return Identidad(rol=payload.get("role"), id=payload.get("id"), email=payload.get("sub"))
@@ -0,0 +1,265 @@
+"""Cachés de la API con backend en memoria o compartido (Redis).
+
+- `CacheMemoria`: LRU acotada con caducidad por entrada, local al proceso.
+- `CacheRedis`: mismo interfaz sobre Redis, para que varios workers (uvicorn/gunicorn)
+  vean las mismas entradas y las mismas invalidaciones. Requiere el paquete `redis`.
+
+`CACHE_BACKEND=redis` y `REDIS_URL` eligen el backend compartido; si `redis` no está
+instalado se usa la memoria del proceso. Los valores deben ser serializables en JSON.
+
+Inscripciones: el conjunto de `curso_id` de cada estudiante se guarda aquí para no
+consultar `CursoEstudiante` en cada petición (subir versión, entregar, ver proyecto).
+Solo las respuestas afirmativas se dan por buenas desde la caché: si el curso no
+aparece se vuelve a leer de la base de datos, así una inscripción reciente hecha en
+otro worker nunca deja a un estudiante fuera.
+
+Respuestas: vistas de lectura muy consultadas (cursos de un profesor, tareas de un
+curso, detalle y versiones de un proyecto) guardadas por ruta, parámetros y variante
+del llamante. Cada entrada depende de etiquetas ("curso:3", "proyecto:7"...) y su
+clave incluye la generación vigente de cada una. Al confirmar una transacción que
+escribió filas de esas entidades se descartan sus generaciones, así que las entradas
+anteriores dejan de encontrarse (también en los demás workers con Redis). Como la
+clave se calcula antes de leer la base de datos, una respuesta leída justo antes de
+un commit queda guardada con la generación vieja y nadie la vuelve a servir.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, FrozenSet, Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from app.metrics import REGISTRO
+from app.models.models import Calificacion, Curso, CursoEstudiante, Proyecto, ProyectoVersion, Tarea
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memoria")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+INSCRIPCIONES_CACHE_SIZE = int(os.environ.get("INSCRIPCIONES_CACHE_SIZE", "10000"))
+INSCRIPCIONES_CACHE_TTL = float(os.environ.get("INSCRIPCIONES_CACHE_TTL", "300"))
+RESPUESTAS_CACHE_SIZE = int(os.environ.get("RESPUESTAS_CACHE_SIZE", "5000"))
+RESPUESTAS_CACHE_TTL = float(os.environ.get("RESPUESTAS_CACHE_TTL", "60"))
+
+_CONSULTAS = REGISTRO.contador("cache_requests_total", "Cache lookups by cache name and result")
+
+
+class CacheMemoria:
+    """LRU acotada clave -> valor con caducidad por entrada (segura entre hilos)."""
+
+    def __init__(self, maximo: int, ttl: float):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira <= time.time():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave: str, valor: Any, ttl: Optional[float] = None):
+        if self.maximo <= 0:
+            return
+        expira = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def borrar(self, *claves: str):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class CacheRedis:
+    """Mismo interfaz que CacheMemoria sobre Redis (valores en JSON, caducidad con SETEX).
+
+    Si Redis no responde, la caché se comporta como vacía: la API sigue funcionando
+    contra la base de datos.
+    """
+
+    def __init__(self, cliente, prefijo: str, ttl: float):
+        self._cliente = cliente
+        self.prefijo = prefijo
+        self.ttl = ttl
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        try:
+            valor = self._cliente.get(self.prefijo + clave)
+        except Exception as e:
+            _error_redis(e)
+            return None
+        return None if valor is None else json.loads(valor)
+
+    def guardar(self, clave: str, valor: Any, ttl: Optional[float] = None):
+        try:
+            self._cliente.setex(self.prefijo + clave, max(1, int(self.ttl if ttl is None else ttl)), json.dumps(valor))
+        except Exception as e:
+            _error_redis(e)
+
+    def borrar(self, *claves: str):
+        if not claves:
+            return
+        try:
+            self._cliente.delete(*(self.prefijo + c for c in claves))
+        except Exception as e:
+            _error_redis(e)
+
+    def limpiar(self):
+        try:
+            for clave in self._cliente.scan_iter(self.prefijo + "*"):
+                self._cliente.delete(clave)
+        except Exception as e:
+            _error_redis(e)
+
+
+_ERRORES_REDIS = REGISTRO.contador("cache_redis_errors_total", "Redis operations that failed (served from the DB)")
+
+
+def _error_redis(e: Exception):
+    _ERRORES_REDIS.inc(error=type(e).__name__)
+
+
+def crear_cache(nombre: str, maximo: int, ttl: float):
+    """Backend configurado con CACHE_BACKEND para la caché `nombre`."""
+    if CACHE_BACKEND == "redis":
+        try:
+            import redis
+
+            return CacheRedis(redis.Redis.from_url(REDIS_URL), f"plataforma:{nombre}:", ttl)
+        except ImportError as e:
+            print(f"WARNING: CACHE_BACKEND=redis but redis is not installed — {e}; "
+                  f"using in-process cache for '{nombre}'", file=sys.stderr)
+    return CacheMemoria(maximo, ttl)
+
+
+# ==================== Inscripciones ====================
+inscripciones = crear_cache("inscripciones", INSCRIPCIONES_CACHE_SIZE, INSCRIPCIONES_CACHE_TTL)
+
+
+def _cargar_cursos(session, estudiante_id: int) -> FrozenSet[int]:
+    statement = select(CursoEstudiante.curso_id).where(CursoEstudiante.estudiante_id == estudiante_id)
+    cursos = frozenset(session.exec(statement).all())
+    inscripciones.guardar(str(estudiante_id), sorted(cursos))
+    return cursos
+
+
+def cursos_estudiante(session, estudiante_id: int) -> FrozenSet[int]:
+    """Cursos en los que está inscrito el estudiante (desde la caché si es posible)."""
+    cursos = inscripciones.obtener(str(estudiante_id))
+    if cursos is not None:
+        _CONSULTAS.inc(cache="inscripciones", resultado="hit")
+        return frozenset(cursos)
+    _CONSULTAS.inc(cache="inscripciones", resultado="miss")
+    return _cargar_cursos(session, estudiante_id)
+
+
+def esta_inscrito(session, estudiante_id: int, curso_id: int) -> bool:
+    if curso_id in cursos_estudiante(session, estudiante_id):
+        return True
+    # Una negativa se confirma siempre en la base de datos (ver docstring del módulo)
+    return curso_id in _cargar_cursos(session, estudiante_id)
+
+
+def invalidar_inscripciones(*estudiante_ids: int):
+    """Llamar después del commit que cambia las inscripciones de esos estudiantes."""
+    inscripciones.borrar(*(str(e) for e in estudiante_ids))
+
+
+# ==================== Respuestas ====================
+respuestas = crear_cache("respuestas", RESPUESTAS_CACHE_SIZE, RESPUESTAS_CACHE_TTL)
+# Generación vigente de cada etiqueta; dura más que las respuestas que dependen de ella
+_generaciones = crear_cache("generaciones", RESPUESTAS_CACHE_SIZE * 4, RESPUESTAS_CACHE_TTL * 10)
+
+_PENDIENTES = "cache_etiquetas_pendientes"
+
+
+def _generacion(etiqueta: str) -> str:
+    generacion = _generaciones.obtener(etiqueta)
+    if generacion is None:
+        # Etiqueta nueva, invalidada o expulsada: una generación nueva no coincide con ninguna entrada
+        generacion = uuid.uuid4().hex[:12]
+        _generaciones.guardar(etiqueta, generacion)
+    return generacion
+
+
+def buscar_respuesta(ruta: str, parametros: tuple, etiquetas: Iterable[str],
+                     variante: str = "") -> Tuple[Optional[str], Optional[dict]]:
+    """(clave, {"cuerpo", "cabeceras"} o None). Calcular la clave antes de consultar la BD."""
+    if RESPUESTAS_CACHE_SIZE <= 0:
+        return None, None
+    generaciones = ",".join(f"{e}={_generacion(e)}" for e in etiquetas)
+    clave = f"{ruta}|{variante}|{json.dumps(parametros, default=str)}|{generaciones}"
+    valor = respuestas.obtener(clave)
+    _CONSULTAS.inc(cache=f"respuestas:{ruta}", resultado="hit" if valor is not None else "miss")
+    return clave, valor
+
+
+def guardar_respuesta(clave: Optional[str], cuerpo: Any, cabeceras: Optional[dict] = None) -> Any:
+    """Guarda el cuerpo (convertido a JSON) con la clave de `buscar_respuesta` y lo devuelve."""
+    cuerpo = jsonable_encoder(cuerpo)
+    if clave is not None:
+        respuestas.guardar(clave, {"cuerpo": cuerpo, "cabeceras": cabeceras or {}})
+    return cuerpo
+
+
+def invalidar_respuestas(*etiquetas: str):
+    """Descarta la generación de las etiquetas: sus respuestas guardadas ya no se encuentran."""
+    _generaciones.borrar(*etiquetas)
+
+
+def invalidar_al_confirmar(session, *etiquetas: str):
+    """Para escrituras que no pasan por objetos del ORM (INSERT/UPDATE directos): las
+    etiquetas se invalidan cuando la sesión confirma la transacción."""
+    session.info.setdefault(_PENDIENTES, set()).update(etiquetas)
+
+
+def etiquetas_de(objeto) -> Tuple[str, ...]:
+    """Etiquetas de las respuestas cacheadas que dependen de una fila."""
+    if isinstance(objeto, Curso):
+        return (f"curso:{objeto.id}", f"profesor:{objeto.profesor_id}")
+    if isinstance(objeto, Tarea):
+        return (f"curso:{objeto.curso_id}",)
+    if isinstance(objeto, Proyecto):
+        return (f"proyecto:{objeto.id}",)
+    if isinstance(objeto, (ProyectoVersion, Calificacion)):
+        return (f"proyecto:{objeto.proyecto_id}",)
+    if isinstance(objeto, CursoEstudiante):
+        return (f"estudiante:{objeto.estudiante_id}",)
+    return ()
+
+
+@event.listens_for(Session, "after_flush")
+def _recoger_etiquetas(session, flush_context):
+    etiquetas = {e for objeto in chain(session.new, session.dirty, session.deleted) for e in etiquetas_de(objeto)}
+    if etiquetas:
+        invalidar_al_confirmar(session, *etiquetas)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_confirmadas(session):
+    # Lo recogido en una transacción revertida también se invalida en el siguiente commit:
+    # de más es inofensivo, de menos serviría datos viejos
+    etiquetas = session.info.pop(_PENDIENTES, None)
+    if etiquetas:
+        invalidar_respuestas(*etiquetas)
@@ -1,8 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import DateTime, and_, func, insert, or_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import select
-from app.models.models import Proyecto, ProyectoVersion, Calificacion
+from app.models.models import Estudiante, Profesor, Proyecto, ProyectoVersion, Calificacion, ContadorVersion
+from app.models.models import Cuenta
 from app.models.models import Curso, CursoEstudiante, Tarea
 
 
+def obtener_usuario_por_email(session, email: str) -> Optional[Tuple[str, object]]:
+    """(rol, Estudiante o Profesor) de la cuenta con ese email, en una sola consulta."""
+    statement = (
+        select(Cuenta, Estudiante, Profesor)
+        .outerjoin(Estudiante, and_(Cuenta.rol == "estudiante", Estudiante.id == Cuenta.usuario_id))
+        .outerjoin(Profesor, and_(Cuenta.rol == "profesor", Profesor.id == Cuenta.usuario_id))
+        .where(Cuenta.email == email)
+    )
+    fila = session.exec(statement).first()
+    if fila is None:
+        return None
+    cuenta, estudiante, profesor = fila
+    usuario = estudiante if cuenta.rol == "estudiante" else profesor
+    return (cuenta.rol, usuario) if usuario is not None else None
+
+
 def crear_proyecto(session, proyecto: Proyecto):
     session.add(proyecto)
     session.commit()
@@ -22,6 +47,79 @@ def obtener_versiones(session, proyecto_id: int):
     return session.exec(statement).all()
 
 
+def obtener_version(session, proyecto_id: int, version_id: int) -> Optional[ProyectoVersion]:
+    """Una versión concreta del proyecto (búsqueda por clave primaria)."""
+    statement = select(ProyectoVersion).where(
+        ProyectoVersion.id == version_id,
+        ProyectoVersion.proyecto_id == proyecto_id
+    )
+    return session.exec(statement).first()
+
+
+def obtener_version_actual(session, proyecto_id: int, estudiante_id: Optional[int] = None) -> Optional[ProyectoVersion]:
+    """La versión actual del proyecto, o la del estudiante indicado en una asignación.
+
+    Usa el índice (proyecto_id, estudiante_id, numero_version): la versión actual es la
+    de mayor número, así que basta leer la primera fila en orden descendente.
+    """
+    statement = select(ProyectoVersion).where(
+        ProyectoVersion.proyecto_id == proyecto_id,
+        ProyectoVersion.es_version_actual == True
+    )
+    if estudiante_id is not None:
+        statement = statement.where(ProyectoVersion.estudiante_id == estudiante_id)
+    statement = statement.order_by(ProyectoVersion.numero_version.desc(), ProyectoVersion.id.desc()).limit(1)
+    return session.exec(statement).first()
+
+
+# Clave de ContadorVersion para las versiones sin estudiante
+SIN_ESTUDIANTE = 0
+
+
+def siguiente_numero_version(session, proyecto_id: int, estudiante_id: Optional[int] = None) -> int:
+    """Reserva el siguiente número de versión de (proyecto, estudiante) sin commit.
+
+    Un único upsert crea el contador (a partir del mayor número ya guardado, para los
+    proyectos anteriores al contador o la primera entrega del estudiante) o le suma uno.
+    La sentencia es atómica y bloquea la fila hasta el commit, así que dos subidas
+    simultáneas se ordenan y nunca obtienen el mismo número. Hacer primero un UPDATE y
+    luego el INSERT deja en MySQL bloqueos de hueco que acaban en deadlock cuando las
+    dos peticiones intentan crear el contador a la vez.
+    """
+    clave = estudiante_id if estudiante_id is not None else SIN_ESTUDIANTE
+    maximo = select(func.coalesce(func.max(ProyectoVersion.numero_version), 0)).where(
+        ProyectoVersion.proyecto_id == proyecto_id
+    )
+    if estudiante_id is not None:
+        maximo = maximo.where(ProyectoVersion.estudiante_id == estudiante_id)
+    valores = dict(proyecto_id=proyecto_id, estudiante_id=clave, ultimo_numero=session.exec(maximo).one() + 1)
+    incremento = {"ultimo_numero": ContadorVersion.ultimo_numero + 1}
+    if session.get_bind().dialect.name == "mysql":
+        upsert = mysql_insert(ContadorVersion).values(**valores).on_duplicate_key_update(**incremento)
+    else:
+        upsert = sqlite_insert(ContadorVersion).values(**valores).on_conflict_do_update(
+            index_elements=[ContadorVersion.proyecto_id, ContadorVersion.estudiante_id], set_=incremento
+        )
+    session.exec(upsert)
+    return session.exec(select(ContadorVersion.ultimo_numero).where(
+        ContadorVersion.proyecto_id == proyecto_id, ContadorVersion.estudiante_id == clave
+    )).one()
+
+
+def desmarcar_versiones_actuales(session, proyecto_id: int, estudiante_id: Optional[int] = None):
+    """Un solo UPDATE que quita `es_version_actual` a las versiones anteriores.
+
+    Con estudiante, solo a las suyas; sin estudiante, a todas las del proyecto.
+    """
+    statement = update(ProyectoVersion).where(
+        ProyectoVersion.proyecto_id == proyecto_id,
+        ProyectoVersion.es_version_actual == True
+    )
+    if estudiante_id is not None:
+        statement = statement.where(ProyectoVersion.estudiante_id == estudiante_id)
+    session.exec(statement.values(es_version_actual=False))
+
+
 def calificar_proyecto(session, calificacion: Calificacion):
     session.add(calificacion)
     session.commit()
@@ -63,3 +161,217 @@ def crear_tarea(session, tarea: Tarea):
 def obtener_tareas_por_curso(session, curso_id: int):
     statement = select(Tarea).where(Tarea.curso_id == curso_id).order_by(Tarea.fecha_creacion.desc())
     return session.exec(statement).all()
+
+
+def filtro_proyectos_estudiante(estudiante_id: int):
+    """Condición de los proyectos visibles para un estudiante: asignados directamente
+    o de un curso en el que está inscrito (subconsulta IN, resuelta por la base de datos)."""
+    cursos_estudiante = select(CursoEstudiante.curso_id).where(CursoEstudiante.estudiante_id == estudiante_id)
+    return or_(Proyecto.estudiante_id == estudiante_id, Proyecto.curso_id.in_(cursos_estudiante))
+
+
+def sentencia_proyectos_estudiante(estudiante_id: int):
+    """Proyectos visibles para el estudiante junto con su número de versiones.
+
+    El recuento es una subconsulta correlacionada sobre el índice (proyecto_id, estudiante_id, ...):
+    en asignaciones de curso cuenta solo las entregas del estudiante; en proyectos
+    asignados directamente, todas las versiones del proyecto.
+    """
+    total_versiones = (
+        select(func.count(ProyectoVersion.id))
+        .where(
+            ProyectoVersion.proyecto_id == Proyecto.id,
+            or_(ProyectoVersion.estudiante_id == estudiante_id, Proyecto.estudiante_id == estudiante_id)
+        )
+        .correlate(Proyecto)
+        .scalar_subquery()
+        .label("total_versiones")
+    )
+    return select(Proyecto, total_versiones).where(filtro_proyectos_estudiante(estudiante_id))
+
+
+def obtener_versiones_por_proyectos(session, proyecto_ids, solo_actuales: bool = False):
+    """Versiones de varios proyectos en una sola consulta (más recientes primero).
+
+    Con `solo_actuales` devuelve únicamente la versión actual de cada estudiante.
+    """
+    if not proyecto_ids:
+        return []
+    statement = select(ProyectoVersion).where(ProyectoVersion.proyecto_id.in_(proyecto_ids))
+    if solo_actuales:
+        statement = statement.where(ProyectoVersion.es_version_actual == True)
+    statement = statement.order_by(ProyectoVersion.proyecto_id, ProyectoVersion.numero_version.desc())
+    return session.exec(statement).all()
+
+
+def obtener_estudiantes_por_ids(session, estudiante_ids):
+    """Devuelve un dict {id: Estudiante} cargado en una sola consulta."""
+    if not estudiante_ids:
+        return {}
+    statement = select(Estudiante).where(Estudiante.id.in_(estudiante_ids))
+    return {e.id: e for e in session.exec(statement).all()}
+
+
+# ==================== Inscripciones en lote ====================
+def sentencia_ids_estudiantes(estudiante_ids):
+    return select(Estudiante.id).where(Estudiante.id.in_(estudiante_ids))
+
+
+def sentencia_estudiantes_por_email(emails):
+    """(email, estudiante_id) de las cuentas de estudiante con esos emails."""
+    return select(Cuenta.email, Cuenta.usuario_id).where(Cuenta.rol == "estudiante", Cuenta.email.in_(emails))
+
+
+def sentencia_inscritos(curso_id: int, estudiante_ids):
+    return select(CursoEstudiante.estudiante_id).where(
+        CursoEstudiante.curso_id == curso_id, CursoEstudiante.estudiante_id.in_(estudiante_ids)
+    )
+
+
+def sentencia_inscribir_ignorando(curso_id: int, estudiante_ids):
+    """Un solo INSERT de varias filas que omite las inscripciones ya existentes
+    (índice único curso-estudiante): INSERT OR IGNORE en SQLite, INSERT IGNORE en MySQL."""
+    return (
+        insert(CursoEstudiante)
+        .values([{"curso_id": curso_id, "estudiante_id": e} for e in estudiante_ids])
+        .prefix_with("OR IGNORE", dialect="sqlite")
+        .prefix_with("IGNORE", dialect="mysql")
+    )
+
+
+def obtener_ultimas_calificaciones(session, proyecto_ids, estudiante_id: Optional[int] = None):
+    """Última calificación por (proyecto_id, estudiante_id) para varios proyectos.
+
+    Devuelve un dict {(proyecto_id, estudiante_id): Calificacion}. Las calificaciones
+    generales del proyecto quedan bajo la clave (proyecto_id, None). Con `estudiante_id`
+    solo se cargan las de ese estudiante y las generales.
+    """
+    if not proyecto_ids:
+        return {}
+    statement = _sentencia_ultimas_calificaciones(proyecto_ids, estudiante_id)
+    return _agrupar_ultimas_calificaciones(session.exec(statement).all())
+
+
+def _sentencia_ultimas_calificaciones(proyecto_ids, estudiante_id: Optional[int] = None):
+    filtro = Calificacion.proyecto_id.in_(proyecto_ids)
+    if estudiante_id is not None:
+        filtro = and_(filtro, or_(Calificacion.estudiante_id == estudiante_id, Calificacion.estudiante_id.is_(None)))
+    ultimas = (
+        select(
+            Calificacion.proyecto_id,
+            Calificacion.estudiante_id,
+            func.max(Calificacion.fecha_calificacion).label("fecha_max")
+        )
+        .where(filtro)
+        .group_by(Calificacion.proyecto_id, Calificacion.estudiante_id)
+        .subquery()
+    )
+    statement = (
+        select(Calificacion)
+        .join(
+            ultimas,
+            and_(
+                Calificacion.proyecto_id == ultimas.c.proyecto_id,
+                or_(
+                    Calificacion.estudiante_id == ultimas.c.estudiante_id,
+                    and_(Calificacion.estudiante_id.is_(None), ultimas.c.estudiante_id.is_(None))
+                ),
+                Calificacion.fecha_calificacion == ultimas.c.fecha_max
+            )
+        )
+        .order_by(Calificacion.id.desc())
+    )
+    return statement
+
+
+def _agrupar_ultimas_calificaciones(calificaciones):
+    resultado = {}
+    for c in calificaciones:
+        # Con fechas empatadas se conserva la de mayor id
+        resultado.setdefault((c.proyecto_id, c.estudiante_id), c)
+    return resultado
+
+
+# ==================== PAGINACIÓN (keyset) ====================
+PAGINA_POR_DEFECTO = 100
+PAGINA_MAXIMA = 500
+
+
+class Pagina(NamedTuple):
+    items: list
+    siguiente: Optional[str]
+    total: Optional[int] = None
+
+
+def codificar_cursor(valores) -> str:
+    """Cursor opaco (base64 url-safe) con los valores de ordenación de la última fila."""
+    datos = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, columnas) -> list:
+    """Inverso de `codificar_cursor`. Lanza ValueError si el cursor no es válido."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if not isinstance(datos, list) or len(datos) != len(columnas):
+        raise ValueError("Cursor inválido")
+    valores = []
+    for col, v in zip(columnas, datos):
+        if isinstance(col.type, DateTime) and v is not None:
+            v = datetime.fromisoformat(v)
+        valores.append(v)
+    return valores
+
+
+def paginar(session, statement, orden: List, limit: Optional[int] = None, after: Optional[str] = None,
+            descendente: bool = False, con_total: bool = False) -> Pagina:
+    """Paginación por cursor (keyset) sobre una sentencia `select`.
+
+    `orden` son las columnas de ordenación; la última debe ser única (normalmente el id)
+    para que el cursor sea estable. Si la sentencia selecciona varias entidades, los
+    valores del cursor se toman de la primera. Sin `limit` ni `after` no se pagina (todas
+    las filas, en el mismo orden); con `after` y sin `limit` la página es de
+    `PAGINA_POR_DEFECTO` filas.
+    """
+    limit = _limite(limit, after)
+    total = session.exec(_sentencia_total(statement)).one() if con_total else None
+    statement = _sentencia_pagina(statement, orden, limit, after, descendente)
+    return _construir_pagina(session.exec(statement).all(), statement, orden, limit, total)
+
+
+def _limite(limit: Optional[int], after: Optional[str]) -> Optional[int]:
+    if limit is None and not after:
+        return None
+    return max(1, min(limit or PAGINA_POR_DEFECTO, PAGINA_MAXIMA))
+
+
+def _sentencia_total(statement):
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+def _sentencia_pagina(statement, orden, limit, after, descendente):
+    if after:
+        valores = decodificar_cursor(after, orden)
+        condiciones = []
+        for i, (col, valor) in enumerate(zip(orden, valores)):
+            iguales = [c == v for c, v in zip(orden[:i], valores[:i])]
+            condiciones.append(and_(*iguales, col < valor if descendente else col > valor))
+        statement = statement.where(or_(*condiciones))
+    statement = statement.order_by(*[c.desc() if descendente else c.asc() for c in orden])
+    if limit is None:
+        return statement
+    # Se pide una fila de más para saber si hay página siguiente
+    return statement.limit(limit + 1)
+
+
+def _construir_pagina(filas, statement, orden, limit, total) -> Pagina:
+    siguiente = None
+    if limit is not None and len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        entidad = ultima[0] if len(statement.column_descriptions) > 1 else ultima
+        siguiente = codificar_cursor([getattr(entidad, c.key) for c in orden])
+    return Pagina(items=filas, siguiente=siguiente, total=total)
@@ -0,0 +1,76 @@
+"""Versiones asíncronas de las funciones de `crud` (para rutas `async def` con AsyncSession).
+
+Usan las mismas sentencias que `crud`; solo cambia la ejecución (`await session.exec`).
+Aquí solo están las que usa alguna ruta asíncrona.
+"""
+from typing import List, Optional
+
+from sqlmodel import select
+from app.models.models import Curso, Estudiante, ProyectoVersion
+from app.crud.crud import (
+    Pagina,
+    _agrupar_ultimas_calificaciones, _construir_pagina, _limite, _sentencia_pagina,
+    _sentencia_total, _sentencia_ultimas_calificaciones,
+    sentencia_estudiantes_por_email, sentencia_ids_estudiantes, sentencia_inscribir_ignorando, sentencia_inscritos,
+)
+
+
+async def obtener_cursos_por_profesor(session, profesor_id: int):
+    statement = select(Curso).where(Curso.profesor_id == profesor_id).order_by(Curso.fecha_creacion.desc())
+    return (await session.exec(statement)).all()
+
+
+async def obtener_versiones_por_proyectos(session, proyecto_ids):
+    if not proyecto_ids:
+        return []
+    statement = select(ProyectoVersion).where(ProyectoVersion.proyecto_id.in_(proyecto_ids)).order_by(ProyectoVersion.proyecto_id, ProyectoVersion.numero_version.desc())
+    return (await session.exec(statement)).all()
+
+
+async def obtener_estudiantes_por_ids(session, estudiante_ids):
+    if not estudiante_ids:
+        return {}
+    statement = select(Estudiante).where(Estudiante.id.in_(estudiante_ids))
+    return {e.id: e for e in (await session.exec(statement)).all()}
+
+
+async def obtener_ids_estudiantes(session, estudiante_ids) -> set:
+    """Los ids de la lista que corresponden a estudiantes existentes."""
+    if not estudiante_ids:
+        return set()
+    return set((await session.exec(sentencia_ids_estudiantes(estudiante_ids))).all())
+
+
+async def obtener_estudiantes_por_email(session, emails) -> dict:
+    """{email: estudiante_id} de los emails que son cuentas de estudiante."""
+    if not emails:
+        return {}
+    return dict((await session.exec(sentencia_estudiantes_por_email(emails))).all())
+
+
+async def obtener_inscritos(session, curso_id: int, estudiante_ids) -> set:
+    if not estudiante_ids:
+        return set()
+    return set((await session.exec(sentencia_inscritos(curso_id, estudiante_ids))).all())
+
+
+async def inscribir_ignorando(session, curso_id: int, estudiante_ids) -> int:
+    """Inserta las inscripciones (sin commit); devuelve cuántas filas se crearon."""
+    if not estudiante_ids:
+        return 0
+    return (await session.exec(sentencia_inscribir_ignorando(curso_id, estudiante_ids))).rowcount
+
+
+async def obtener_ultimas_calificaciones(session, proyecto_ids):
+    if not proyecto_ids:
+        return {}
+    filas = (await session.exec(_sentencia_ultimas_calificaciones(proyecto_ids))).all()
+    return _agrupar_ultimas_calificaciones(filas)
+
+
+async def paginar(session, statement, orden: List, limit: Optional[int] = None, after: Optional[str] = None,
+                  descendente: bool = False, con_total: bool = False) -> Pagina:
+    limit = _limite(limit, after)
+    total = (await session.exec(_sentencia_total(statement))).one() if con_total else None
+    statement = _sentencia_pagina(statement, orden, limit, after, descendente)
+    return _construir_pagina((await session.exec(statement)).all(), statement, orden, limit, total)
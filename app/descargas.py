@@ -0,0 +1,176 @@
+"""Respuestas de descarga de archivos con validadores HTTP.
+
+- ETag fuerte a partir del SHA-256 guardado (o ETag débil por fecha/tamaño si no hay hash)
+- `If-None-Match` / `If-Modified-Since` -> 304 Not Modified
+- `Range: bytes=...` (un solo rango, con `If-Range`) -> 206 Partial Content, para reanudar descargas
+- `Cache-Control` largo para contenidos inmutables (archivos de versiones)
+"""
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
+
+from app.metrics import REGISTRO
+from app.uploads import CHUNK_SIZE
+
+CACHE_INMUTABLE = "private, max-age=31536000, immutable"
+CACHE_REVALIDAR = "private, no-cache"
+
+_BYTES_DESCARGADOS = REGISTRO.contador("download_bytes_total", "Bytes served by file downloads")
+_DESCARGAS = REGISTRO.contador("downloads_total", "File download responses by status code")
+_THROUGHPUT_DESCARGA = REGISTRO.histograma(
+    "download_throughput_bytes_per_second", "Per-response file download send throughput",
+    buckets=(256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9),
+)
+
+
+def _medir_envio(respuesta: Response, tamano: int) -> Response:
+    """Mide el envío del cuerpo: la tarea de fondo de la respuesta corre al terminar de enviarlo."""
+    inicio = time.perf_counter()
+
+    def registrar():
+        duracion = time.perf_counter() - inicio
+        if tamano and duracion > 0:
+            _THROUGHPUT_DESCARGA.observe(tamano / duracion)
+
+    respuesta.background = BackgroundTask(registrar)
+    return respuesta
+
+
+def _etag_coincide(cabecera: str, etag: str) -> bool:
+    """Comparación débil (RFC 7232) para If-None-Match."""
+    if cabecera.strip() == "*":
+        return True
+    limpio = etag[2:] if etag.startswith("W/") else etag
+    for candidato in cabecera.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == limpio:
+            return True
+    return False
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _parse_range(cabecera: str, tamano: int):
+    """Devuelve (inicio, fin) inclusivo, None si la cabecera no aplica y ValueError si no es satisfacible.
+
+    Una cabecera mal formada se ignora (RFC 7233 §3.1): se sirve el archivo completo.
+    """
+    unidad, _, rangos = cabecera.partition("=")
+    if unidad.strip().lower() != "bytes" or "," in rangos:
+        # Unidades desconocidas o varios rangos: se sirve el archivo completo
+        return None
+    inicio_txt, guion, fin_txt = rangos.strip().partition("-")
+    if not guion or not (inicio_txt or fin_txt) or not (inicio_txt + fin_txt).isdigit():
+        return None
+    if inicio_txt == "":
+        sufijo = int(fin_txt)
+        if sufijo == 0:
+            raise ValueError("Rango no satisfacible")
+        return max(tamano - sufijo, 0), tamano - 1
+    inicio = int(inicio_txt)
+    fin = int(fin_txt) if fin_txt else tamano - 1
+    if fin_txt and fin < inicio:
+        return None
+    if inicio >= tamano:
+        raise ValueError("Rango no satisfacible")
+    return inicio, min(fin, tamano - 1)
+
+
+def _leer_rango(path: Path, inicio: int, fin: int):
+    with path.open("rb") as f:
+        f.seek(inicio)
+        pendiente = fin - inicio + 1
+        while pendiente > 0:
+            bloque = f.read(min(CHUNK_SIZE, pendiente))
+            if not bloque:
+                break
+            pendiente -= len(bloque)
+            yield bloque
+
+
+def respuesta_archivo(request: Request, path: Path, filename: str, media_type: str,
+                      sha256: Optional[str] = None, inmutable: bool = False,
+                      modificado: Optional[datetime] = None) -> Response:
+    """`modificado` (UTC) es la fecha de la versión servida: los objetos del almacén se
+    comparten entre versiones, así que la fecha del archivo no dice cuándo cambió la
+    representación (volver a subir un contenido antiguo no la cambia)."""
+    stat = os.stat(path)
+    tamano = stat.st_size
+    etag = f'"{sha256}"' if sha256 else f'W/"{int(stat.st_mtime_ns):x}-{tamano:x}"'
+    fecha = modificado.replace(tzinfo=timezone.utc).timestamp() if modificado else stat.st_mtime
+    cabeceras = {
+        "ETag": etag,
+        "Last-Modified": formatdate(fecha, usegmt=True),
+        "Cache-Control": CACHE_INMUTABLE if inmutable else CACHE_REVALIDAR,
+        "Accept-Ranges": "bytes",
+    }
+
+    # Peticiones condicionales: If-None-Match tiene prioridad sobre If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    no_modificado = False
+    if if_none_match is not None:
+        no_modificado = _etag_coincide(if_none_match, etag)
+    elif if_modified_since:
+        try:
+            no_modificado = int(fecha) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            no_modificado = False
+    if no_modificado:
+        _DESCARGAS.inc(status="304")
+        return Response(status_code=304, headers=cabeceras)
+
+    rango = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if rango and if_range:
+        # Solo se respeta el rango si el cliente tiene la misma representación (ETag fuerte o fecha)
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            if etag.startswith("W/") or if_range.strip() != etag:
+                rango = None
+        elif if_range.strip() != cabeceras["Last-Modified"]:
+            rango = None
+
+    if rango:
+        try:
+            limites = _parse_range(rango, tamano)
+        except ValueError:
+            _DESCARGAS.inc(status="416")
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{tamano}", **cabeceras})
+        if limites is not None:
+            inicio, fin = limites
+            longitud = fin - inicio + 1
+            _DESCARGAS.inc(status="206")
+            _BYTES_DESCARGADOS.inc(longitud)
+            return _medir_envio(StreamingResponse(
+                _leer_rango(path, inicio, fin),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **cabeceras,
+                    "Content-Range": f"bytes {inicio}-{fin}/{tamano}",
+                    "Content-Length": str(longitud),
+                    "Content-Disposition": _content_disposition(filename),
+                },
+            ), longitud)
+
+    _DESCARGAS.inc(status="200")
+    _BYTES_DESCARGADOS.inc(tamano)
+    return _medir_envio(
+        FileResponse(path, filename=filename, media_type=media_type, headers=cabeceras, stat_result=stat), tamano
+    )
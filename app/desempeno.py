@@ -0,0 +1,255 @@
+"""Agregados de desempeño por estudiante, mantenidos al escribir.
+
+- `ResumenProyectoEstudiante`: una fila por (estudiante, proyecto) con sus versiones y
+  su calificación vigente (la última propia o, si no tiene, la última general del proyecto).
+- `DesempenoAgregado`: totales por estudiante y curso; `curso_id = 0` es el total del estudiante.
+
+`registrar_version` y `registrar_calificacion` se llaman antes del commit de la versión
+o la calificación, en la misma transacción, así que el reporte de desempeño es la
+lectura de una fila. Qué proyectos cuentan para un estudiante:
+- los asignados directamente (todas las versiones del proyecto);
+- las asignaciones de curso en las que ha entregado alguna versión o tiene una
+  calificación propia (solo sus versiones).
+
+`recalcular_desempeno.py` reconstruye ambas tablas desde cero y detecta desviaciones.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from app.crud import crud
+from app.models.models import (
+    Calificacion, DesempenoAgregado, Proyecto, ProyectoVersion, ResumenProyectoEstudiante
+)
+
+NOTA_APROBACION = 3.0
+TODOS_LOS_CURSOS = 0
+# Proyectos por consulta al reconstruir (acota el tamaño de las listas IN)
+_LOTE = 1000
+
+Resumen = ResumenProyectoEstudiante
+
+
+# ==================== Mantenimiento incremental ====================
+def registrar_version(session, proyecto: Proyecto, estudiante_id):
+    """Suma la nueva versión (ya añadida a la sesión) a los resúmenes afectados."""
+    afectados = {proyecto.estudiante_id, estudiante_id} - {None}
+    for est_id in afectados:
+        stmt = (
+            update(Resumen)
+            .where(Resumen.estudiante_id == est_id, Resumen.proyecto_id == proyecto.id)
+            .values(total_versiones=Resumen.total_versiones + 1)
+        )
+        if not session.exec(stmt).rowcount and not _crear_resumen(session, est_id, proyecto):
+            session.exec(stmt)
+    for est_id in afectados:
+        actualizar_agregados(session, est_id, proyecto.curso_id)
+
+
+def registrar_calificacion(session, proyecto: Proyecto, calificacion: Calificacion):
+    """Aplica la nueva calificación (ya añadida a la sesión) a los resúmenes afectados."""
+    valores = dict(calificacion=calificacion.puntaje, fecha_calificacion=calificacion.fecha_calificacion)
+    if calificacion.estudiante_id is not None:
+        afectados = {calificacion.estudiante_id}
+        stmt = (
+            update(Resumen)
+            .where(Resumen.estudiante_id == calificacion.estudiante_id, Resumen.proyecto_id == proyecto.id)
+            .values(calificacion_propia=True, **valores)
+        )
+        if not session.exec(stmt).rowcount and not _crear_resumen(session, calificacion.estudiante_id, proyecto):
+            session.exec(stmt)
+    else:
+        # Calificación general: vale para quien no tenga una calificación propia
+        sin_propia = (Resumen.proyecto_id == proyecto.id, Resumen.calificacion_propia == False)
+        afectados = set(session.exec(select(Resumen.estudiante_id).where(*sin_propia)).all())
+        session.exec(update(Resumen).where(*sin_propia).values(**valores))
+        if proyecto.estudiante_id is not None and proyecto.estudiante_id not in afectados:
+            existe = session.get(Resumen, (proyecto.estudiante_id, proyecto.id))
+            if existe is None:
+                _crear_resumen(session, proyecto.estudiante_id, proyecto)
+                afectados.add(proyecto.estudiante_id)
+    for est_id in afectados:
+        actualizar_agregados(session, est_id, proyecto.curso_id)
+
+
+def _crear_resumen(session, estudiante_id: int, proyecto: Proyecto) -> bool:
+    """Crea el resumen calculándolo desde las tablas de origen.
+
+    Devuelve False si otra transacción lo creó a la vez (el llamador aplica su cambio encima).
+    """
+    conteo = select(func.count(ProyectoVersion.id)).where(ProyectoVersion.proyecto_id == proyecto.id)
+    if proyecto.estudiante_id != estudiante_id:
+        conteo = conteo.where(ProyectoVersion.estudiante_id == estudiante_id)
+    calificaciones = crud.obtener_ultimas_calificaciones(session, [proyecto.id], estudiante_id)
+    propia = calificaciones.get((proyecto.id, estudiante_id))
+    vigente = propia or calificaciones.get((proyecto.id, None))
+    resumen = Resumen(
+        estudiante_id=estudiante_id,
+        proyecto_id=proyecto.id,
+        curso_id=proyecto.curso_id,
+        total_versiones=session.exec(conteo).one(),
+        calificacion=vigente.puntaje if vigente else None,
+        calificacion_propia=propia is not None,
+        fecha_calificacion=vigente.fecha_calificacion if vigente else None,
+    )
+    try:
+        with session.begin_nested():
+            session.add(resumen)
+        return True
+    except IntegrityError:
+        return False
+
+
+def actualizar_agregados(session, estudiante_id: int, curso_id=None):
+    """Recalcula las filas de DesempenoAgregado del estudiante (total y curso) desde sus resúmenes."""
+    ambitos = [TODOS_LOS_CURSOS] + ([curso_id] if curso_id else [])
+    for ambito in ambitos:
+        filtro = [Resumen.estudiante_id == estudiante_id]
+        if ambito != TODOS_LOS_CURSOS:
+            filtro.append(Resumen.curso_id == ambito)
+        fila = session.exec(_sentencia_totales().where(*filtro)).one()
+        _guardar_agregado(session, estudiante_id, ambito, _totales(*fila))
+
+
+def _sentencia_totales():
+    return select(
+        func.count(),
+        func.count(Resumen.calificacion),
+        func.coalesce(func.sum(Resumen.calificacion), 0),
+        func.coalesce(func.sum(case((Resumen.calificacion >= NOTA_APROBACION, 1), else_=0)), 0),
+        func.max(Resumen.calificacion),
+        func.min(Resumen.calificacion),
+        func.coalesce(func.sum(Resumen.total_versiones), 0),
+    )
+
+
+def _totales(total, calificados, suma, aprobados, maxima, minima, versiones) -> dict:
+    return dict(
+        total_proyectos=int(total),
+        proyectos_calificados=int(calificados),
+        suma_calificaciones=float(suma),
+        proyectos_aprobados=int(aprobados),
+        calificacion_mas_alta=maxima,
+        calificacion_mas_baja=minima,
+        total_versiones=int(versiones),
+    )
+
+
+def _guardar_agregado(session, estudiante_id: int, curso_id: int, totales: dict):
+    agregado = session.get(DesempenoAgregado, (estudiante_id, curso_id))
+    if agregado is None:
+        try:
+            with session.begin_nested():
+                session.add(DesempenoAgregado(estudiante_id=estudiante_id, curso_id=curso_id, **totales))
+            return
+        except IntegrityError:
+            agregado = session.get(DesempenoAgregado, (estudiante_id, curso_id), populate_existing=True)
+    for campo, valor in totales.items():
+        setattr(agregado, campo, valor)
+    agregado.fecha_actualizacion = datetime.utcnow()
+    session.add(agregado)
+
+
+# ==================== Reconstrucción desde las tablas de origen ====================
+def calcular_resumenes(session) -> dict:
+    """Resúmenes esperados {(estudiante_id, proyecto_id): dict} calculados desde cero."""
+    proyectos = {p_id: (dueno, curso) for p_id, dueno, curso in session.exec(
+        select(Proyecto.id, Proyecto.estudiante_id, Proyecto.curso_id)
+    ).all()}
+    conteos = defaultdict(int)
+    versiones_proyecto = defaultdict(int)
+    for p_id, est_id, n in session.exec(
+        select(ProyectoVersion.proyecto_id, ProyectoVersion.estudiante_id, func.count())
+        .group_by(ProyectoVersion.proyecto_id, ProyectoVersion.estudiante_id)
+    ).all():
+        conteos[(p_id, est_id)] += n
+        versiones_proyecto[p_id] += n
+    calificaciones = {}
+    ids = sorted(proyectos)
+    for i in range(0, len(ids), _LOTE):
+        calificaciones.update(crud.obtener_ultimas_calificaciones(session, ids[i:i + _LOTE]))
+
+    pares = {(dueno, p_id) for p_id, (dueno, _) in proyectos.items() if dueno is not None}
+    pares |= {(est_id, p_id) for p_id, est_id in conteos if est_id is not None}
+    pares |= {(est_id, p_id) for p_id, est_id in calificaciones if est_id is not None}
+
+    resultado = {}
+    for est_id, p_id in pares:
+        if p_id not in proyectos:
+            continue
+        dueno, curso_id = proyectos[p_id]
+        propia = calificaciones.get((p_id, est_id))
+        vigente = propia or calificaciones.get((p_id, None))
+        resultado[(est_id, p_id)] = dict(
+            curso_id=curso_id,
+            total_versiones=versiones_proyecto[p_id] if dueno == est_id else conteos[(p_id, est_id)],
+            calificacion=vigente.puntaje if vigente else None,
+            calificacion_propia=propia is not None,
+            fecha_calificacion=vigente.fecha_calificacion if vigente else None,
+        )
+    return resultado
+
+
+def calcular_agregados(resumenes: dict) -> dict:
+    """Agregados esperados {(estudiante_id, curso_id): dict} a partir de los resúmenes."""
+    grupos = defaultdict(list)
+    for (est_id, _), r in resumenes.items():
+        grupos[(est_id, TODOS_LOS_CURSOS)].append(r)
+        if r["curso_id"]:
+            grupos[(est_id, r["curso_id"])].append(r)
+    resultado = {}
+    for clave, filas in grupos.items():
+        notas = [r["calificacion"] for r in filas if r["calificacion"] is not None]
+        resultado[clave] = _totales(
+            len(filas), len(notas), sum(notas), len([n for n in notas if n >= NOTA_APROBACION]),
+            max(notas) if notas else None, min(notas) if notas else None,
+            sum(r["total_versiones"] for r in filas),
+        )
+    return resultado
+
+
+def _distinto(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return a is None or b is None or abs(a - b) > 1e-6
+    return a != b
+
+
+def comparar(session, resumenes: dict, agregados: dict) -> list:
+    """Diferencias entre lo guardado y lo esperado, como lista de mensajes."""
+    diferencias = []
+    guardados = {(r.estudiante_id, r.proyecto_id): r for r in session.exec(select(Resumen)).all()}
+    for clave in sorted(set(guardados) | set(resumenes)):
+        esperado, actual = resumenes.get(clave), guardados.get(clave)
+        if esperado is None or actual is None:
+            diferencias.append(f"resumen {clave}: {'sobra' if esperado is None else 'falta'}")
+            continue
+        for campo, valor in esperado.items():
+            if _distinto(getattr(actual, campo), valor):
+                diferencias.append(f"resumen {clave}.{campo}: {getattr(actual, campo)!r} != {valor!r}")
+
+    guardados = {(a.estudiante_id, a.curso_id): a for a in session.exec(select(DesempenoAgregado)).all()}
+    for clave in sorted(set(guardados) | set(agregados)):
+        esperado, actual = agregados.get(clave), guardados.get(clave)
+        if esperado is None or actual is None:
+            # Un agregado vacío equivale a no tenerlo
+            if esperado is None and actual.total_proyectos == 0:
+                continue
+            diferencias.append(f"agregado {clave}: {'sobra' if esperado is None else 'falta'}")
+            continue
+        for campo, valor in esperado.items():
+            if _distinto(getattr(actual, campo), valor):
+                diferencias.append(f"agregado {clave}.{campo}: {getattr(actual, campo)!r} != {valor!r}")
+    return diferencias
+
+
+def reconstruir(session, resumenes: dict, agregados: dict):
+    """Reemplaza el contenido de ambas tablas por los valores esperados (sin commit)."""
+    session.exec(delete(DesempenoAgregado))
+    session.exec(delete(Resumen))
+    for (est_id, p_id), valores in resumenes.items():
+        session.add(Resumen(estudiante_id=est_id, proyecto_id=p_id, **valores))
+    for (est_id, curso_id), valores in agregados.items():
+        session.add(DesempenoAgregado(estudiante_id=est_id, curso_id=curso_id, **valores))
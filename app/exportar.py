@@ -0,0 +1,143 @@
+"""Exportación masiva de calificaciones y versiones en CSV o NDJSON.
+
+Las filas se leen con cursores del lado del servidor (`stream_results` + `yield_per`)
+y se serializan por lotes, de modo que la memoria usada no depende del número de
+filas. Lo usan los endpoints `/exportar/...` (motor async) y el script `exportar.py`.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.metrics import REGISTRO
+from app.models.models import Calificacion, Estudiante, Proyecto, ProyectoVersion
+
+FORMATOS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+TAMANO_LOTE = 1000
+
+_FILAS_EXPORTADAS = REGISTRO.contador("export_rows_total", "Rows streamed by CSV/NDJSON exports")
+
+
+def _filtrar(statement, fecha, profesor, curso_id, profesor_id, desde, hasta):
+    if curso_id is not None:
+        statement = statement.where(Proyecto.curso_id == curso_id)
+    if profesor_id is not None:
+        statement = statement.where(profesor == profesor_id)
+    if desde is not None:
+        statement = statement.where(fecha >= desde)
+    if hasta is not None:
+        statement = statement.where(fecha <= hasta)
+    return statement
+
+
+def sentencia_calificaciones(curso_id: Optional[int] = None, profesor_id: Optional[int] = None,
+                             desde: Optional[datetime] = None, hasta: Optional[datetime] = None):
+    statement = (
+        select(
+            Calificacion.id,
+            Calificacion.proyecto_id,
+            Proyecto.titulo.label("proyecto"),
+            Proyecto.curso_id,
+            Calificacion.profesor_id,
+            Calificacion.estudiante_id,
+            Estudiante.nombre.label("estudiante_nombre"),
+            Estudiante.apellido.label("estudiante_apellido"),
+            Estudiante.email.label("estudiante_email"),
+            Calificacion.version_id,
+            Calificacion.puntaje,
+            Calificacion.comentarios,
+            Calificacion.fecha_calificacion,
+        )
+        .join(Proyecto, Proyecto.id == Calificacion.proyecto_id)
+        .outerjoin(Estudiante, Estudiante.id == Calificacion.estudiante_id)
+        .order_by(Calificacion.id)
+    )
+    return _filtrar(statement, Calificacion.fecha_calificacion, Calificacion.profesor_id,
+                    curso_id, profesor_id, desde, hasta)
+
+
+def sentencia_versiones(curso_id: Optional[int] = None, profesor_id: Optional[int] = None,
+                        desde: Optional[datetime] = None, hasta: Optional[datetime] = None):
+    statement = (
+        select(
+            ProyectoVersion.id,
+            ProyectoVersion.proyecto_id,
+            Proyecto.titulo.label("proyecto"),
+            Proyecto.curso_id,
+            Proyecto.profesor_id,
+            ProyectoVersion.estudiante_id,
+            Estudiante.nombre.label("estudiante_nombre"),
+            Estudiante.apellido.label("estudiante_apellido"),
+            Estudiante.email.label("estudiante_email"),
+            ProyectoVersion.numero_version,
+            ProyectoVersion.es_version_actual,
+            ProyectoVersion.fecha_subida,
+            ProyectoVersion.descripcion,
+            ProyectoVersion.nombre_archivo,
+            ProyectoVersion.tamano_archivo,
+            ProyectoVersion.hash_archivo,
+        )
+        .join(Proyecto, Proyecto.id == ProyectoVersion.proyecto_id)
+        .outerjoin(Estudiante, Estudiante.id == ProyectoVersion.estudiante_id)
+        .order_by(ProyectoVersion.id)
+    )
+    return _filtrar(statement, ProyectoVersion.fecha_subida, Proyecto.profesor_id,
+                    curso_id, profesor_id, desde, hasta)
+
+
+SENTENCIAS = {"calificaciones": sentencia_calificaciones, "versiones": sentencia_versiones}
+
+
+def _valor(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def _serializador(formato: str, columnas: List[str]) -> Tuple[str, Callable[[list], str]]:
+    """Devuelve (cabecera, función que serializa un lote de filas)."""
+    if formato == "ndjson":
+        def lote_ndjson(filas):
+            return "".join(
+                json.dumps({c: _valor(v) for c, v in zip(columnas, fila)}, ensure_ascii=False) + "\n"
+                for fila in filas
+            )
+        return "", lote_ndjson
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def lote_csv(filas):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_valor(v) for v in fila] for fila in filas)
+        return buffer.getvalue()
+
+    # BOM para que Excel abra el CSV como UTF-8
+    return "\ufeff" + lote_csv([columnas]), lote_csv
+
+
+def exportar(conn, statement, formato: str) -> Iterator[str]:
+    """Versión síncrona (script de línea de comandos) sobre una Connection."""
+    columnas = list(statement.selected_columns.keys())
+    cabecera, lote = _serializador(formato, columnas)
+    if cabecera:
+        yield cabecera
+    resultado = conn.execution_options(stream_results=True, yield_per=TAMANO_LOTE).execute(statement)
+    for filas in resultado.partitions():
+        _FILAS_EXPORTADAS.inc(len(filas), formato=formato)
+        yield lote(filas)
+
+
+async def exportar_async(async_engine, statement, formato: str) -> AsyncIterator[str]:
+    """Versión para StreamingResponse: abre su propia conexión mientras dura la descarga."""
+    columnas = list(statement.selected_columns.keys())
+    cabecera, lote = _serializador(formato, columnas)
+    if cabecera:
+        yield cabecera
+    async with async_engine.connect() as conn:
+        resultado = await conn.stream(statement.execution_options(yield_per=TAMANO_LOTE))
+        async for filas in resultado.partitions():
+            _FILAS_EXPORTADAS.inc(len(filas), formato=formato)
+            yield lote(filas)
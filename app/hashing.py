@@ -0,0 +1,115 @@
+"""Hash y verificación de contraseñas en un pool de procesos acotado.
+
+PBKDF2 ocupa la CPU decenas de milisegundos por llamada; en el hilo de la petición,
+una ola de inicios de sesión bloquea al resto de la API. Aquí el cálculo se hace en
+`HASH_WORKERS` procesos dedicados y, como mucho, hay `HASH_MAX_PENDIENTES` tareas
+en cola o en curso: por encima se lanza `HashingSaturado` (la API responde 503 con
+Retry-After) en lugar de acumular peticiones que ya habrán expirado al atenderse.
+
+Con `HASH_WORKERS=0` el hash se calcula en el propio hilo (desarrollo y scripts).
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from app.auth import get_password_hash, verify_and_update_password
+from app.metrics import REGISTRO
+
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+HASH_MAX_PENDIENTES = int(os.environ.get("HASH_MAX_PENDIENTES", str(max(1, HASH_WORKERS) * 8)))
+# Tiempo máximo de espera de un resultado antes de responder 503
+HASH_TIMEOUT = float(os.environ.get("HASH_TIMEOUT", "10"))
+
+_DURACION = REGISTRO.histograma("password_hash_seconds", "Password hash/verify latency including queue wait")
+_RECHAZADOS = REGISTRO.contador("password_hash_rejected_total", "Hash requests rejected because the queue was full")
+_ACTUALIZADOS = REGISTRO.contador("password_hash_upgraded_total", "Stored hashes re-hashed on login")
+
+_pendientes = threading.BoundedSemaphore(HASH_MAX_PENDIENTES)
+_en_cola = 0
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+REGISTRO.medidor("password_hash_queue_depth", "Hash requests queued or running", lambda: _en_cola)
+
+
+class HashingSaturado(Exception):
+    pass
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: el proceso padre ya tiene hilos (servidor, pool de BD) y fork no es seguro
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def cerrar():
+    """Detiene los procesos del pool (al apagar la aplicación)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _liberar(_futuro=None):
+    global _en_cola
+    with _lock:
+        _en_cola -= 1
+    _pendientes.release()
+
+
+def _ejecutar(operacion: str, funcion, *args):
+    global _en_cola
+    if not _pendientes.acquire(blocking=False):
+        _RECHAZADOS.inc(operacion=operacion)
+        raise HashingSaturado("Demasiadas solicitudes de autenticación en curso; reintenta en unos segundos")
+    inicio = time.perf_counter()
+    with _lock:
+        _en_cola += 1
+    futuro = None
+    try:
+        if HASH_WORKERS <= 0:
+            return funcion(*args)
+        try:
+            futuro = _obtener_pool().submit(funcion, *args)
+            # El hueco se libera cuando el proceso termina, no cuando la petición deja de
+            # esperar: tras un timeout el PBKDF2 sigue ocupando la CPU y debe seguir contando
+            futuro.add_done_callback(_liberar)
+            return futuro.result(timeout=HASH_TIMEOUT)
+        except futures.TimeoutError:
+            raise HashingSaturado("El cálculo del hash de la contraseña tardó demasiado")
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. por memoria): se recrea el pool en la próxima llamada
+            cerrar()
+            raise HashingSaturado("El servicio de autenticación se está reiniciando; reintenta")
+    finally:
+        if futuro is None:
+            # Cálculo en el propio hilo, o la tarea no llegó a entrar en el pool
+            _liberar()
+        _DURACION.observe(time.perf_counter() - inicio, operacion=operacion)
+
+
+def calcular_hash(password: str) -> str:
+    return _ejecutar("hash", get_password_hash, password)
+
+
+def verificar(password: str, hash_guardado: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(coincide, hash nuevo): el hash nuevo solo viene si el guardado usa otra configuración."""
+    if not hash_guardado:
+        return False, None
+    try:
+        ok, nuevo = _ejecutar("verify", verify_and_update_password, password, hash_guardado)
+    except ValueError:
+        # Hash con un formato no reconocido
+        return False, None
+    if nuevo:
+        _ACTUALIZADOS.inc()
+    return ok, nuevo
@@ -0,0 +1,161 @@
+"""Inscripción de estudiantes en lote (importación de listas de clase).
+
+La entrada es JSON (una lista de ids/emails, u objetos con `estudiante_id` o `email`,
+o `{"estudiantes": [...]}`) o CSV (columna `estudiante_id`, `id` o `email` si hay
+cabecera; si no, la primera columna). Cada valor numérico es un id y cada valor con
+"@" es un email de una cuenta de estudiante.
+
+Todo se valida con consultas por conjuntos (ids existentes, emails, ya inscritos) en
+grupos de `_LOTE` valores y se inserta con un INSERT de varias filas que ignora las
+inscripciones ya existentes, así que el número de sentencias no depende de las filas
+sino de los grupos. El resultado informa del estado de cada fila.
+"""
+import csv
+import io
+import json
+import math
+import os
+from typing import List, Optional, Tuple, Union
+
+from app import cache
+from app.crud import crud_async
+
+INSCRIPCIONES_LOTE_MAX = int(os.environ.get("INSCRIPCIONES_LOTE_MAX", "20000"))
+# Valores por consulta IN / filas por INSERT
+_LOTE = 1000
+# Sentencias SQL de una importación del tamaño máximo (4 por grupo, más curso y commit)
+PRESUPUESTO_SQL = 4 * math.ceil(INSCRIPCIONES_LOTE_MAX / _LOTE) + 5
+
+INSCRITO = "inscrito"
+YA_INSCRITO = "ya_inscrito"
+REPETIDO = "repetido"
+NO_ENCONTRADO = "no_encontrado"
+INVALIDO = "invalido"
+
+_COLUMNAS = ("estudiante_id", "id", "email")
+
+
+class EntradaInvalida(ValueError):
+    pass
+
+
+def leer_entrada(contenido: bytes, content_type: str) -> List[str]:
+    """Valores de la petición (ids o emails como texto), en el orden recibido."""
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise EntradaInvalida("El cuerpo debe estar en UTF-8")
+    if "json" in content_type:
+        return _leer_json(texto)
+    if "csv" in content_type or "text/plain" in content_type:
+        return _leer_csv(texto)
+    raise EntradaInvalida("Content-Type debe ser application/json o text/csv")
+
+
+def _leer_json(texto: str) -> List[str]:
+    try:
+        datos = json.loads(texto)
+    except ValueError as e:
+        raise EntradaInvalida(f"JSON no válido: {e}")
+    if isinstance(datos, dict):
+        datos = datos.get("estudiantes")
+    if not isinstance(datos, list):
+        raise EntradaInvalida('Se espera una lista o {"estudiantes": [...]}')
+    valores = []
+    for item in datos:
+        if isinstance(item, dict):
+            item = item.get("estudiante_id", item.get("email"))
+        valores.append("" if item is None or isinstance(item, (bool, dict, list)) else str(item))
+    return valores
+
+
+def _leer_csv(texto: str) -> List[str]:
+    filas = [fila for fila in csv.reader(io.StringIO(texto)) if any(c.strip() for c in fila)]
+    if not filas:
+        return []
+    cabecera = [c.strip().lower() for c in filas[0]]
+    columna = next((cabecera.index(n) for n in _COLUMNAS if n in cabecera), None)
+    if columna is None:
+        columna = 0
+    else:
+        filas = filas[1:]
+    return [fila[columna] if columna < len(fila) else "" for fila in filas]
+
+
+def _clasificar(valor: str) -> Optional[Tuple[str, Union[int, str]]]:
+    valor = valor.strip()
+    if valor.isdigit():
+        return "id", int(valor)
+    if "@" in valor:
+        return "email", valor
+    return None
+
+
+def _grupos(valores) -> list:
+    valores = list(valores)
+    return [valores[i:i + _LOTE] for i in range(0, len(valores), _LOTE)]
+
+
+async def inscribir(session, curso_id: int, valores: List[str]) -> dict:
+    """Inscribe en el curso a los estudiantes de `valores` y confirma la transacción."""
+    clasificados = [_clasificar(v) for v in valores]
+    ids = {c[1] for c in clasificados if c and c[0] == "id"}
+    emails = {c[1] for c in clasificados if c and c[0] == "email"}
+
+    existentes = set()
+    for grupo in _grupos(ids):
+        existentes |= await crud_async.obtener_ids_estudiantes(session, grupo)
+    por_email = {}
+    for grupo in _grupos(emails):
+        por_email.update(await crud_async.obtener_estudiantes_por_email(session, grupo))
+
+    resueltos = []
+    for c in clasificados:
+        if c is None:
+            resueltos.append(None)
+        elif c[0] == "id":
+            resueltos.append(c[1] if c[1] in existentes else None)
+        else:
+            resueltos.append(por_email.get(c[1]))
+
+    candidatos = {e for e in resueltos if e is not None}
+    inscritos = set()
+    for grupo in _grupos(candidatos):
+        inscritos |= await crud_async.obtener_inscritos(session, curso_id, grupo)
+    nuevos = sorted(candidatos - inscritos)
+    creadas = 0
+    for grupo in _grupos(nuevos):
+        creadas += await crud_async.inscribir_ignorando(session, curso_id, grupo)
+    if nuevos:
+        # INSERT directo: el ORM no ve estas filas, las respuestas cacheadas se invalidan a mano
+        cache.invalidar_al_confirmar(session, *(f"estudiante:{e}" for e in nuevos))
+    await session.commit()
+    cache.invalidar_inscripciones(*nuevos)
+
+    filas, vistos = [], set()
+    for numero, (valor, clasificado, estudiante_id) in enumerate(zip(valores, clasificados, resueltos), start=1):
+        if clasificado is None:
+            estado = INVALIDO
+        elif estudiante_id is None:
+            estado = NO_ENCONTRADO
+        elif estudiante_id in vistos:
+            estado = REPETIDO
+        elif estudiante_id in inscritos:
+            estado = YA_INSCRITO
+        else:
+            estado = INSCRITO
+        if estudiante_id is not None:
+            vistos.add(estudiante_id)
+        filas.append({"fila": numero, "valor": valor, "estudiante_id": estudiante_id, "estado": estado})
+
+    resumen = {estado: 0 for estado in (INSCRITO, YA_INSCRITO, REPETIDO, NO_ENCONTRADO, INVALIDO)}
+    for fila in filas:
+        resumen[fila["estado"]] += 1
+    return {
+        "curso_id": curso_id,
+        "total": len(filas),
+        "resumen": resumen,
+        # Menos filas creadas que nuevas: otra petición inscribió a alguno entre la validación y el INSERT
+        "inscripciones_creadas": creadas,
+        "filas": filas,
+    }
@@ -0,0 +1,116 @@
+"""Libro de calificaciones de un curso: matriz estudiantes × asignaciones.
+
+La matriz se guarda en un `array('d')` contiguo (fila por estudiante) con NaN en las
+celdas sin calificación; las estadísticas de cada estudiante se calculan sobre su
+fila y las de cada asignación sobre la columna (slicing con paso), sin objetos por celda.
+"""
+import csv
+import io
+import math
+import statistics
+from array import array
+from typing import Dict, NamedTuple, Optional
+
+from app.desempeno import NOTA_APROBACION
+
+PERCENTILES = (25, 75, 90)
+
+
+class LibroCalificaciones(NamedTuple):
+    estudiantes: list  # Estudiante, en el orden de las filas
+    proyectos: list  # Proyecto, en el orden de las columnas
+    notas: array  # len(estudiantes) * len(proyectos), NaN = sin calificación
+
+    def fila(self, i: int) -> array:
+        n = len(self.proyectos)
+        return self.notas[i * n:(i + 1) * n]
+
+    def columna(self, j: int) -> array:
+        return self.notas[j::len(self.proyectos)] if self.proyectos else array("d")
+
+
+def construir(estudiantes: list, proyectos: list, calificaciones: Dict[tuple, object]) -> LibroCalificaciones:
+    """Arma la matriz a partir de {(proyecto_id, estudiante_id): Calificacion}.
+
+    Sin calificación propia del estudiante se usa la general del proyecto (clave con None).
+    """
+    notas = array("d", [math.nan]) * (len(estudiantes) * len(proyectos))
+    n = len(proyectos)
+    for j, proyecto in enumerate(proyectos):
+        general = calificaciones.get((proyecto.id, None))
+        for i, estudiante in enumerate(estudiantes):
+            cal = calificaciones.get((proyecto.id, estudiante.id)) or general
+            if cal is not None:
+                notas[i * n + j] = cal.puntaje
+    return LibroCalificaciones(estudiantes, proyectos, notas)
+
+
+def estadisticas(valores: array) -> dict:
+    """Media, mediana, desviación típica (poblacional), tasa de aprobación y percentiles."""
+    datos = [v for v in valores if not math.isnan(v)]
+    resultado = {"calificados": len(datos), "sin_calificar": len(valores) - len(datos)}
+    if not datos:
+        resultado.update({"media": None, "mediana": None, "desviacion": None, "tasa_aprobacion": None})
+        resultado.update({f"p{p}": None for p in PERCENTILES})
+        return resultado
+    if len(datos) > 1:
+        cortes = statistics.quantiles(datos, n=100, method="inclusive")
+        percentiles = {f"p{p}": round(cortes[p - 1], 2) for p in PERCENTILES}
+    else:
+        percentiles = {f"p{p}": datos[0] for p in PERCENTILES}
+    aprobados = sum(1 for v in datos if v >= NOTA_APROBACION)
+    resultado.update({
+        "media": round(statistics.fmean(datos), 2),
+        "mediana": round(statistics.median(datos), 2),
+        "desviacion": round(statistics.pstdev(datos), 2),
+        "tasa_aprobacion": round(aprobados / len(datos) * 100, 2),
+        **percentiles,
+    })
+    return resultado
+
+
+def _nota(valor: float) -> Optional[float]:
+    return None if math.isnan(valor) else valor
+
+
+def a_dict(libro: LibroCalificaciones) -> dict:
+    return {
+        "proyectos": [{"id": p.id, "titulo": p.titulo} for p in libro.proyectos],
+        "estudiantes": [
+            {"id": e.id, "nombre": e.nombre, "apellido": e.apellido, "email": e.email}
+            for e in libro.estudiantes
+        ],
+        # matriz[i][j]: nota del estudiante i en la asignación j (null = sin calificar)
+        "matriz": [[_nota(v) for v in libro.fila(i)] for i in range(len(libro.estudiantes))],
+        "estadisticas_proyectos": [
+            {"proyecto_id": p.id, **estadisticas(libro.columna(j))} for j, p in enumerate(libro.proyectos)
+        ],
+        "estadisticas_estudiantes": [
+            {"estudiante_id": e.id, **estadisticas(libro.fila(i))} for i, e in enumerate(libro.estudiantes)
+        ],
+    }
+
+
+def a_csv(libro: LibroCalificaciones) -> str:
+    """Una fila por estudiante con sus estadísticas y, al final, una fila por estadística de las asignaciones."""
+    nombres_estadisticas = ["media", "mediana", "desviacion", "tasa_aprobacion"] + [f"p{p}" for p in PERCENTILES]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(
+        ["estudiante_id", "apellido", "nombre", "email"]
+        + [p.titulo for p in libro.proyectos]
+        + nombres_estadisticas
+    )
+    for i, e in enumerate(libro.estudiantes):
+        fila = libro.fila(i)
+        stats = estadisticas(fila)
+        writer.writerow(
+            [e.id, e.apellido, e.nombre, e.email]
+            + ["" if math.isnan(v) else v for v in fila]
+            + ["" if stats[k] is None else stats[k] for k in nombres_estadisticas]
+        )
+    stats_proyectos = [estadisticas(libro.columna(j)) for j in range(len(libro.proyectos))]
+    for k in nombres_estadisticas:
+        writer.writerow(["", k, "", ""] + ["" if s[k] is None else s[k] for s in stats_proyectos])
+    # BOM para que Excel abra el CSV como UTF-8
+    return "\ufeff" + buffer.getvalue()
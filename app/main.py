@@ -1,27 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, Request
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import mimetypes
 import re
 import os
-import shutil
+import uuid
 from pathlib import Path
-import sys
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from app.database import init_db, get_session
+from app.database import init_db, get_session, get_async_session, engine, async_engine
 from app.models.models import (
-    Estudiante, Profesor, Proyecto, ProyectoVersion, Calificacion
+    Estudiante, Profesor, Proyecto, ProyectoVersion, Calificacion, SubidaParcial,
+    DesempenoAgregado, ResumenProyectoEstudiante, ContadorVersion, Cuenta
 )
 from app.schemas.schemas import (
-    ProyectoCreate, ProyectoResponse, CalificarDTO, CalificacionResponse, DesempenoReporte
+    ProyectoCreate, ProyectoResponse, CalificarDTO, CalificacionResponse, DesempenoReporte,
+    SubidaCreate, SubidaEstado
 )
-from app.auth import (
-    create_access_token, decode_access_token, get_password_hash, verify_password
+from app.auth import Identidad, create_access_token, usuario_actual
+from app import (
+    almacen, cache, desempeno, exportar, hashing, inscripciones, libro_calificaciones, perfil_sql, subidas, telemetria,
+)
+from app.descargas import respuesta_archivo
+from app.zip_entregas import EntradaZip, generar_zip, nombre_seguro
+from app.crud import crud, crud_async
+from app.metrics import CONTENT_TYPE_PROMETHEUS, REGISTRO
+from app.uploads import (
+    MAX_UPLOAD_BYTES, UPLOAD_DIR, ArchivoDemasiadoGrande, ArchivoGuardado, guardar_upload,
+    limitar_tamano_subida, recibir_upload
 )
-from app.crud import crud
 from app.models.models import Curso, CursoEstudiante, Tarea
 from app.schemas.schemas import CursoCreate, CursoResponse, AddStudentDTO, TareaCreate, TareaResponse
 
@@ -39,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Link", "Upload-Offset", "Server-Timing", "X-DB-Queries"],
 )
 
 # Inicializar BD
@@ -46,23 +60,141 @@ app.add_middleware(
 def on_startup():
     init_db()
 
-# Carpeta donde se guardan los archivos subidos.
-# Intentamos crearla en orden: variable env -> /tmp/uploads. Si ninguna es escribible,
-# deshabilitamos temporalmente el soporte de uploads para evitar que la app falle al importar.
-UPLOAD_DIR = None
-_preferred = os.environ.get("UPLOAD_DIR") or "./uploads"
-try:
-    p = Path(_preferred)
-    p.mkdir(parents=True, exist_ok=True)
-    UPLOAD_DIR = p
-except Exception:
+
+@app.on_event("shutdown")
+def on_shutdown():
+    hashing.cerrar()
+
+# Subidas: límite de tamaño aplicado antes de leer el cuerpo
+app.middleware("http")(limitar_tamano_subida)
+
+# Sentencias SQL y tiempo de BD por petición (Server-Timing, aviso si se excede el presupuesto)
+perfil_sql.instrumentar(engine)
+if async_engine is not None:
+    perfil_sql.instrumentar(async_engine.sync_engine)
+app.add_middleware(perfil_sql.MedirConsultasSQL)
+# Registrar una versión cuesta un número fijo de sentencias (contador, savepoints,
+# resumen de desempeño y agregados), no proporcional a los datos
+PRESUPUESTO_SQL_VERSION = 40
+
+# Peticiones, latencia por ruta y peticiones en curso (el más externo: mide toda la pila)
+app.add_middleware(telemetria.MedirPeticiones)
+
+
+def _guardar_archivo(file: UploadFile, nombre: str) -> ArchivoGuardado:
+    """Guarda un archivo subido en UPLOAD_DIR con el nombre indicado (ver app.uploads)."""
+    if UPLOAD_DIR is None:
+        raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
+    try:
+        return guardar_upload(file.file, UPLOAD_DIR / nombre)
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+def _guardar_archivo_version(session, file: UploadFile) -> ArchivoGuardado:
+    """Guarda el archivo de una versión en el almacén por contenido (ver app.almacen).
+
+    La referencia al contenido se confirma con el commit de la versión.
+    """
+    if UPLOAD_DIR is None:
+        raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
+    try:
+        return almacen.guardar(session, file.file)
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+def _verificar_permiso_version(session, proyecto: Proyecto, estudiante_id: Optional[int]):
+    """Un estudiante solo puede subir versiones a sus proyectos o a los de sus cursos."""
+    if estudiante_id is None:
+        return
+    # Caso 1: Proyecto asignado directamente al estudiante
+    if proyecto.estudiante_id == estudiante_id:
+        return
+    # Caso 2: Proyecto asignado a un curso y el estudiante está inscrito en ese curso
+    # (NO se asigna proyecto.estudiante_id: los proyectos de curso son para todos los estudiantes)
+    if proyecto.curso_id is not None and cache.esta_inscrito(session, estudiante_id, proyecto.curso_id):
+        return
+    raise HTTPException(
+        status_code=403,
+        detail="No tienes permiso para subir versiones a este proyecto. Debes estar inscrito en el curso asignado."
+    )
+
+
+def _registrar_version(session, proyecto: Proyecto, estudiante_id: Optional[int], descripcion: Optional[str],
+                       guardado: Optional[ArchivoGuardado], nombre_archivo: Optional[str]) -> ProyectoVersion:
+    """Añade una nueva versión actual del proyecto (sin commit).
+
+    Cada estudiante tiene su propia secuencia de versiones; sin estudiante (profesores u
+    otros) se numera sobre todas las versiones del proyecto. El número sale del contador
+    atómico de crud, que serializa las subidas simultáneas hasta el commit.
+    """
+    numero = crud.siguiente_numero_version(session, proyecto.id, estudiante_id)
+    crud.desmarcar_versiones_actuales(session, proyecto.id, estudiante_id)
+
+    nueva_version = ProyectoVersion(
+        proyecto_id=proyecto.id,
+        estudiante_id=estudiante_id,
+        numero_version=numero,
+        descripcion=descripcion,
+        archivo_path=str(guardado.path) if guardado else None,
+        nombre_archivo=Path(nombre_archivo).name if guardado else None,
+        tamano_archivo=guardado.tamano if guardado else None,
+        hash_archivo=guardado.sha256 if guardado else None,
+        es_version_actual=True
+    )
+    proyecto.version_actual = nueva_version.numero_version
+    session.add(nueva_version)
+    session.add(proyecto)
+    desempeno.registrar_version(session, proyecto, estudiante_id)
+    return nueva_version
+
+
+def _paginar(session, request: Request, response: Response, statement, orden, limit: int,
+             after: Optional[str], total: bool, descendente: bool = False):
+    """Aplica `crud.paginar` y expone el cursor siguiente en las cabeceras de la respuesta.
+
+    El cuerpo de los listados sigue siendo una lista; el cliente pide la página
+    siguiente con `?after=<X-Next-Cursor>`. Con `?total=true` se añade `X-Total-Count`.
+    Sin `limit` ni `after` se devuelve la lista completa, como antes de paginar.
+    """
     try:
-        p = Path("/tmp/uploads")
-        p.mkdir(parents=True, exist_ok=True)
-        UPLOAD_DIR = p
-    except Exception:
-        UPLOAD_DIR = None
-        print("WARNING: uploads disabled — cannot create upload directory.", file=sys.stderr)
+        pagina = crud.paginar(session, statement, orden, limit=limit, after=after,
+                              descendente=descendente, con_total=total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _cabeceras_paginacion(request, response, pagina)
+
+
+async def _paginar_async(session, request: Request, response: Response, statement, orden, limit: int,
+                         after: Optional[str], total: bool, descendente: bool = False):
+    """Equivalente de `_paginar` para rutas `async def` con AsyncSession."""
+    try:
+        pagina = await crud_async.paginar(session, statement, orden, limit=limit, after=after,
+                                          descendente=descendente, con_total=total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _cabeceras_paginacion(request, response, pagina)
+
+
+def _cabeceras_paginacion_guardadas(response: Response) -> dict:
+    """Cabeceras de paginación de la respuesta, para servirlas también desde la caché."""
+    return {k: response.headers[k] for k in ("X-Next-Cursor", "Link", "X-Total-Count") if k in response.headers}
+
+
+def _variante_cache(identidad: Identidad) -> str:
+    """Parte de la clave de caché que depende del llamante: cada estudiante ve su propia vista."""
+    return f"estudiante:{identidad.estudiante_id}" if identidad.estudiante_id is not None else ""
+
+
+def _cabeceras_paginacion(request: Request, response: Response, pagina: crud.Pagina):
+    if pagina.siguiente:
+        response.headers["X-Next-Cursor"] = pagina.siguiente
+        url = request.url.include_query_params(after=pagina.siguiente)
+        response.headers["Link"] = f'<{url}>; rel="next"'
+    if pagina.total is not None:
+        response.headers["X-Total-Count"] = str(pagina.total)
+    return pagina.items
 
 # ==================== RUTAS RAÍZ ====================
 @app.get("/")
@@ -79,9 +211,29 @@ def root():
         }
     }
 
+# ==================== MÉTRICAS ====================
+@app.get("/metrics")
+def metricas(request: Request, formato: Optional[str] = None):
+    """Métricas de ejecución en proceso en formato de texto de Prometheus.
+
+    Con `?formato=json` (o `Accept: application/json`) devuelve la vista JSON con
+    percentiles p50/p95/p99 estimados de cada histograma.
+    """
+    if formato == "json" or "application/json" in request.headers.get("accept", ""):
+        return REGISTRO.snapshot()
+    return Response(REGISTRO.prometheus(), media_type=CONTENT_TYPE_PROMETHEUS)
+
 # ==================== AUTENTICACIÓN ====================
+def _hash_contrasena(funcion, *args):
+    """Ejecuta una operación de app.hashing; si el pool está saturado responde 503."""
+    try:
+        return funcion(*args)
+    except hashing.HashingSaturado as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
 @app.post("/auth/registro")
-async def registro(
+def registro(
     request: Request,
     email: Optional[str] = Form(None),
     password: Optional[str] = Form(None),
@@ -112,23 +264,25 @@ async def registro(
     if not email or not password or not nombre or not apellido:
         raise HTTPException(status_code=422, detail="Faltan campos obligatorios: email, password, nombre, apellido")
 
-    # Verificar si existe
-    statement = select(Estudiante).where(Estudiante.email == email)
-    if session.exec(statement).first():
+    # Verificar si existe (estudiante o profesor): antes de calcular el hash
+    if session.get(Cuenta, email):
         raise HTTPException(status_code=400, detail="El email ya está registrado")
-    
-    if rol == "estudiante":
-        usuario = Estudiante(nombre=nombre, apellido=apellido, email=email, password_hash=get_password_hash(password))
-        session.add(usuario)
-        session.commit()
-        session.refresh(usuario)
-        return {"id": usuario.id, "email": usuario.email, "rol": "estudiante"}
-    else:
-        usuario = Profesor(nombre=nombre, apellido=apellido, email=email, password_hash=get_password_hash(password))
+
+    password_hash = _hash_contrasena(hashing.calcular_hash, password)
+    rol = "estudiante" if rol == "estudiante" else "profesor"
+    modelo = Estudiante if rol == "estudiante" else Profesor
+    usuario = modelo(nombre=nombre, apellido=apellido, email=email, password_hash=password_hash)
+    try:
         session.add(usuario)
+        session.flush()
+        # La clave primaria de Cuenta impide que dos registros simultáneos usen el mismo email
+        session.add(Cuenta(email=email, rol=rol, usuario_id=usuario.id))
         session.commit()
-        session.refresh(usuario)
-        return {"id": usuario.id, "email": usuario.email, "rol": "profesor"}
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=400, detail="El email ya está registrado")
+    session.refresh(usuario)
+    return {"id": usuario.id, "email": usuario.email, "rol": rol}
 
 @app.post("/auth/login")
 def login(email: str = Form(...), password: str = Form(...), session: Session = Depends(get_session)):
@@ -136,24 +290,20 @@ def login(email: str = Form(...), password: str = Form(...), session: Session =
     # Validar que el campo 'email' tenga formato de correo
     if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
         raise HTTPException(status_code=422, detail="El campo 'email' debe ser una dirección de correo válida")
-    # Intentamos localizar al usuario en la tabla Estudiante
-    statement = select(Estudiante).where(Estudiante.email == email)
-    user = session.exec(statement).first()
-    role = None
-
-    # Si es estudiante y la contraseña coincide, definimos role
-    if user and verify_password(password, user.password_hash or ""):
-        role = "estudiante"
-    else:
-        # Si no, buscamos en tabla Profesor
-        statement = select(Profesor).where(Profesor.email == email)
-        user = session.exec(statement).first()
-        if user and verify_password(password, user.password_hash or ""):
-            role = "profesor"
-
-    if not user or not role:
-        # No se encontró usuario válido
+    # Una lectura (Cuenta por clave primaria) da el rol y el usuario; un solo hash que verificar
+    encontrado = crud.obtener_usuario_por_email(session, email)
+    if encontrado is None:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
+    role, user = encontrado
+    ok, nuevo_hash = _hash_contrasena(hashing.verificar, password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+
+    if nuevo_hash:
+        # El hash guardado usaba otro coste (PASSWORD_HASH_ROUNDS): se reemplaza
+        user.password_hash = nuevo_hash
+        session.add(user)
+        session.commit()
 
     # Incluir role en el payload del token para que clientes/servicios lo conozcan
     token = create_access_token(data={"sub": user.email, "id": user.id, "role": role})
@@ -175,6 +325,7 @@ def login(email: str = Form(...), password: str = Form(...), session: Session =
 
 # ==================== PROYECTOS ====================
 @app.post("/proyectos", response_model=ProyectoResponse)
+@perfil_sql.presupuesto_sql(PRESUPUESTO_SQL_VERSION)
 def crear_proyecto(
     titulo: str = Form(...),
     descripcion: str = Form(...),
@@ -234,30 +385,29 @@ def crear_proyecto(
     )
 
     try:
+        # flush y no commit: si la subida falla (p. ej. 413) el rollback deshace también el proyecto
         session.add(nuevo_proyecto)
-        session.commit()
-        session.refresh(nuevo_proyecto)
+        session.flush()
 
-        archivo_path = None
+        guardado = None
         # Guardar archivo si se subió
         if file is not None:
-            if UPLOAD_DIR is None:
-                raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
-            safe_name = f"{nuevo_proyecto.id}_" + Path(file.filename).name
-            dest = UPLOAD_DIR / safe_name
-            with dest.open("wb") as out_f:
-                shutil.copyfileobj(file.file, out_f)
-            archivo_path = str(dest)
+            guardado = _guardar_archivo_version(session, file)
 
         # Crear primera versión
         primera_version = ProyectoVersion(
             proyecto_id=nuevo_proyecto.id,
             numero_version=1,
-            archivo_path=archivo_path,
+            archivo_path=str(guardado.path) if guardado else None,
+            nombre_archivo=Path(file.filename).name if guardado else None,
+            tamano_archivo=guardado.tamano if guardado else None,
+            hash_archivo=guardado.sha256 if guardado else None,
             descripcion=comentarios_version,
             es_version_actual=True
         )
         session.add(primera_version)
+        session.add(ContadorVersion(proyecto_id=nuevo_proyecto.id, ultimo_numero=1))
+        desempeno.registrar_version(session, nuevo_proyecto, None)
         session.commit()
 
         return ProyectoResponse(
@@ -273,6 +423,9 @@ def crear_proyecto(
             calificacion_actual=None,
             total_versiones=1
         )
+    except HTTPException:
+        session.rollback()
+        raise
     except Exception as e:
         # Intentar rollback y devolver un error legible
         try:
@@ -284,6 +437,7 @@ def crear_proyecto(
 
 # ==================== ASIGNACIONES (Moodle-like) ====================
 @app.post("/asignaciones", response_model=ProyectoResponse)
+@perfil_sql.presupuesto_sql(PRESUPUESTO_SQL_VERSION)
 def crear_asignacion(
     titulo: str = Form(...),
     descripcion: str = Form(...),
@@ -323,29 +477,27 @@ def crear_asignacion(
     )
 
     try:
+        # Proyecto, archivo y primera versión se confirman juntos (ver crear_proyecto)
         session.add(nuevo_proyecto)
-        session.commit()
-        session.refresh(nuevo_proyecto)
+        session.flush()
 
-        archivo_path = None
+        guardado = None
         if file is not None:
-            if UPLOAD_DIR is None:
-                raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
-            safe_name = f"{nuevo_proyecto.id}_" + Path(file.filename).name
-            dest = UPLOAD_DIR / safe_name
-            with dest.open("wb") as out_f:
-                shutil.copyfileobj(file.file, out_f)
-            archivo_path = str(dest)
+            guardado = _guardar_archivo_version(session, file)
 
         # Primera versión (sin estudiante, entrega inicial del profesor o recurso)
         primera_version = ProyectoVersion(
             proyecto_id=nuevo_proyecto.id,
             numero_version=1,
-            archivo_path=archivo_path,
+            archivo_path=str(guardado.path) if guardado else None,
+            nombre_archivo=Path(file.filename).name if guardado else None,
+            tamano_archivo=guardado.tamano if guardado else None,
+            hash_archivo=guardado.sha256 if guardado else None,
             descripcion=comentarios_version,
             es_version_actual=True
         )
         session.add(primera_version)
+        session.add(ContadorVersion(proyecto_id=nuevo_proyecto.id, ultimo_numero=1))
         session.commit()
 
         return ProyectoResponse(
@@ -360,6 +512,9 @@ def crear_asignacion(
             calificacion_actual=None,
             total_versiones=1
         )
+    except HTTPException:
+        session.rollback()
+        raise
     except Exception as e:
         try:
             session.rollback()
@@ -369,12 +524,13 @@ def crear_asignacion(
 
 
 @app.post("/asignaciones/{asignacion_id}/entregas")
+@perfil_sql.presupuesto_sql(PRESUPUESTO_SQL_VERSION)
 def entregar_asignacion(
     asignacion_id: int,
     descripcion: str = Form(...),
     file: UploadFile = File(None),
     session: Session = Depends(get_session),
-    request: Request = None
+    identidad: Identidad = Depends(usuario_actual)
 ):
     """Endpoint para que un estudiante entregue una asignación (proyecto asignado a un curso)."""
     proyecto = session.get(Proyecto, asignacion_id)
@@ -382,69 +538,66 @@ def entregar_asignacion(
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
     # Obtener estudiante autenticado desde token
-    estudiante_autenticado_id = None
-    try:
-        auth_header = None
-        if request is not None:
-            auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth_header:
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-                payload = decode_access_token(token)
-                if payload and payload.get('role') == 'estudiante':
-                    estudiante_autenticado_id = payload.get('id')
-    except Exception:
-        pass
-
+    estudiante_autenticado_id = identidad.estudiante_id
     if estudiante_autenticado_id is None:
         raise HTTPException(status_code=401, detail="Debes autenticarte como estudiante para entregar esta asignación")
 
     # Verificar inscripción en el curso
     if proyecto.curso_id is None:
         raise HTTPException(status_code=400, detail="Esta asignación no está asociada a un curso")
-    stmt_ins = select(CursoEstudiante).where(
-        CursoEstudiante.curso_id == proyecto.curso_id,
-        CursoEstudiante.estudiante_id == estudiante_autenticado_id
-    )
-    ins = session.exec(stmt_ins).first()
-    if not ins:
+    if not cache.esta_inscrito(session, estudiante_autenticado_id, proyecto.curso_id):
         raise HTTPException(status_code=403, detail="No estás inscrito en el curso asignado")
 
-    # Obtener versiones y calcular número de versión para este estudiante
-    versiones = crud.obtener_versiones(session, asignacion_id)
-    versiones_estudiante = [v for v in versiones if getattr(v, 'estudiante_id', None) == estudiante_autenticado_id]
-    for v in versiones_estudiante:
-        v.es_version_actual = False
-    numero_version_estudiante = len(versiones_estudiante) + 1
-
-    archivo_path = None
+    guardado = None
     if file is not None:
-        if UPLOAD_DIR is None:
-            raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
-        safe_name = f"{asignacion_id}_est{estudiante_autenticado_id}_v{numero_version_estudiante}_" + Path(file.filename).name
-        dest = UPLOAD_DIR / safe_name
-        with dest.open("wb") as out_f:
-            shutil.copyfileobj(file.file, out_f)
-        archivo_path = str(dest)
+        guardado = _guardar_archivo_version(session, file)
 
-    nueva_version = ProyectoVersion(
-        proyecto_id=asignacion_id,
-        estudiante_id=estudiante_autenticado_id,
-        numero_version=numero_version_estudiante,
-        descripcion=descripcion,
-        archivo_path=archivo_path,
-        es_version_actual=True
+    # Nueva versión en la secuencia de este estudiante
+    nueva_version = _registrar_version(
+        session, proyecto, estudiante_autenticado_id, descripcion, guardado, file.filename if file else None
     )
-    proyecto.version_actual = nueva_version.numero_version
-    session.add(nueva_version)
-    session.add(proyecto)
     session.commit()
     session.refresh(nueva_version)
 
     return {"id": nueva_version.id, "numero_version": nueva_version.numero_version, "fecha": nueva_version.fecha_subida}
 
 
+def _info_estudiante(estudiante: Estudiante) -> dict:
+    return {
+        "id": estudiante.id,
+        "nombre": estudiante.nombre,
+        "apellido": estudiante.apellido,
+        "email": estudiante.email,
+        "nombre_completo": f"{estudiante.nombre} {estudiante.apellido}"
+    }
+
+
+def _info_version(v: ProyectoVersion) -> dict:
+    return {
+        "id": v.id,
+        "numero_version": v.numero_version,
+        "descripcion": v.descripcion,
+        "fecha_subida": v.fecha_subida,
+        "es_version_actual": v.es_version_actual,
+        "tiene_archivo": v.archivo_path is not None
+    }
+
+
+def _entregas_por_estudiante(session, versiones: List[ProyectoVersion]) -> List[dict]:
+    """Agrupa las versiones por estudiante (en orden de aparición); los estudiantes se cargan en una consulta."""
+    versiones_por_estudiante = {}
+    for v in versiones:
+        versiones_por_estudiante.setdefault(v.estudiante_id, []).append(v)
+    estudiantes = crud.obtener_estudiantes_por_ids(session, [e for e in versiones_por_estudiante if e])
+    return [
+        {
+            "estudiante": _info_estudiante(estudiantes[est_id]) if est_id in estudiantes else None,
+            "versiones": [_info_version(v) for v in vers]
+        }
+        for est_id, vers in versiones_por_estudiante.items()
+    ]
+
+
 @app.get("/asignaciones/{asignacion_id}/entregas")
 def obtener_entregas_asignacion(asignacion_id: int, session: Session = Depends(get_session)):
     """Obtener todas las entregas de una asignación, agrupadas por estudiante."""
@@ -453,47 +606,34 @@ def obtener_entregas_asignacion(asignacion_id: int, session: Session = Depends(g
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
     versiones = crud.obtener_versiones(session, asignacion_id)
-    # Agrupar por estudiante
-    versiones_por_estudiante = {}
-    for v in versiones:
-        est_id = getattr(v, 'estudiante_id', None)
-        if est_id not in versiones_por_estudiante:
-            versiones_por_estudiante[est_id] = []
-        versiones_por_estudiante[est_id].append(v)
-
-    entregas = []
-    for est_id, vers in versiones_por_estudiante.items():
-        estudiante_info = None
-        if est_id is not None:
-            estudiante = session.get(Estudiante, est_id)
-            if estudiante:
-                estudiante_info = {
-                    "id": estudiante.id,
-                    "nombre": estudiante.nombre,
-                    "apellido": estudiante.apellido,
-                    "email": estudiante.email,
-                    "nombre_completo": f"{estudiante.nombre} {estudiante.apellido}"
-                }
-        entregas.append({
-            "estudiante": estudiante_info,
-            "versiones": [
-                {
-                    "id": v.id,
-                    "numero_version": v.numero_version,
-                    "descripcion": v.descripcion,
-                    "fecha_subida": v.fecha_subida,
-                    "es_version_actual": v.es_version_actual,
-                    "tiene_archivo": v.archivo_path is not None
-                }
-                for v in vers
-            ]
-        })
+    entregas = _entregas_por_estudiante(session, versiones)
 
     return {"proyecto_id": proyecto.id, "titulo": proyecto.titulo, "entregas_por_estudiante": entregas}
 
+
+@app.get("/asignaciones/{asignacion_id}/entregas/zip")
+def descargar_entregas_asignacion_zip(asignacion_id: int, todas: bool = False, session: Session = Depends(get_session)):
+    """Descargar en un ZIP las entregas de una asignación (una carpeta por estudiante).
+
+    Incluye la versión actual de cada estudiante, o todas con `?todas=true`, y un
+    `manifiesto.csv` con las calificaciones. El ZIP se genera mientras se descarga.
+    """
+    proyecto = session.get(Proyecto, asignacion_id)
+    if not proyecto:
+        raise HTTPException(status_code=404, detail="Asignación no encontrada")
+    return _respuesta_zip_entregas(session, [proyecto], todas, f"asignacion_{asignacion_id}_entregas.zip")
+
 @app.get("/proyectos/{proyecto_id}", response_model=ProyectoResponse)
-def obtener_proyecto(proyecto_id: int, session: Session = Depends(get_session), request: Request = None):
+def obtener_proyecto(proyecto_id: int, session: Session = Depends(get_session),
+                     identidad: Identidad = Depends(usuario_actual)):
     """Obtener detalle de un proyecto"""
+    # La bandera es_estudiante_asignado depende del estudiante que consulta (y de sus inscripciones)
+    est_id = identidad.estudiante_id
+    etiquetas = [f"proyecto:{proyecto_id}"] + ([f"estudiante:{est_id}"] if est_id is not None else [])
+    clave, cacheada = cache.buscar_respuesta("proyecto", (proyecto_id,), etiquetas, _variante_cache(identidad))
+    if cacheada is not None:
+        return cacheada["cuerpo"]
+
     proyecto = session.get(Proyecto, proyecto_id)
     if not proyecto:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
@@ -504,43 +644,15 @@ def obtener_proyecto(proyecto_id: int, session: Session = Depends(get_session),
     # asignado a este proyecto. Devolver la bandera en la respuesta para que el
     # cliente pueda mostrar u ocultar controles (ej. subir versión).
     es_asignado = None
-    try:
-        auth_header = None
-        if request is not None:
-            auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth_header:
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-                payload = decode_access_token(token)
-                print(f"[DEBUG] GET /proyectos/{proyecto_id} - Token payload: {payload}")
-                if payload and payload.get('role') == 'estudiante':
-                    est_id = payload.get('id')
-                    print(f"[DEBUG] Estudiante ID: {est_id}, proyecto.curso_id: {proyecto.curso_id}, proyecto.estudiante_id: {proyecto.estudiante_id}")
-                    if est_id is not None:
-                        # Caso 1: Proyecto asignado a curso - verificar inscripción
-                        if proyecto.curso_id is not None:
-                            stmt = select(CursoEstudiante).where(
-                                CursoEstudiante.curso_id == proyecto.curso_id, 
-                                CursoEstudiante.estudiante_id == est_id
-                            )
-                            enlace = session.exec(stmt).first()
-                            es_asignado = enlace is not None
-                            print(f"[DEBUG] Inscripción en curso {proyecto.curso_id}: {es_asignado}")
-                        # Caso 2: Proyecto asignado directamente al estudiante
-                        elif proyecto.estudiante_id is not None and proyecto.estudiante_id == est_id:
-                            es_asignado = True
-                            print(f"[DEBUG] Proyecto asignado directamente: True")
-                        else:
-                            es_asignado = False
-                            print(f"[DEBUG] No asignado (no curso ni estudiante_id)")
-    except Exception as e:
-        print(f"[DEBUG] Error determinando asignación: {e}")
-        es_asignado = None
-
-    print(f"[DEBUG] VALOR FINAL es_asignado antes de responder: {es_asignado}")
-    
-    response = ProyectoResponse(
+    if est_id is not None:
+        # Caso 1: Proyecto asignado a curso - verificar inscripción
+        if proyecto.curso_id is not None:
+            es_asignado = cache.esta_inscrito(session, est_id, proyecto.curso_id)
+        # Caso 2: Proyecto asignado directamente al estudiante
+        else:
+            es_asignado = proyecto.estudiante_id is not None and proyecto.estudiante_id == est_id
+
+    return cache.guardar_respuesta(clave, ProyectoResponse(
         id=proyecto.id,
         titulo=proyecto.titulo,
         descripcion=proyecto.descripcion,
@@ -553,54 +665,113 @@ def obtener_proyecto(proyecto_id: int, session: Session = Depends(get_session),
         calificacion_actual=proyecto.calificacion_actual,
         total_versiones=len(versiones),
         es_estudiante_asignado=es_asignado
+    ))
+
+
+def _nombre_descarga(version: ProyectoVersion, path: Path) -> str:
+    """Nombre original del archivo de una versión."""
+    if version.nombre_archivo:
+        return version.nombre_archivo
+    return almacen.nombre_original(path.name)
+
+
+def _respuesta_zip_entregas(session, proyectos: List[Proyecto], todas: bool, nombre_zip: str,
+                            carpeta_por_proyecto: bool = False) -> StreamingResponse:
+    """ZIP con los archivos de las versiones de `proyectos`, una carpeta por estudiante.
+
+    Por defecto incluye solo la versión actual de cada estudiante (`todas=True` para el
+    historial completo). Incluye `manifiesto.csv` con la última calificación de cada entrega.
+    Los metadatos se cargan en cuatro consultas antes de empezar a enviar el ZIP.
+    """
+    proyecto_ids = [p.id for p in proyectos]
+    titulos = {p.id: p.titulo for p in proyectos}
+    versiones = crud.obtener_versiones_por_proyectos(session, proyecto_ids, solo_actuales=not todas)
+    estudiantes = crud.obtener_estudiantes_por_ids(
+        session, {v.estudiante_id for v in versiones if v.estudiante_id is not None}
+    )
+    calificaciones = crud.obtener_ultimas_calificaciones(session, proyecto_ids)
+
+    entradas = []
+    for v in versiones:
+        est = estudiantes.get(v.estudiante_id)
+        carpeta = nombre_seguro(f"{est.apellido}_{est.nombre}_{est.id}") if est else "sin_estudiante"
+        if carpeta_por_proyecto:
+            carpeta = f"{nombre_seguro(f'{v.proyecto_id}_{titulos[v.proyecto_id]}')}/{carpeta}"
+        origen = Path(v.archivo_path) if v.archivo_path else None
+        ruta_zip = f"{carpeta}/v{v.numero_version}_{nombre_seguro(_nombre_descarga(v, origen), 150)}" if origen else ""
+        # Sin calificación propia del estudiante se usa la general del proyecto
+        cal = calificaciones.get((v.proyecto_id, v.estudiante_id)) or calificaciones.get((v.proyecto_id, None))
+        entradas.append(EntradaZip(ruta_zip, origen, {
+            "proyecto_id": v.proyecto_id,
+            "proyecto": titulos[v.proyecto_id],
+            "estudiante_id": v.estudiante_id,
+            "estudiante": f"{est.nombre} {est.apellido}" if est else "",
+            "email": est.email if est else "",
+            "version_id": v.id,
+            "numero_version": v.numero_version,
+            "es_version_actual": v.es_version_actual,
+            "fecha_subida": v.fecha_subida.isoformat() if v.fecha_subida else "",
+            "archivo_zip": ruta_zip,
+            "tamano": v.tamano_archivo,
+            "sha256": v.hash_archivo,
+            "calificacion": cal.puntaje if cal else "",
+            "comentarios": cal.comentarios if cal else "",
+        }))
+    entradas.sort(key=lambda e: (e.fila["proyecto_id"], e.ruta_zip))
+
+    return StreamingResponse(
+        generar_zip(entradas),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{nombre_zip}"'}
     )
-    
-    print(f"[DEBUG] Respuesta serializada: es_estudiante_asignado={response.es_estudiante_asignado}")
-    
-    return response
 
 
 @app.get("/proyectos/{proyecto_id}/archivo")
-def descargar_proyecto(proyecto_id: int, session: Session = Depends(get_session)):
-    """Descargar el archivo de la versión actual de un proyecto."""
+def descargar_proyecto(
+    proyecto_id: int,
+    request: Request,
+    estudiante_id: Optional[int] = None,
+    session: Session = Depends(get_session)
+):
+    """Descargar el archivo de la versión actual de un proyecto.
+
+    En asignaciones cada estudiante tiene su propia versión actual: `estudiante_id`
+    selecciona la de ese estudiante. Soporta ETag/If-None-Match, If-Modified-Since
+    y Range (ver app.descargas).
+    """
     proyecto = session.get(Proyecto, proyecto_id)
     if not proyecto:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
 
-    versiones = crud.obtener_versiones(session, proyecto_id)
-    if not versiones:
+    current = crud.obtener_version_actual(session, proyecto_id, estudiante_id)
+    if not current:
         raise HTTPException(status_code=404, detail="No hay versiones para este proyecto")
-
-    current = next((v for v in versiones if v.es_version_actual), None)
-    if not current or not current.archivo_path:
+    if not current.archivo_path:
         raise HTTPException(status_code=404, detail="No hay archivo asociado a la versión actual")
 
     path = Path(current.archivo_path)
     if not path.exists():
         raise HTTPException(status_code=404, detail="Archivo no encontrado en el servidor")
 
-    mime = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
-    # Intentamos recuperar el nombre original si el archivo fue guardado con prefijo
-    name = path.name
-    # patrones: "{id}_originalname" o "{id}_v{num}_originalname"
-    m = re.match(r"^\d+_v\d+_(.+)$", name)
-    if m:
-        display_name = m.group(1)
-    else:
-        m2 = re.match(r"^(\d+)_(.+)$", name)
-        display_name = m2.group(2) if m2 else name
-    return FileResponse(path, filename=display_name, media_type=mime)
+    display_name = _nombre_descarga(current, path)
+    mime = mimetypes.guess_type(display_name)[0] or "application/octet-stream"
+    # La versión actual cambia con cada entrega: el cliente debe revalidar (304 si no cambió)
+    return respuesta_archivo(request, path, display_name, mime, sha256=current.hash_archivo,
+                             modificado=current.fecha_subida)
 
 
 @app.get("/proyectos/{proyecto_id}/versiones/{version_id}/archivo")
-def descargar_version_archivo(proyecto_id: int, version_id: int, session: Session = Depends(get_session)):
-    """Descargar el archivo de una versión específica de un proyecto."""
+def descargar_version_archivo(proyecto_id: int, version_id: int, request: Request,
+                              session: Session = Depends(get_session)):
+    """Descargar el archivo de una versión específica de un proyecto.
+
+    Los archivos de una versión no cambian nunca, así que se sirven con caché de larga duración.
+    """
     proyecto = session.get(Proyecto, proyecto_id)
     if not proyecto:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
 
-    versiones = crud.obtener_versiones(session, proyecto_id)
-    version = next((v for v in versiones if v.id == version_id), None)
+    version = crud.obtener_version(session, proyecto_id, version_id)
     if not version or not version.archivo_path:
         raise HTTPException(status_code=404, detail="Versión o archivo no encontrado")
 
@@ -608,43 +779,61 @@ def descargar_version_archivo(proyecto_id: int, version_id: int, session: Sessio
     if not path.exists():
         raise HTTPException(status_code=404, detail="Archivo no encontrado en el servidor")
 
-    mime = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
-    name = path.name
-    m = re.match(r"^\d+_v\d+_(.+)$", name)
-    if m:
-        display_name = m.group(1)
-    else:
-        m2 = re.match(r"^(\d+)_(.+)$", name)
-        display_name = m2.group(2) if m2 else name
-    return FileResponse(path, filename=display_name, media_type=mime)
+    display_name = _nombre_descarga(version, path)
+    mime = mimetypes.guess_type(display_name)[0] or "application/octet-stream"
+    return respuesta_archivo(request, path, display_name, mime, sha256=version.hash_archivo, inmutable=True,
+                             modificado=version.fecha_subida)
 
 @app.get("/proyectos/estudiante/{estudiante_id}")
-def obtener_proyectos_estudiante(estudiante_id: int, session: Session = Depends(get_session)):
-    """Listar todos los proyectos de un estudiante"""
-    # Proyectos directamente asignados al estudiante
-    stmt_direct = select(Proyecto).where(Proyecto.estudiante_id == estudiante_id)
-    proyectos_direct = session.exec(stmt_direct).all()
-
-    # Proyectos asignados a cursos donde el estudiante está inscrito
-    stmt_cursos = select(CursoEstudiante).where(CursoEstudiante.estudiante_id == estudiante_id)
-    cursos_enlace = session.exec(stmt_cursos).all()
-    curso_ids = [c.curso_id for c in cursos_enlace]
-    proyectos_curso = []
-    if curso_ids:
-        stmt_c = select(Proyecto).where(Proyecto.curso_id.in_(curso_ids))
-        proyectos_curso = session.exec(stmt_c).all()
-
-    proyectos = proyectos_direct + [p for p in proyectos_curso if p not in proyectos_direct]
-    if not proyectos:
+def obtener_proyectos_estudiante(
+    estudiante_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: Session = Depends(get_session)
+):
+    """Listar todos los proyectos de un estudiante (paginado por cursor).
+
+    Cada proyecto incluye `total_versiones` (entregas del estudiante) y `calificacion`
+    (su última calificación, o la general del proyecto). Dos consultas por página.
+    """
+    # Proyectos directamente asignados al estudiante o a cursos donde está inscrito
+    statement = crud.sentencia_proyectos_estudiante(estudiante_id)
+    filas = _paginar(session, request, response, statement, [Proyecto.id], limit, after, total)
+    if not filas and not after:
         raise HTTPException(status_code=404, detail="No hay proyectos para este estudiante")
-    return proyectos
+
+    calificaciones = crud.obtener_ultimas_calificaciones(session, [p.id for p, _ in filas], estudiante_id)
+    resultado = []
+    for proyecto, total_versiones in filas:
+        cal = calificaciones.get((proyecto.id, estudiante_id)) or calificaciones.get((proyecto.id, None))
+        resultado.append({
+            **proyecto.dict(),
+            "total_versiones": total_versiones,
+            "calificacion": {
+                "puntaje": cal.puntaje,
+                "comentarios": cal.comentarios,
+                "fecha": cal.fecha_calificacion
+            } if cal else None
+        })
+    return resultado
 
 @app.get("/proyectos/profesor/{profesor_id}")
-def obtener_proyectos_profesor(profesor_id: int, session: Session = Depends(get_session)):
-    """Listar todos los proyectos asignados a un profesor"""
+def obtener_proyectos_profesor(
+    profesor_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: Session = Depends(get_session)
+):
+    """Listar todos los proyectos asignados a un profesor (paginado por cursor)"""
     statement = select(Proyecto).where(Proyecto.profesor_id == profesor_id)
-    proyectos = session.exec(statement).all()
-    if not proyectos:
+    proyectos = _paginar(session, request, response, statement, [Proyecto.id], limit, after, total)
+    if not proyectos and not after:
         raise HTTPException(status_code=404, detail="No hay proyectos para este profesor")
     return proyectos
 
@@ -706,17 +895,18 @@ def agregar_estudiante_curso(curso_id: int, dto: AddStudentDTO, session: Session
     enlace = CursoEstudiante(curso_id=curso_id, estudiante_id=dto.estudiante_id)
     try:
         creado = crud.agregar_estudiante_a_curso(session, enlace)
+        cache.invalidar_inscripciones(creado.estudiante_id)
         
         # Contar proyectos existentes en el curso
-        stmt_proyectos = select(Proyecto).where(Proyecto.curso_id == curso_id)
-        proyectos_curso = session.exec(stmt_proyectos).all()
+        stmt_proyectos = select(func.count()).select_from(Proyecto).where(Proyecto.curso_id == curso_id)
+        proyectos_curso = session.exec(stmt_proyectos).one()
         
         return {
             "id": creado.id, 
             "curso_id": creado.curso_id, 
             "estudiante_id": creado.estudiante_id,
-            "proyectos_asignados": len(proyectos_curso),
-            "mensaje": f"Estudiante inscrito correctamente. Tiene acceso a {len(proyectos_curso)} proyecto(s) del curso."
+            "proyectos_asignados": proyectos_curso,
+            "mensaje": f"Estudiante inscrito correctamente. Tiene acceso a {proyectos_curso} proyecto(s) del curso."
         }
     except Exception as e:
         try:
@@ -726,39 +916,79 @@ def agregar_estudiante_curso(curso_id: int, dto: AddStudentDTO, session: Session
         raise HTTPException(status_code=500, detail=f"Error al agregar estudiante al curso: {str(e)}")
 
 
+@app.post("/cursos/{curso_id}/estudiantes/lote")
+@perfil_sql.presupuesto_sql(inscripciones.PRESUPUESTO_SQL)
+async def inscribir_estudiantes_lote(curso_id: int, request: Request,
+                                     session: AsyncSession = Depends(get_async_session)):
+    """Inscribir muchos estudiantes a la vez (importación de la lista de clase).
+
+    Cuerpo `application/json` o `text/csv` con ids de estudiante o emails (ver
+    app.inscripciones). Los que ya estaban inscritos no son un error: la respuesta
+    resume el estado de cada fila (inscrito, ya_inscrito, repetido, no_encontrado, invalido).
+    """
+    curso = await session.get(Curso, curso_id)
+    if not curso:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    try:
+        valores = inscripciones.leer_entrada(await request.body(), request.headers.get("content-type", ""))
+    except inscripciones.EntradaInvalida as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if len(valores) > inscripciones.INSCRIPCIONES_LOTE_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Demasiadas filas ({len(valores)}); el máximo por petición es {inscripciones.INSCRIPCIONES_LOTE_MAX}"
+        )
+    return await inscripciones.inscribir(session, curso_id, valores)
+
+
 @app.get("/cursos/{curso_id}/estudiantes")
-def listar_estudiantes_curso(curso_id: int, session: Session = Depends(get_session)):
-    """Listar estudiantes inscritos en un curso."""
+def listar_estudiantes_curso(
+    curso_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: Session = Depends(get_session)
+):
+    """Listar estudiantes inscritos en un curso (paginado por cursor, en orden de inscripción)."""
     curso = session.get(Curso, curso_id)
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
 
-    # Obtener enlaces curso-estudiante
-    stmt = select(CursoEstudiante).where(CursoEstudiante.curso_id == curso_id)
-    enlaces = session.exec(stmt).all()
-
-    estudiantes = []
-    for e in enlaces:
-        est = session.get(Estudiante, e.estudiante_id)
-        if est:
-            estudiantes.append({
-                "estudiante_id": est.id,
-                "nombre": est.nombre,
-                "apellido": est.apellido,
-                "email": est.email
-            })
+    # Enlaces curso-estudiante junto con el estudiante en una sola consulta
+    stmt = (
+        select(CursoEstudiante, Estudiante)
+        .join(Estudiante, Estudiante.id == CursoEstudiante.estudiante_id)
+        .where(CursoEstudiante.curso_id == curso_id)
+    )
+    filas = _paginar(session, request, response, stmt, [CursoEstudiante.id], limit, after, total)
 
-    return estudiantes
+    return [
+        {
+            "estudiante_id": est.id,
+            "nombre": est.nombre,
+            "apellido": est.apellido,
+            "email": est.email
+        }
+        for _, est in filas
+    ]
 
 
 @app.get("/cursos/profesor/{profesor_id}")
-def listar_cursos_profesor(profesor_id: int, session: Session = Depends(get_session)):
+async def listar_cursos_profesor(profesor_id: int, session: AsyncSession = Depends(get_async_session)):
     """Listar cursos de un profesor"""
-    profesor = session.get(Profesor, profesor_id)
+    # El caché es Redis síncrono: en el threadpool para no bloquear el event loop
+    clave, cacheada = await run_in_threadpool(
+        cache.buscar_respuesta, "cursos_profesor", (profesor_id,), [f"profesor:{profesor_id}"]
+    )
+    if cacheada is not None:
+        return cacheada["cuerpo"]
+    profesor = await session.get(Profesor, profesor_id)
     if not profesor:
         raise HTTPException(status_code=404, detail="Profesor no encontrado")
-    cursos = crud.obtener_cursos_por_profesor(session, profesor_id)
-    return [
+    cursos = await crud_async.obtener_cursos_por_profesor(session, profesor_id)
+    return await run_in_threadpool(cache.guardar_respuesta, clave, [
         {
             "id": c.id,
             "nombre": c.nombre,
@@ -767,7 +997,7 @@ def listar_cursos_profesor(profesor_id: int, session: Session = Depends(get_sess
             "fecha_creacion": c.fecha_creacion
         }
         for c in cursos
-    ]
+    ])
 
 
 @app.post("/cursos/{curso_id}/tareas", response_model=TareaResponse)
@@ -793,14 +1023,10 @@ def crear_tarea_curso(
 
     archivo_path = None
     if file is not None:
-        if UPLOAD_DIR is None:
-            raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
-        safe_name = f"curso{curso_id}_tarea_{file.filename}"
-        dest = UPLOAD_DIR / safe_name
         try:
-            with dest.open("wb") as out_f:
-                shutil.copyfileobj(file.file, out_f)
-            archivo_path = str(dest)
+            archivo_path = str(_guardar_archivo(file, f"curso{curso_id}_tarea_" + Path(file.filename).name).path)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error al guardar archivo: {str(e)}")
 
@@ -831,12 +1057,28 @@ def crear_tarea_curso(
 
 
 @app.get("/cursos/{curso_id}/tareas")
-def listar_tareas_curso(curso_id: int, session: Session = Depends(get_session)):
-    curso = session.get(Curso, curso_id)
+async def listar_tareas_curso(
+    curso_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: AsyncSession = Depends(get_async_session)
+):
+    clave, cacheada = await run_in_threadpool(
+        cache.buscar_respuesta, "tareas_curso", (curso_id, limit, after, total), [f"curso:{curso_id}"]
+    )
+    if cacheada is not None:
+        response.headers.update(cacheada["cabeceras"])
+        return cacheada["cuerpo"]
+    curso = await session.get(Curso, curso_id)
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
-    tareas = crud.obtener_tareas_por_curso(session, curso_id)
-    return [
+    statement = select(Tarea).where(Tarea.curso_id == curso_id)
+    tareas = await _paginar_async(session, request, response, statement, [Tarea.fecha_creacion, Tarea.id],
+                                  limit, after, total, descendente=True)
+    return await run_in_threadpool(cache.guardar_respuesta, clave, [
         {
             "id": t.id,
             "curso_id": t.curso_id,
@@ -846,7 +1088,7 @@ def listar_tareas_curso(curso_id: int, session: Session = Depends(get_session)):
             "fecha_creacion": t.fecha_creacion
         }
         for t in tareas
-    ]
+    ], _cabeceras_paginacion_guardadas(response))
 
 
 @app.get("/usuarios/{usuario_id}")
@@ -874,10 +1116,17 @@ def obtener_perfil(usuario_id: int, session: Session = Depends(get_session)):
 
 
 @app.get("/estudiantes")
-def listar_estudiantes(session: Session = Depends(get_session)):
-    """Listar todos los estudiantes registrados."""
+async def listar_estudiantes(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Listar los estudiantes registrados (paginado por cursor)."""
     stmt = select(Estudiante)
-    filas = session.exec(stmt).all()
+    filas = await _paginar_async(session, request, response, stmt, [Estudiante.id], limit, after, total)
     return [
         {"id": e.id, "nombre": e.nombre, "apellido": e.apellido, "email": e.email}
         for e in filas
@@ -885,113 +1134,50 @@ def listar_estudiantes(session: Session = Depends(get_session)):
 
 # ==================== VERSIONES ====================
 @app.post("/proyectos/{proyecto_id}/versiones")
+@perfil_sql.presupuesto_sql(PRESUPUESTO_SQL_VERSION)
 def subir_version(
     proyecto_id: int,
     descripcion: str = Form(...),
     file: UploadFile = File(None),
     session: Session = Depends(get_session),
-    request: Request = None
+    identidad: Identidad = Depends(usuario_actual)
 ):
     """Subir nueva versión de un proyecto. Acepta un archivo opcional en el campo `file`."""
     proyecto = session.get(Proyecto, proyecto_id)
     if not proyecto:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
 
-    # Si la petición incluye Authorization Bearer token, intentar decodificar
-    # y si corresponde a un estudiante, validar que esté inscrito en el curso del proyecto.
-    estudiante_autenticado_id = None
-    try:
-        auth_header = None
-        if request is not None:
-            auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth_header:
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-                payload = decode_access_token(token)
-                if payload and payload.get('role') == 'estudiante':
-                    estudiante_autenticado_id = payload.get('id')
-    except Exception:
-        pass
-
-    # Validar que el estudiante autenticado tenga permiso para subir versiones a este proyecto
-    if estudiante_autenticado_id is not None:
-        estudiante_tiene_permiso = False
-        
-        # Caso 1: Proyecto asignado directamente al estudiante
-        if proyecto.estudiante_id == estudiante_autenticado_id:
-            estudiante_tiene_permiso = True
-        # Caso 2: Proyecto asignado a un curso y el estudiante está inscrito en ese curso
-        elif proyecto.curso_id is not None:
-            stmt_inscripcion = select(CursoEstudiante).where(
-                CursoEstudiante.curso_id == proyecto.curso_id,
-                CursoEstudiante.estudiante_id == estudiante_autenticado_id
-            )
-            inscripcion = session.exec(stmt_inscripcion).first()
-            if inscripcion:
-                estudiante_tiene_permiso = True
-                # NO asignar proyecto.estudiante_id - los proyectos de curso son para todos los estudiantes
-        
-        if not estudiante_tiene_permiso:
-            raise HTTPException(
-                status_code=403,
-                detail="No tienes permiso para subir versiones a este proyecto. Debes estar inscrito en el curso asignado."
-            )
-
-    # Obtener versiones del estudiante autenticado (si aplica)
-    # Cada estudiante tiene su propia secuencia de versiones independiente
-    versiones = crud.obtener_versiones(session, proyecto_id)
-    
-    # Filtrar versiones del estudiante actual y marcar anteriores como no actuales
-    if estudiante_autenticado_id is not None:
-        versiones_estudiante = [v for v in versiones if getattr(v, 'estudiante_id', None) == estudiante_autenticado_id]
-        for v in versiones_estudiante:
-            v.es_version_actual = False
-        numero_version_estudiante = len(versiones_estudiante) + 1
-    else:
-        # Si no hay estudiante autenticado (profesores u otros), usar lógica anterior
-        for v in versiones:
-            v.es_version_actual = False
-        numero_version_estudiante = len(versiones) + 1
+    # Si la petición incluye Authorization Bearer token de un estudiante,
+    # validar que esté inscrito en el curso del proyecto.
+    estudiante_autenticado_id = identidad.estudiante_id
+    _verificar_permiso_version(session, proyecto, estudiante_autenticado_id)
 
-    archivo_path = None
+    guardado = None
     if file is not None:
-        if UPLOAD_DIR is None:
-            raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
-        # Incluir estudiante_id en el nombre del archivo para evitar conflictos
-        estudiante_suffix = f"_est{estudiante_autenticado_id}" if estudiante_autenticado_id else ""
-        safe_name = f"{proyecto_id}{estudiante_suffix}_v{numero_version_estudiante}_" + Path(file.filename).name
-        dest = UPLOAD_DIR / safe_name
-        with dest.open("wb") as out_f:
-            shutil.copyfileobj(file.file, out_f)
-        archivo_path = str(dest)
-
-    # Crear nueva versión con estudiante_id
-    nueva_version = ProyectoVersion(
-        proyecto_id=proyecto_id,
-        estudiante_id=estudiante_autenticado_id,
-        numero_version=numero_version_estudiante,
-        descripcion=descripcion,
-        archivo_path=archivo_path,
-        es_version_actual=True
-    )
+        guardado = _guardar_archivo_version(session, file)
 
-    proyecto.version_actual = nueva_version.numero_version
-
-    session.add(nueva_version)
-    session.add(proyecto)
+    nueva_version = _registrar_version(
+        session, proyecto, estudiante_autenticado_id, descripcion, guardado, file.filename if file else None
+    )
     session.commit()
     session.refresh(nueva_version)
 
     return {"id": nueva_version.id, "numero_version": nueva_version.numero_version, "fecha": nueva_version.fecha_subida}
 
 @app.get("/proyectos/{proyecto_id}/versiones")
-def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_session), request: Request = None):
+def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_session),
+                               identidad: Identidad = Depends(usuario_actual)):
     """Obtener historial de versiones de un proyecto con información del estudiante.
     
     - Estudiantes: ven solo sus propias versiones
     - Profesores: ven todas las versiones agrupadas por estudiante
     """
+    clave, cacheada = cache.buscar_respuesta(
+        "versiones_proyecto", (proyecto_id,), [f"proyecto:{proyecto_id}"], _variante_cache(identidad)
+    )
+    if cacheada is not None:
+        return cacheada["cuerpo"]
+
     proyecto = session.get(Proyecto, proyecto_id)
     if not proyecto:
         raise HTTPException(status_code=404, detail="Proyecto no encontrado")
@@ -1001,25 +1187,8 @@ def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_
         raise HTTPException(status_code=404, detail="No hay versiones para este proyecto")
     
     # Detectar rol del usuario autenticado
-    estudiante_autenticado_id = None
-    es_profesor = False
-    try:
-        auth_header = None
-        if request is not None:
-            auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth_header:
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0].lower() == 'bearer':
-                token = parts[1]
-                payload = decode_access_token(token)
-                if payload:
-                    role = payload.get('role')
-                    if role == 'estudiante':
-                        estudiante_autenticado_id = payload.get('id')
-                    elif role == 'profesor':
-                        es_profesor = True
-    except Exception:
-        pass
+    estudiante_autenticado_id = identidad.estudiante_id
+    es_profesor = identidad.es_profesor
     
     # Filtrar versiones según el rol
     if estudiante_autenticado_id is not None:
@@ -1030,48 +1199,12 @@ def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_
     
     # Agrupar versiones por estudiante para profesores
     if es_profesor or estudiante_autenticado_id is None:
-        # Agrupar por estudiante
-        versiones_por_estudiante = {}
-        for v in versiones:
-            est_id = getattr(v, 'estudiante_id', None)
-            if est_id not in versiones_por_estudiante:
-                versiones_por_estudiante[est_id] = []
-            versiones_por_estudiante[est_id].append(v)
-        
-        entregas = []
-        for est_id, vers in versiones_por_estudiante.items():
-            estudiante_info = None
-            if est_id:
-                estudiante = session.get(Estudiante, est_id)
-                if estudiante:
-                    estudiante_info = {
-                        "id": estudiante.id,
-                        "nombre": estudiante.nombre,
-                        "apellido": estudiante.apellido,
-                        "email": estudiante.email,
-                        "nombre_completo": f"{estudiante.nombre} {estudiante.apellido}"
-                    }
-            
-            entregas.append({
-                "estudiante": estudiante_info,
-                "versiones": [
-                    {
-                        "id": v.id,
-                        "numero_version": v.numero_version,
-                        "descripcion": v.descripcion,
-                        "fecha_subida": v.fecha_subida,
-                        "es_version_actual": v.es_version_actual,
-                        "tiene_archivo": v.archivo_path is not None
-                    }
-                    for v in vers
-                ]
-            })
-        
-        return {
+        entregas = _entregas_por_estudiante(session, versiones)
+        return cache.guardar_respuesta(clave, {
             "proyecto_id": proyecto.id,
             "titulo": proyecto.titulo,
             "entregas_por_estudiante": entregas
-        }
+        })
     else:
         # Estudiante: vista simple de sus versiones
         estudiante_info = None
@@ -1085,7 +1218,7 @@ def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_
                     "email": estudiante.email
                 }
         
-        return {
+        return cache.guardar_respuesta(clave, {
             "proyecto_id": proyecto.id,
             "titulo": proyecto.titulo,
             "estudiante": estudiante_info,
@@ -1100,50 +1233,55 @@ def obtener_versiones_proyecto(proyecto_id: int, session: Session = Depends(get_
                 }
                 for v in versiones
             ]
-        }
+        })
 
 @app.get("/cursos/{curso_id}/entregas")
-def obtener_entregas_curso(curso_id: int, session: Session = Depends(get_session)):
+async def obtener_entregas_curso(curso_id: int, session: AsyncSession = Depends(get_async_session)):
     """Obtener todas las entregas (versiones) de todos los estudiantes de un curso.
     
     Útil para que el profesor revise y califique las entregas de manera organizada.
     Devuelve proyectos agrupados por estudiante con sus respectivas versiones.
     """
-    curso = session.get(Curso, curso_id)
+    curso = await session.get(Curso, curso_id)
     if not curso:
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
-    # Obtener proyectos asignados al curso
+    # Número fijo de consultas, independiente del tamaño del curso:
+    # proyectos, inscripciones, estudiantes, versiones y últimas calificaciones.
+    # Todo se cruza luego en memoria mediante diccionarios.
     stmt_proyectos = select(Proyecto).where(Proyecto.curso_id == curso_id)
-    proyectos = session.exec(stmt_proyectos).all()
+    proyectos = (await session.exec(stmt_proyectos)).all()
+    proyecto_ids = [p.id for p in proyectos]
     
     # Obtener estudiantes inscritos en el curso
     stmt_estudiantes = select(CursoEstudiante).where(CursoEstudiante.curso_id == curso_id)
-    inscripciones = session.exec(stmt_estudiantes).all()
+    inscripciones = (await session.exec(stmt_estudiantes)).all()
     estudiante_ids = [i.estudiante_id for i in inscripciones]
+    estudiantes = await crud_async.obtener_estudiantes_por_ids(session, estudiante_ids)
+    
+    # Versiones de todos los proyectos agrupadas por (proyecto, estudiante)
+    versiones_por_clave = {}
+    for v in await crud_async.obtener_versiones_por_proyectos(session, proyecto_ids):
+        versiones_por_clave.setdefault((v.proyecto_id, v.estudiante_id), []).append(v)
+    
+    calificaciones = await crud_async.obtener_ultimas_calificaciones(session, proyecto_ids)
     
     # Construir respuesta organizada por proyecto y por estudiante
     resultado = []
     for proyecto in proyectos:
-        versiones_todas = crud.obtener_versiones(session, proyecto.id)
-        
-        # Agrupar versiones por estudiante
         entregas_por_estudiante = []
         for est_id in estudiante_ids:
-            estudiante = session.get(Estudiante, est_id)
+            estudiante = estudiantes.get(est_id)
             if not estudiante:
                 continue
             
-            # Filtrar versiones de este estudiante
-            versiones_estudiante = [v for v in versiones_todas if getattr(v, 'estudiante_id', None) == est_id]
+            versiones_estudiante = versiones_por_clave.get((proyecto.id, est_id), [])
             
-            # Obtener calificación del estudiante para este proyecto (si existe)
-            # Nota: actualmente Calificacion no tiene estudiante_id, así que mostramos la calificación general del proyecto
-            stmt_cal = select(Calificacion).where(Calificacion.proyecto_id == proyecto.id).order_by(Calificacion.fecha_calificacion.desc())
-            calificaciones = session.exec(stmt_cal).all()
+            # Calificación del estudiante para este proyecto; si no tiene una
+            # propia se muestra la calificación general del proyecto (si existe)
+            cal = calificaciones.get((proyecto.id, est_id)) or calificaciones.get((proyecto.id, None))
             calificacion_actual = None
-            if calificaciones:
-                cal = calificaciones[0]
+            if cal:
                 calificacion_actual = {
                     "puntaje": cal.puntaje,
                     "comentarios": cal.comentarios,
@@ -1190,6 +1328,57 @@ def obtener_entregas_curso(curso_id: int, session: Session = Depends(get_session
         "entregas": resultado
     }
 
+
+@app.get("/cursos/{curso_id}/entregas/zip")
+def descargar_entregas_curso_zip(curso_id: int, todas: bool = False, session: Session = Depends(get_session)):
+    """Descargar en un ZIP las entregas de todas las asignaciones de un curso.
+
+    Estructura: `<proyecto>/<estudiante>/v<n>_<archivo>` más `manifiesto.csv` con las
+    calificaciones. `?todas=true` incluye el historial completo de versiones.
+    """
+    curso = session.get(Curso, curso_id)
+    if not curso:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    proyectos = session.exec(select(Proyecto).where(Proyecto.curso_id == curso_id)).all()
+    return _respuesta_zip_entregas(
+        session, proyectos, todas, f"curso_{curso_id}_entregas.zip", carpeta_por_proyecto=True
+    )
+
+
+@app.get("/cursos/{curso_id}/calificaciones")
+def libro_calificaciones_curso(
+    curso_id: int,
+    formato: str = Query("json", regex="^(json|csv)$"),
+    session: Session = Depends(get_session)
+):
+    """Libro de calificaciones del curso: matriz estudiantes × asignaciones.
+
+    Cada celda es la última calificación del estudiante en la asignación (o la general
+    del proyecto). Incluye media, mediana, desviación, tasa de aprobación (>= 3.0) y
+    percentiles por asignación y por estudiante. `?formato=csv` devuelve una hoja de cálculo.
+    """
+    curso = session.get(Curso, curso_id)
+    if not curso:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+
+    estudiantes = session.exec(
+        select(Estudiante)
+        .join(CursoEstudiante, CursoEstudiante.estudiante_id == Estudiante.id)
+        .where(CursoEstudiante.curso_id == curso_id)
+        .order_by(Estudiante.apellido, Estudiante.nombre, Estudiante.id)
+    ).all()
+    proyectos = session.exec(select(Proyecto).where(Proyecto.curso_id == curso_id).order_by(Proyecto.id)).all()
+    calificaciones = crud.obtener_ultimas_calificaciones(session, [p.id for p in proyectos])
+    libro = libro_calificaciones.construir(estudiantes, proyectos, calificaciones)
+
+    if formato == "csv":
+        return Response(
+            content=libro_calificaciones.a_csv(libro),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="curso_{curso_id}_calificaciones.csv"'}
+        )
+    return {"curso_id": curso.id, "nombre": curso.nombre, **libro_calificaciones.a_dict(libro)}
+
 @app.get("/proyectos/{proyecto_id}/entregas-estudiantes")
 def obtener_entregas_estudiantes_proyecto(proyecto_id: int, session: Session = Depends(get_session)):
     """Obtener todas las entregas de estudiantes para un proyecto específico.
@@ -1205,43 +1394,25 @@ def obtener_entregas_estudiantes_proyecto(proyecto_id: int, session: Session = D
     entregas_por_estudiante = []
     
     if proyecto.curso_id:
-        # Proyecto asignado a curso: obtener entregas de todos los estudiantes inscritos
-        stmt_estudiantes = select(CursoEstudiante).where(CursoEstudiante.curso_id == proyecto.curso_id)
-        inscripciones = session.exec(stmt_estudiantes).all()
-        
-        for inscripcion in inscripciones:
-            estudiante = session.get(Estudiante, inscripcion.estudiante_id)
-            if not estudiante:
-                continue
-            
-            # Buscar versiones subidas por este estudiante específico
-            # (Nota: actualmente el modelo no guarda quién subió cada versión individualmente,
-            # solo hay estudiante_id a nivel de proyecto. Para distinguir entregas por estudiante
-            # necesitarías agregar estudiante_id en ProyectoVersion o crear proyectos individuales)
+        # Proyecto asignado a curso: todos los estudiantes inscritos en una consulta.
+        # Solo el estudiante asignado directamente al proyecto tiene versiones que mostrar
+        stmt_estudiantes = (
+            select(Estudiante)
+            .join(CursoEstudiante, CursoEstudiante.estudiante_id == Estudiante.id)
+            .where(CursoEstudiante.curso_id == proyecto.curso_id)
+            .order_by(CursoEstudiante.id)
+        )
+        estudiantes = session.exec(stmt_estudiantes).all()
+        versiones = []
+        if any(e.id == proyecto.estudiante_id for e in estudiantes):
             versiones = crud.obtener_versiones(session, proyecto_id)
-            
-            # Filtrar versiones (por ahora todas se mostrarán, pero podrías crear
-            # proyectos clonados por estudiante o añadir estudiante_id a ProyectoVersion)
+
+        for estudiante in estudiantes:
+            tiene_entrega = proyecto.estudiante_id == estudiante.id
             entregas_por_estudiante.append({
-                "estudiante": {
-                    "id": estudiante.id,
-                    "nombre": estudiante.nombre,
-                    "apellido": estudiante.apellido,
-                    "email": estudiante.email,
-                    "nombre_completo": f"{estudiante.nombre} {estudiante.apellido}"
-                },
-                "tiene_entrega": proyecto.estudiante_id == estudiante.id,
-                "versiones": [
-                    {
-                        "id": v.id,
-                        "numero_version": v.numero_version,
-                        "descripcion": v.descripcion,
-                        "fecha_subida": v.fecha_subida,
-                        "es_version_actual": v.es_version_actual,
-                        "tiene_archivo": v.archivo_path is not None
-                    }
-                    for v in versiones
-                ] if proyecto.estudiante_id == estudiante.id else []
+                "estudiante": _info_estudiante(estudiante),
+                "tiene_entrega": tiene_entrega,
+                "versiones": [_info_version(v) for v in versiones] if tiene_entrega else []
             })
     else:
         # Proyecto asignado individualmente
@@ -1250,25 +1421,9 @@ def obtener_entregas_estudiantes_proyecto(proyecto_id: int, session: Session = D
             if estudiante:
                 versiones = crud.obtener_versiones(session, proyecto_id)
                 entregas_por_estudiante.append({
-                    "estudiante": {
-                        "id": estudiante.id,
-                        "nombre": estudiante.nombre,
-                        "apellido": estudiante.apellido,
-                        "email": estudiante.email,
-                        "nombre_completo": f"{estudiante.nombre} {estudiante.apellido}"
-                    },
+                    "estudiante": _info_estudiante(estudiante),
                     "tiene_entrega": True,
-                    "versiones": [
-                        {
-                            "id": v.id,
-                            "numero_version": v.numero_version,
-                            "descripcion": v.descripcion,
-                            "fecha_subida": v.fecha_subida,
-                            "es_version_actual": v.es_version_actual,
-                            "tiene_archivo": v.archivo_path is not None
-                        }
-                        for v in versiones
-                    ]
+                    "versiones": [_info_version(v) for v in versiones]
                 })
     
     return {
@@ -1281,6 +1436,232 @@ def obtener_entregas_estudiantes_proyecto(proyecto_id: int, session: Session = D
         "entregas": entregas_por_estudiante
     }
 
+# ==================== SUBIDAS POR PARTES ====================
+def _estado_subida(subida: SubidaParcial) -> SubidaEstado:
+    return SubidaEstado(
+        id=subida.id,
+        proyecto_id=subida.proyecto_id,
+        nombre_archivo=subida.nombre_archivo,
+        tamano_total=subida.tamano_total,
+        recibido=subida.recibido,
+        tamano_bloque_max=subidas.MAX_CHUNK_BYTES,
+        expira=subida.fecha_actualizacion + subidas.EXPIRACION_SUBIDA,
+    )
+
+
+def _obtener_subida(session, subida_id: str, identidad: Identidad) -> SubidaParcial:
+    subida = session.get(SubidaParcial, subida_id)
+    if not subida:
+        raise HTTPException(status_code=404, detail="Subida no encontrada o expirada")
+    _verificar_dueno_subida(subida, identidad)
+    return subida
+
+
+def _verificar_dueno_subida(subida: SubidaParcial, identidad: Identidad):
+    """Una subida iniciada por un estudiante solo la puede continuar ese estudiante."""
+    if subida.estudiante_id is not None and identidad.estudiante_id != subida.estudiante_id:
+        raise HTTPException(status_code=403, detail="Esta subida pertenece a otro usuario")
+
+
+def _purgar_subidas_expiradas(session):
+    limite = datetime.utcnow() - subidas.EXPIRACION_SUBIDA
+    expiradas = session.exec(select(SubidaParcial).where(SubidaParcial.fecha_actualizacion < limite)).all()
+    for subida in expiradas:
+        session.delete(subida)
+        subidas.eliminar(subida.id)
+
+
+@app.post("/proyectos/{proyecto_id}/subidas", response_model=SubidaEstado)
+def crear_subida(proyecto_id: int, datos: SubidaCreate, session: Session = Depends(get_session),
+                 identidad: Identidad = Depends(usuario_actual)):
+    """Iniciar una subida por partes de una nueva versión (ver app.subidas).
+
+    Pensado para archivos grandes o conexiones inestables: si un bloque falla solo
+    hay que reenviar ese bloque, no el archivo completo.
+    """
+    if subidas.DIR_PARCIALES is None:
+        raise HTTPException(status_code=503, detail="Subida de archivos deshabilitada en este servidor")
+    proyecto = session.get(Proyecto, proyecto_id)
+    if not proyecto:
+        raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+
+    estudiante_autenticado_id = identidad.estudiante_id
+    _verificar_permiso_version(session, proyecto, estudiante_autenticado_id)
+
+    if datos.tamano <= 0:
+        raise HTTPException(status_code=400, detail="El tamaño del archivo debe ser mayor que 0")
+    if datos.tamano > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El archivo supera el tamaño máximo permitido ({MAX_UPLOAD_BYTES} bytes)"
+        )
+    if datos.sha256 and not re.fullmatch(r"[0-9a-fA-F]{64}", datos.sha256):
+        raise HTTPException(status_code=400, detail="sha256 debe ser un hash hexadecimal de 64 caracteres")
+    nombre_archivo = Path(datos.nombre_archivo).name
+    if not nombre_archivo:
+        raise HTTPException(status_code=400, detail="nombre_archivo no puede estar vacío")
+
+    _purgar_subidas_expiradas(session)
+
+    subida = SubidaParcial(
+        id=uuid.uuid4().hex,
+        proyecto_id=proyecto_id,
+        estudiante_id=estudiante_autenticado_id,
+        descripcion=datos.descripcion,
+        nombre_archivo=nombre_archivo,
+        tamano_total=datos.tamano,
+        sha256=datos.sha256.lower() if datos.sha256 else None,
+    )
+    subidas.crear_directorio(subida.id)
+    session.add(subida)
+    session.commit()
+    session.refresh(subida)
+    return _estado_subida(subida)
+
+
+@app.get("/subidas/{subida_id}", response_model=SubidaEstado)
+def estado_subida(subida_id: str, response: Response, session: Session = Depends(get_session),
+                  identidad: Identidad = Depends(usuario_actual)):
+    """Estado de una subida por partes: `recibido` es el offset desde el que hay que continuar."""
+    subida = _obtener_subida(session, subida_id, identidad)
+    response.headers["Upload-Offset"] = str(subida.recibido)
+    return _estado_subida(subida)
+
+
+@app.put("/subidas/{subida_id}", response_model=SubidaEstado)
+async def subir_bloque(
+    subida_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0),
+    session: AsyncSession = Depends(get_async_session),
+    identidad: Identidad = Depends(usuario_actual)
+):
+    """Enviar un bloque de una subida por partes (cuerpo binario, `Content-Type: application/octet-stream`).
+
+    `offset` debe ser igual a `recibido`; si no, se responde 409 con la cabecera
+    `Upload-Offset` indicando desde dónde continuar. Con la cabecera `X-Chunk-Sha256`
+    el bloque se verifica antes de aceptarlo.
+    """
+    subida = await session.get(SubidaParcial, subida_id)
+    if not subida:
+        raise HTTPException(status_code=404, detail="Subida no encontrada o expirada")
+    _verificar_dueno_subida(subida, identidad)
+    recibido, tamano_total = subida.recibido, subida.tamano_total
+    # Liberar la conexión mientras llega el cuerpo del bloque
+    await session.close()
+
+    if offset != recibido:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Offset incorrecto: se esperaba {recibido}",
+            headers={"Upload-Offset": str(recibido)}
+        )
+    if recibido >= tamano_total:
+        raise HTTPException(status_code=409, detail="La subida ya está completa; llama a /finalizar")
+
+    try:
+        tmp, tamano = await subidas.recibir_bloque(
+            subida_id, request.stream(),
+            max_bytes=min(subidas.MAX_CHUNK_BYTES, tamano_total - offset),
+            sha_esperado=request.headers.get("x-chunk-sha256")
+        )
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except subidas.BloqueInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Confirmar el avance solo si nadie ha escrito este offset mientras tanto
+    ahora = datetime.utcnow()
+    resultado = await session.exec(
+        update(SubidaParcial)
+        .where(SubidaParcial.id == subida_id, SubidaParcial.recibido == offset)
+        .values(recibido=offset + tamano, fecha_actualizacion=ahora)
+    )
+    await session.commit()
+    if not resultado.rowcount:
+        subidas.descartar_bloque(tmp)
+        subida = await session.get(SubidaParcial, subida_id, populate_existing=True)
+        actual = subida.recibido if subida else 0
+        raise HTTPException(
+            status_code=409,
+            detail=f"Otro envío ya ocupó este offset: se esperaba {actual}",
+            headers={"Upload-Offset": str(actual)}
+        )
+    subidas.confirmar_bloque(tmp, subida_id, offset)
+
+    subida.recibido = offset + tamano
+    subida.fecha_actualizacion = ahora
+    response.headers["Upload-Offset"] = str(subida.recibido)
+    return _estado_subida(subida)
+
+
+@app.post("/subidas/{subida_id}/finalizar")
+@perfil_sql.presupuesto_sql(PRESUPUESTO_SQL_VERSION)
+def finalizar_subida(subida_id: str, session: Session = Depends(get_session),
+                     identidad: Identidad = Depends(usuario_actual)):
+    """Unir los bloques recibidos y registrar el archivo como nueva versión del proyecto."""
+    subida = _obtener_subida(session, subida_id, identidad)
+    if subida.recibido < subida.tamano_total:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Faltan {subida.tamano_total - subida.recibido} bytes por enviar",
+            headers={"Upload-Offset": str(subida.recibido)}
+        )
+    proyecto = session.get(Proyecto, subida.proyecto_id)
+    if not proyecto:
+        raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+    estudiante_id, descripcion = subida.estudiante_id, subida.descripcion
+    nombre_archivo, tamano_total, sha_esperado = subida.nombre_archivo, subida.tamano_total, subida.sha256
+
+    # Reclamar la subida: si dos peticiones finalizan a la vez, solo una crea la versión
+    if not session.exec(delete(SubidaParcial).where(SubidaParcial.id == subida_id)).rowcount:
+        raise HTTPException(status_code=409, detail="La subida ya se está finalizando")
+
+    try:
+        rutas = subidas.bloques(subida_id, tamano_total)
+    except subidas.BloqueFaltante as e:
+        # Volver a pedir desde el primer bloque que falta
+        session.rollback()
+        session.exec(update(SubidaParcial).where(SubidaParcial.id == subida_id).values(recibido=e.offset))
+        session.commit()
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+
+    almacen.DIR_OBJETOS.mkdir(parents=True, exist_ok=True)
+    lector = subidas.LectorBloques(rutas)
+    try:
+        recibido = recibir_upload(lector, almacen.DIR_OBJETOS)
+    finally:
+        lector.close()
+
+    if sha_esperado and recibido.sha256 != sha_esperado:
+        os.unlink(recibido.path)
+        session.commit()
+        subidas.eliminar(subida_id)
+        raise HTTPException(
+            status_code=422,
+            detail="El SHA-256 del archivo no coincide con el indicado; inicia una nueva subida"
+        )
+
+    guardado = almacen.incorporar(session, recibido.path, recibido.sha256, recibido.tamano)
+    nueva_version = _registrar_version(session, proyecto, estudiante_id, descripcion, guardado, nombre_archivo)
+    session.commit()
+    session.refresh(nueva_version)
+    subidas.eliminar(subida_id)
+
+    return {"id": nueva_version.id, "numero_version": nueva_version.numero_version, "fecha": nueva_version.fecha_subida}
+
+
+@app.delete("/subidas/{subida_id}")
+def cancelar_subida(subida_id: str, session: Session = Depends(get_session),
+                    identidad: Identidad = Depends(usuario_actual)):
+    """Cancelar una subida por partes y borrar los bloques recibidos."""
+    subida = _obtener_subida(session, subida_id, identidad)
+    session.delete(subida)
+    session.commit()
+    subidas.eliminar(subida_id)
+    return {"message": "Subida cancelada"}
+
 # ==================== CALIFICACIONES ====================
 @app.post("/calificaciones", response_model=CalificacionResponse)
 def calificar_proyecto(calificacion: CalificarDTO, session: Session = Depends(get_session)):
@@ -1317,6 +1698,7 @@ def calificar_proyecto(calificacion: CalificarDTO, session: Session = Depends(ge
         session.add(proyecto)
     
     session.add(nueva_calificacion)
+    desempeno.registrar_calificacion(session, proyecto, nueva_calificacion)
     session.commit()
     session.refresh(nueva_calificacion)
     
@@ -1330,10 +1712,21 @@ def calificar_proyecto(calificacion: CalificarDTO, session: Session = Depends(ge
     )
 
 @app.get("/calificaciones/proyecto/{proyecto_id}")
-def obtener_calificaciones_proyecto(proyecto_id: int, session: Session = Depends(get_session)):
-    """Obtener todas las calificaciones de un proyecto"""
-    calificaciones = crud.obtener_calificaciones_proyecto(session, proyecto_id)
-    if not calificaciones:
+async def obtener_calificaciones_proyecto(
+    proyecto_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Obtener las calificaciones de un proyecto (paginado por cursor, más recientes primero)"""
+    statement = select(Calificacion).where(Calificacion.proyecto_id == proyecto_id)
+    calificaciones = await _paginar_async(session, request, response, statement,
+                                          [Calificacion.fecha_calificacion, Calificacion.id],
+                                          limit, after, total, descendente=True)
+    if not calificaciones and not after:
         raise HTTPException(status_code=404, detail="No hay calificaciones para este proyecto")
     return [
         {
@@ -1346,105 +1739,140 @@ def obtener_calificaciones_proyecto(proyecto_id: int, session: Session = Depends
     ]
 
 @app.get("/calificaciones/estudiante/{estudiante_id}")
-def obtener_calificaciones_estudiante(estudiante_id: int, session: Session = Depends(get_session)):
-    """Obtener todas las calificaciones de un estudiante"""
-    # Encontrar proyectos directamente asignados o asignados a cursos del estudiante
-    stmt_direct = select(Proyecto).where(Proyecto.estudiante_id == estudiante_id)
-    proyectos_direct = session.exec(stmt_direct).all()
-    stmt_cursos = select(CursoEstudiante).where(CursoEstudiante.estudiante_id == estudiante_id)
-    cursos_enlace = session.exec(stmt_cursos).all()
-    curso_ids = [c.curso_id for c in cursos_enlace]
-    proyectos_curso = []
-    if curso_ids:
-        stmt_c = select(Proyecto).where(Proyecto.curso_id.in_(curso_ids))
-        proyectos_curso = session.exec(stmt_c).all()
-
-    proyectos = proyectos_direct + [p for p in proyectos_curso if p not in proyectos_direct]
-
-    todas_calificaciones = []
-    for proyecto in proyectos:
-        calificaciones = crud.obtener_calificaciones_proyecto(session, proyecto.id)
-        for c in calificaciones:
-            todas_calificaciones.append({
-                "proyecto_id": proyecto.id,
-                "titulo_proyecto": proyecto.titulo,
-                "puntaje": c.puntaje,
-                "comentarios": c.comentarios,
-                "fecha": c.fecha_calificacion
-            })
+def obtener_calificaciones_estudiante(
+    estudiante_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=crud.PAGINA_MAXIMA),
+    after: Optional[str] = None,
+    total: bool = False,
+    session: Session = Depends(get_session)
+):
+    """Obtener las calificaciones de un estudiante (paginado por cursor, más recientes primero)"""
+    # Calificaciones de proyectos directamente asignados o asignados a cursos del estudiante:
+    # las suyas y las generales del proyecto, no las de sus compañeros
+    statement = (
+        select(Calificacion, Proyecto.titulo)
+        .join(Proyecto, Proyecto.id == Calificacion.proyecto_id)
+        .where(
+            crud.filtro_proyectos_estudiante(estudiante_id),
+            or_(Calificacion.estudiante_id == estudiante_id, Calificacion.estudiante_id.is_(None))
+        )
+    )
+    filas = _paginar(session, request, response, statement, [Calificacion.fecha_calificacion, Calificacion.id],
+                     limit, after, total, descendente=True)
+
+    todas_calificaciones = [
+        {
+            "proyecto_id": c.proyecto_id,
+            "titulo_proyecto": titulo,
+            "puntaje": c.puntaje,
+            "comentarios": c.comentarios,
+            "fecha": c.fecha_calificacion
+        }
+        for c, titulo in filas
+    ]
     
-    if not todas_calificaciones:
+    if not todas_calificaciones and not after:
         raise HTTPException(status_code=404, detail="No hay calificaciones para este estudiante")
     return todas_calificaciones
 
+# ==================== EXPORTACIÓN ====================
+def _respuesta_exportacion(tipo: str, formato: str, curso_id: Optional[int], profesor_id: Optional[int],
+                           desde: Optional[datetime], hasta: Optional[datetime]) -> StreamingResponse:
+    """Exportación en streaming (ver app.exportar): la memoria no depende del número de filas."""
+    if async_engine is None:
+        raise HTTPException(status_code=503, detail="Exportación no disponible: falta el driver async de la base de datos")
+    statement = exportar.SENTENCIAS[tipo](curso_id=curso_id, profesor_id=profesor_id, desde=desde, hasta=hasta)
+    return StreamingResponse(
+        exportar.exportar_async(async_engine, statement, formato),
+        media_type=exportar.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{tipo}.{formato}"'}
+    )
+
+
+@app.get("/exportar/calificaciones")
+def exportar_calificaciones(
+    formato: str = Query("csv", regex="^(csv|ndjson)$"),
+    curso_id: Optional[int] = None,
+    profesor_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+):
+    """Exportar todas las calificaciones (CSV o NDJSON), filtrando por curso, profesor y fecha."""
+    return _respuesta_exportacion("calificaciones", formato, curso_id, profesor_id, desde, hasta)
+
+
+@app.get("/exportar/versiones")
+def exportar_versiones(
+    formato: str = Query("csv", regex="^(csv|ndjson)$"),
+    curso_id: Optional[int] = None,
+    profesor_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+):
+    """Exportar todas las versiones entregadas (CSV o NDJSON), filtrando por curso, profesor y fecha de subida."""
+    return _respuesta_exportacion("versiones", formato, curso_id, profesor_id, desde, hasta)
+
 # ==================== REPORTES ====================
 @app.get("/reportes/desempeño/estudiante/{estudiante_id}", response_model=DesempenoReporte)
-def generar_reporte_desempeño(estudiante_id: int, session: Session = Depends(get_session)):
-    """Generar reporte de desempeño de un estudiante"""
-    statement = select(Proyecto).where(Proyecto.estudiante_id == estudiante_id)
-    proyectos = session.exec(statement).all()
-    
-    if not proyectos:
+def generar_reporte_desempeño(estudiante_id: int, curso_id: Optional[int] = None, session: Session = Depends(get_session)):
+    """Generar reporte de desempeño de un estudiante (o solo de un curso con `curso_id`).
+
+    Los totales se leen de DesempenoAgregado, que se mantiene al calificar y al subir
+    versiones (ver app.desempeno); el detalle sale de los resúmenes por proyecto.
+    """
+    ambito = curso_id if curso_id is not None else desempeno.TODOS_LOS_CURSOS
+    agregado = session.get(DesempenoAgregado, (estudiante_id, ambito))
+
+    if not agregado or not agregado.proyectos_calificados:
         return DesempenoReporte(
             estudiante_id=estudiante_id,
             nombre_estudiante="Estudiante",
             promedio_calificaciones=0,
-            total_proyectos=0,
+            total_proyectos=agregado.total_proyectos if agregado else 0,
             proyectos_aprobados=0,
             tasa_aprobacion=0,
             calificacion_mas_alta=0,
             calificacion_mas_baja=0,
-            total_versiones=0
+            total_versiones=agregado.total_versiones if agregado else 0
         )
-    
-    puntajes = []
-    detalle = []
-    total_versiones = 0
-    
-    for proyecto in proyectos:
-        calificaciones = crud.obtener_calificaciones_proyecto(session, proyecto.id)
-        versiones = crud.obtener_versiones(session, proyecto.id)
-        total_versiones += len(versiones)
-        
-        if calificaciones:
-            ultima_cal = calificaciones[0]
-            puntajes.append(ultima_cal.puntaje)
-            estado = "Aprobado" if ultima_cal.puntaje >= 3.0 else "Reprobado"
-            detalle.append({
-                "proyecto_id": proyecto.id,
-                "titulo_proyecto": proyecto.titulo,
-                "calificacion": ultima_cal.puntaje,
-                "estado": estado,
-                "versiones_cargadas": len(versiones)
-            })
-    
-    if not puntajes:
-        return DesempenoReporte(
-            estudiante_id=estudiante_id,
-            nombre_estudiante="Estudiante",
-            promedio_calificaciones=0,
-            total_proyectos=len(proyectos),
-            proyectos_aprobados=0,
-            tasa_aprobacion=0,
-            calificacion_mas_alta=0,
-            calificacion_mas_baja=0,
-            total_versiones=total_versiones
+
+    statement = (
+        select(ResumenProyectoEstudiante, Proyecto.titulo)
+        .join(Proyecto, Proyecto.id == ResumenProyectoEstudiante.proyecto_id)
+        .where(
+            ResumenProyectoEstudiante.estudiante_id == estudiante_id,
+            ResumenProyectoEstudiante.calificacion.is_not(None)
         )
-    
-    promedio = sum(puntajes) / len(puntajes)
-    aprobados = len([p for p in puntajes if p >= 3.0])
-    tasa = (aprobados / len(puntajes)) * 100 if puntajes else 0
-    
+        .order_by(ResumenProyectoEstudiante.proyecto_id)
+    )
+    if curso_id is not None:
+        statement = statement.where(ResumenProyectoEstudiante.curso_id == curso_id)
+    detalle = [
+        {
+            "proyecto_id": r.proyecto_id,
+            "titulo_proyecto": titulo,
+            "calificacion": r.calificacion,
+            "estado": "Aprobado" if r.calificacion >= desempeno.NOTA_APROBACION else "Reprobado",
+            "versiones_cargadas": r.total_versiones
+        }
+        for r, titulo in session.exec(statement).all()
+    ]
+
+    promedio = agregado.suma_calificaciones / agregado.proyectos_calificados
+    tasa = (agregado.proyectos_aprobados / agregado.proyectos_calificados) * 100
+
     return DesempenoReporte(
         estudiante_id=estudiante_id,
         nombre_estudiante="Estudiante",
         promedio_calificaciones=round(promedio, 2),
-        total_proyectos=len(proyectos),
-        proyectos_aprobados=aprobados,
+        total_proyectos=agregado.total_proyectos,
+        proyectos_aprobados=agregado.proyectos_aprobados,
         tasa_aprobacion=round(tasa, 2),
-        calificacion_mas_alta=max(puntajes),
-        calificacion_mas_baja=min(puntajes),
-        total_versiones=total_versiones,
+        calificacion_mas_alta=agregado.calificacion_mas_alta,
+        calificacion_mas_baja=agregado.calificacion_mas_baja,
+        total_versiones=agregado.total_versiones,
         detalle_proyectos=detalle
     )
 
@@ -1478,16 +1906,18 @@ def debug_asignacion(proyecto_id: int, estudiante_id: int, session: Session = De
         "esta_inscrito_en_curso_proyecto": False
     }
     
-    # Obtener cursos del estudiante
-    stmt = select(CursoEstudiante).where(CursoEstudiante.estudiante_id == estudiante_id)
-    inscripciones = session.exec(stmt).all()
-    for insc in inscripciones:
-        curso = session.get(Curso, insc.curso_id)
+    # Obtener cursos del estudiante (con su nombre, en una consulta)
+    stmt = (
+        select(CursoEstudiante.curso_id, Curso.nombre)
+        .outerjoin(Curso, Curso.id == CursoEstudiante.curso_id)
+        .where(CursoEstudiante.estudiante_id == estudiante_id)
+    )
+    for curso_id, nombre_curso in session.exec(stmt).all():
         info["cursos_estudiante"].append({
-            "curso_id": insc.curso_id,
-            "nombre_curso": curso.nombre if curso else "N/A"
+            "curso_id": curso_id,
+            "nombre_curso": nombre_curso or "N/A"
         })
-        if insc.curso_id == proyecto.curso_id:
+        if curso_id == proyecto.curso_id:
             info["esta_inscrito_en_curso_proyecto"] = True
     
     info["puede_subir_version"] = (
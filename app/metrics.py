@@ -0,0 +1,207 @@
+"""Registro de métricas en proceso (contadores, medidores e histogramas con etiquetas).
+
+No depende de ningún servicio externo: cada módulo registra sus métricas en
+`REGISTRO` y la API las expone en `/metrics`, en el formato de texto de Prometheus
+(`REGISTRO.prometheus()`) o en JSON con percentiles estimados (`REGISTRO.snapshot()`).
+"""
+import math
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# Cubetas por defecto (en segundos) pensadas para latencias de peticiones y de BD
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+# Starlette añade "; charset=utf-8" a los tipos text/*
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4"
+
+
+def _etiquetas(labels: dict) -> Etiquetas:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _texto_etiquetas(etiquetas: Etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    pares = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in etiquetas
+    )
+    return "{" + pares + "}"
+
+
+def _texto_numero(valor: float) -> str:
+    if isinstance(valor, bool):
+        valor = int(valor)
+    if isinstance(valor, float):
+        if math.isnan(valor):
+            return "NaN"
+        if math.isinf(valor):
+            return "+Inf" if valor > 0 else "-Inf"
+    return repr(valor)
+
+
+class Contador:
+    """Valor que solo crece (eventos, bytes transferidos...)."""
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._valores: Dict[Etiquetas, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1, **labels):
+        clave = _etiquetas(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def valores(self) -> Dict[Etiquetas, float]:
+        with self._lock:
+            return dict(self._valores)
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (conexiones en uso, peticiones en curso...).
+
+    Si se pasa `funcion`, los valores se calculan en el momento de leerlos; debe
+    devolver un número o un dict {(("etiqueta", "valor"), ...): valor}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, funcion: Optional[Callable] = None):
+        super().__init__(nombre, ayuda)
+        self._funcion = funcion
+
+    def set(self, valor: float, **labels):
+        with self._lock:
+            self._valores[_etiquetas(labels)] = valor
+
+    def dec(self, valor: float = 1, **labels):
+        self.inc(-valor, **labels)
+
+    def valores(self) -> Dict[Etiquetas, float]:
+        if self._funcion is None:
+            return super().valores()
+        resultado = self._funcion()
+        if not isinstance(resultado, dict):
+            return {(): resultado}
+        return dict(resultado)
+
+
+class Histograma:
+    """Distribución de observaciones en cubetas acumulables (latencias, tamaños...)."""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, buckets=BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Etiquetas, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valor: float, **labels):
+        clave = _etiquetas(labels)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # [conteos por cubeta..., +Inf, suma]
+                serie = self._series[clave] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            else:
+                serie[len(self.buckets)] += 1
+            serie[-1] += valor
+
+    def series(self) -> Dict[Etiquetas, list]:
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    def percentil(self, serie: list, q: float) -> Optional[float]:
+        """Estimación del percentil `q` (0-1) interpolando dentro de la cubeta."""
+        conteos = serie[:-1]
+        total = sum(conteos)
+        if not total:
+            return None
+        objetivo = q * total
+        acumulado = 0
+        for i, n in enumerate(conteos):
+            if n and acumulado + n >= objetivo:
+                if i >= len(self.buckets):
+                    return self.buckets[-1]
+                inferior = self.buckets[i - 1] if i > 0 else 0.0
+                return inferior + (self.buckets[i] - inferior) * (objetivo - acumulado) / n
+            acumulado += n
+        return self.buckets[-1]
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, clase, nombre, *args, **kwargs):
+        with self._lock:
+            if nombre not in self._metricas:
+                self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            return self._metricas[nombre]
+
+    def contador(self, nombre: str, ayuda: str) -> Contador:
+        return self._registrar(Contador, nombre, ayuda)
+
+    def medidor(self, nombre: str, ayuda: str, funcion: Optional[Callable] = None) -> Medidor:
+        return self._registrar(Medidor, nombre, ayuda, funcion)
+
+    def histograma(self, nombre: str, ayuda: str, buckets=BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma, nombre, ayuda, buckets)
+
+    def metricas(self):
+        with self._lock:
+            return list(self._metricas.values())
+
+    def prometheus(self) -> str:
+        """Formato de exposición de texto de Prometheus (0.0.4)."""
+        lineas = []
+        for m in sorted(self.metricas(), key=lambda m: m.nombre):
+            lineas.append(f"# HELP {m.nombre} {m.ayuda}")
+            lineas.append(f"# TYPE {m.nombre} {m.tipo}")
+            if isinstance(m, Histograma):
+                for etiquetas, serie in sorted(m.series().items()):
+                    acumulado = 0
+                    for limite, n in zip(m.buckets + (math.inf,), serie[:-1]):
+                        acumulado += n
+                        le = etiquetas + (("le", _texto_numero(float(limite))),)
+                        lineas.append(f"{m.nombre}_bucket{_texto_etiquetas(le)} {acumulado}")
+                    lineas.append(f"{m.nombre}_sum{_texto_etiquetas(etiquetas)} {_texto_numero(serie[-1])}")
+                    lineas.append(f"{m.nombre}_count{_texto_etiquetas(etiquetas)} {acumulado}")
+            else:
+                for etiquetas, valor in sorted(m.valores().items()):
+                    lineas.append(f"{m.nombre}{_texto_etiquetas(etiquetas)} {_texto_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+    def snapshot(self) -> dict:
+        """Vista JSON de todas las métricas."""
+        datos = {}
+        for m in self.metricas():
+            if isinstance(m, Histograma):
+                series = []
+                for etiquetas, serie in m.series().items():
+                    conteo = sum(serie[:-1])
+                    series.append({
+                        "labels": dict(etiquetas),
+                        "count": conteo,
+                        "sum": round(serie[-1], 6),
+                        "p50": m.percentil(serie, 0.50),
+                        "p95": m.percentil(serie, 0.95),
+                        "p99": m.percentil(serie, 0.99),
+                    })
+            else:
+                series = [{"labels": dict(k), "value": v} for k, v in m.valores().items()]
+            datos[m.nombre] = {"type": m.tipo, "help": m.ayuda, "series": series}
+        return datos
+
+
+REGISTRO = Registro()
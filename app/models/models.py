@@ -1,4 +1,5 @@
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
@@ -6,45 +7,111 @@ class Estudiante(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     nombre: str
     apellido: str
-    email: str
+    email: str = Field(index=True, unique=True)
     password_hash: Optional[str] = None
 
 class Profesor(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     nombre: str
     apellido: str
-    email: str
+    email: str = Field(index=True, unique=True)
     password_hash: Optional[str] = None
 
+class Cuenta(SQLModel, table=True):
+    """Índice email → (rol, usuario) común a estudiantes y profesores.
+
+    La clave primaria hace único el email entre ambas tablas y el login lo resuelve
+    con una sola lectura (ver crud.obtener_usuario_por_email).
+    """
+    __table_args__ = (
+        Index("ux_cuenta_rol_usuario", "rol", "usuario_id", unique=True),
+    )
+
+    email: str = Field(primary_key=True, max_length=255)
+    rol: str = Field(max_length=20)  # "estudiante" | "profesor"
+    usuario_id: int
+
 class Proyecto(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     titulo: str
     descripcion: Optional[str] = None
-    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id")
-    curso_id: Optional[int] = Field(default=None, foreign_key="curso.id")
-    profesor_id: int = Field(foreign_key="profesor.id")
+    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id", index=True)
+    curso_id: Optional[int] = Field(default=None, foreign_key="curso.id", index=True)
+    profesor_id: int = Field(foreign_key="profesor.id", index=True)
     fecha_entrega: Optional[datetime] = None
     fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
     version_actual: int = 1
     calificacion_actual: Optional[float] = None
 
 class ProyectoVersion(SQLModel, table=True):
+    # El índice compuesto también cubre las búsquedas solo por proyecto_id; al ser único,
+    # dos subidas simultáneas no pueden acabar con el mismo número de versión. Excepción:
+    # las versiones sin estudiante (estudiante_id NULL) no chocan en un índice único (NULL
+    # es distinto de NULL en SQLite y MySQL); a esas solo las protege el contador atómico
+    # de ContadorVersion (secuencia estudiante_id = 0)
+    __table_args__ = (
+        Index("ix_proyectoversion_proyecto_estudiante_version", "proyecto_id", "estudiante_id", "numero_version",
+              unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     proyecto_id: int = Field(foreign_key="proyecto.id")
-    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id")
+    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id", index=True)
     numero_version: int
     archivo_path: Optional[str] = None
+    nombre_archivo: Optional[str] = None  # Nombre original del archivo subido
     tamano_archivo: Optional[int] = None
+    hash_archivo: Optional[str] = None  # SHA-256 (hex) del contenido
     descripcion: Optional[str] = None
     fecha_subida: datetime = Field(default_factory=datetime.utcnow)
     es_version_actual: bool = True
 
+class ContadorVersion(SQLModel, table=True):
+    """Último número de versión asignado por (proyecto, estudiante) (ver crud.siguiente_numero_version).
+
+    `estudiante_id = 0` es la secuencia de las versiones sin estudiante (profesor o legacy).
+    """
+    proyecto_id: int = Field(foreign_key="proyecto.id", primary_key=True)
+    estudiante_id: int = Field(default=0, primary_key=True)
+    ultimo_numero: int = 0
+
+class ArchivoContenido(SQLModel, table=True):
+    """Archivo del almacén direccionado por contenido (ver app.almacen).
+
+    `referencias` cuenta las ProyectoVersion que apuntan a este contenido.
+    """
+    sha256: str = Field(primary_key=True, max_length=64)
+    ruta: str
+    tamano: int
+    referencias: int = 0
+    fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+
+class SubidaParcial(SQLModel, table=True):
+    """Subida por partes en curso (ver app.subidas).
+
+    `recibido` es el número de bytes confirmados: el cliente reanuda desde ahí.
+    """
+    id: str = Field(primary_key=True, max_length=32)
+    proyecto_id: int = Field(foreign_key="proyecto.id", index=True)
+    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id")
+    descripcion: Optional[str] = None
+    nombre_archivo: str
+    tamano_total: int
+    recibido: int = 0
+    sha256: Optional[str] = Field(default=None, max_length=64)  # Hash esperado del archivo completo (opcional)
+    fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+    fecha_actualizacion: datetime = Field(default_factory=datetime.utcnow)
+
 class Calificacion(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_calificacion_proyecto_estudiante_fecha", "proyecto_id", "estudiante_id", "fecha_calificacion"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     proyecto_id: int = Field(foreign_key="proyecto.id")
-    profesor_id: int = Field(foreign_key="profesor.id")
-    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id")
-    version_id: Optional[int] = Field(default=None, foreign_key="proyectoversion.id")
+    profesor_id: int = Field(foreign_key="profesor.id", index=True)
+    estudiante_id: Optional[int] = Field(default=None, foreign_key="estudiante.id", index=True)
+    version_id: Optional[int] = Field(default=None, foreign_key="proyectoversion.id", index=True)
     puntaje: float
     comentarios: Optional[str] = None
     fecha_calificacion: datetime = Field(default_factory=datetime.utcnow)
@@ -55,23 +122,59 @@ class Curso(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     nombre: str
     descripcion: Optional[str] = None
-    profesor_id: int = Field(foreign_key="profesor.id")
+    profesor_id: int = Field(foreign_key="profesor.id", index=True)
     fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
 
 
 class CursoEstudiante(SQLModel, table=True):
     """Tabla de asociación entre cursos y estudiantes"""
+    __table_args__ = (
+        Index("ux_cursoestudiante_curso_estudiante", "curso_id", "estudiante_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     curso_id: int = Field(foreign_key="curso.id")
-    estudiante_id: int = Field(foreign_key="estudiante.id")
+    estudiante_id: int = Field(foreign_key="estudiante.id", index=True)
 
 
 class Tarea(SQLModel, table=True):
     """Tarea/assignment asociada a un curso"""
     id: Optional[int] = Field(default=None, primary_key=True)
-    curso_id: int = Field(foreign_key="curso.id")
+    curso_id: int = Field(foreign_key="curso.id", index=True)
     titulo: str
     descripcion: Optional[str] = None
     fecha_entrega: Optional[datetime] = None
     archivo_path: Optional[str] = None
     fecha_creacion: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ResumenProyectoEstudiante(SQLModel, table=True):
+    """Resumen por (estudiante, proyecto) mantenido al escribir (ver app.desempeno).
+
+    `calificacion` es la vigente: la última propia del estudiante o, si no tiene,
+    la última general del proyecto (`calificacion_propia` lo distingue).
+    """
+    estudiante_id: int = Field(foreign_key="estudiante.id", primary_key=True)
+    proyecto_id: int = Field(foreign_key="proyecto.id", primary_key=True, index=True)
+    curso_id: Optional[int] = Field(default=None, foreign_key="curso.id")
+    total_versiones: int = 0
+    calificacion: Optional[float] = None
+    calificacion_propia: bool = False
+    fecha_calificacion: Optional[datetime] = None
+
+
+class DesempenoAgregado(SQLModel, table=True):
+    """Totales de desempeño por estudiante y curso (ver app.desempeno).
+
+    `curso_id = 0` guarda el total del estudiante en todos sus proyectos.
+    """
+    estudiante_id: int = Field(foreign_key="estudiante.id", primary_key=True)
+    curso_id: int = Field(default=0, primary_key=True)
+    total_proyectos: int = 0
+    proyectos_calificados: int = 0
+    suma_calificaciones: float = 0
+    proyectos_aprobados: int = 0
+    calificacion_mas_alta: Optional[float] = None
+    calificacion_mas_baja: Optional[float] = None
+    total_versiones: int = 0
+    fecha_actualizacion: datetime = Field(default_factory=datetime.utcnow)
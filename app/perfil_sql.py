@@ -0,0 +1,123 @@
+"""Número de sentencias SQL y tiempo de base de datos por petición.
+
+`instrumentar(engine)` engancha `before/after_cursor_execute` del motor (síncrono o el
+`sync_engine` del asíncrono) y `MedirConsultasSQL` (middleware ASGI) abre una medición
+por petición en un ContextVar: las sentencias ejecutadas en el threadpool o en el
+event loop mientras se atiende la petición se suman a ella.
+
+Cada respuesta lleva `Server-Timing: db;dur=<ms>;desc="<n> sentencias"` y `X-DB-Queries`.
+Si una ruta supera su presupuesto de sentencias (`SQL_PRESUPUESTO`, o el indicado con
+`@presupuesto_sql(n)` en el endpoint) se escribe un aviso, lo que delata bucles N+1.
+Con `SQL_PRESUPUESTO_ESTRICTO=1` (pruebas) la sentencia que excede el presupuesto
+lanza `PresupuestoSQLExcedido`, con el traceback apuntando al bucle culpable.
+"""
+import contextvars
+import os
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.metrics import REGISTRO
+from app.telemetria import plantilla_ruta
+
+SQL_PRESUPUESTO = int(os.environ.get("SQL_PRESUPUESTO", "20"))
+SQL_PRESUPUESTO_ESTRICTO = os.environ.get("SQL_PRESUPUESTO_ESTRICTO", "").lower() in ("1", "true", "yes")
+
+_SENTENCIAS = REGISTRO.histograma(
+    "http_db_statements", "SQL statements per request", buckets=(1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+_EXCEDIDOS = REGISTRO.contador("http_db_budget_exceeded_total", "Requests over their SQL statement budget")
+
+
+class PresupuestoSQLExcedido(RuntimeError):
+    pass
+
+
+class _Medicion:
+    __slots__ = ("scope", "sentencias", "segundos")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.sentencias = 0
+        self.segundos = 0.0
+
+    @property
+    def ruta(self) -> str:
+        return plantilla_ruta(self.scope)
+
+    @property
+    def presupuesto(self) -> int:
+        return getattr(self.scope.get("endpoint"), "_presupuesto_sql", SQL_PRESUPUESTO)
+
+
+_medicion: contextvars.ContextVar[Optional[_Medicion]] = contextvars.ContextVar("medicion_sql", default=None)
+
+
+def presupuesto_sql(sentencias: int):
+    """Decorador de endpoint: presupuesto propio para rutas que legítimamente hacen más consultas."""
+    def decorar(endpoint):
+        endpoint._presupuesto_sql = sentencias
+        return endpoint
+    return decorar
+
+
+def instrumentar(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        medicion = _medicion.get()
+        if medicion is None:
+            return
+        medicion.sentencias += 1
+        if SQL_PRESUPUESTO_ESTRICTO and medicion.sentencias > medicion.presupuesto:
+            raise PresupuestoSQLExcedido(
+                f"{medicion.ruta}: {medicion.sentencias} sentencias SQL (presupuesto {medicion.presupuesto}); "
+                f"la última: {statement[:200]}"
+            )
+        conn.info["perfil_sql_inicio"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        medicion = _medicion.get()
+        inicio = conn.info.pop("perfil_sql_inicio", None)
+        if medicion is not None and inicio is not None:
+            medicion.segundos += time.perf_counter() - inicio
+
+
+class MedirConsultasSQL:
+    """Middleware ASGI puro (no envuelve el cuerpo: las respuestas en streaming no se retrasan)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        medicion = _Medicion(scope)
+        token = _medicion.set(medicion)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                _cerrar(medicion)
+                cabeceras = list(mensaje.get("headers", []))
+                cabeceras.append((b"server-timing", (
+                    f'db;dur={medicion.segundos * 1000:.1f};desc="{medicion.sentencias} sentencias"'
+                ).encode()))
+                cabeceras.append((b"x-db-queries", str(medicion.sentencias).encode()))
+                mensaje = {**mensaje, "headers": cabeceras}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion.reset(token)
+
+
+def _cerrar(medicion: _Medicion):
+    ruta = medicion.ruta
+    _SENTENCIAS.observe(medicion.sentencias, ruta=ruta)
+    if medicion.sentencias > medicion.presupuesto:
+        _EXCEDIDOS.inc(ruta=ruta)
+        print(f"WARNING: {ruta} ejecutó {medicion.sentencias} sentencias SQL "
+              f"(presupuesto {medicion.presupuesto}, {medicion.segundos * 1000:.1f} ms en BD)", file=sys.stderr)
@@ -89,3 +89,20 @@ class TareaResponse(BaseModel):
     descripcion: Optional[str]
     fecha_entrega: Optional[datetime]
     fecha_creacion: datetime
+
+
+class SubidaCreate(BaseModel):
+    nombre_archivo: str
+    tamano: int
+    descripcion: Optional[str] = None
+    sha256: Optional[str] = None  # Hash del archivo completo; si se indica, se verifica al finalizar
+
+
+class SubidaEstado(BaseModel):
+    id: str
+    proyecto_id: int
+    nombre_archivo: str
+    tamano_total: int
+    recibido: int
+    tamano_bloque_max: int
+    expira: datetime
@@ -0,0 +1,153 @@
+"""Subidas por partes (reanudables) para archivos grandes.
+
+Protocolo:
+1. `POST /proyectos/{id}/subidas` crea la sesión de subida (nombre, tamaño total y, opcional, SHA-256).
+2. `PUT /subidas/{id}?offset=N` envía un bloque como cuerpo binario. Si viene la cabecera
+   `X-Chunk-Sha256`, el bloque se verifica antes de aceptarlo.
+3. `GET /subidas/{id}` devuelve los bytes recibidos: tras un corte, el cliente reanuda desde ahí.
+4. `POST /subidas/{id}/finalizar` une los bloques en el almacén (app.almacen) y crea la ProyectoVersion.
+
+Cada bloque se guarda como `UPLOAD_DIR/parciales/<id>/<offset>`. El avance (`SubidaParcial.recibido`)
+solo se confirma con un UPDATE condicional sobre el offset esperado, así que dos reintentos del
+mismo bloque no pueden pisarse: uno gana y el otro recibe 409.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from typing import List
+
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import REGISTRO
+from app.uploads import UPLOAD_DIR, ArchivoDemasiadoGrande
+
+DIR_PARCIALES = UPLOAD_DIR / "parciales" if UPLOAD_DIR is not None else None
+
+# Tamaño máximo de cada bloque: acota la memoria y el tiempo de cada petición
+MAX_CHUNK_BYTES = int(os.environ.get("MAX_CHUNK_BYTES", str(16 * 1024 * 1024)))
+# Las subidas sin actividad durante este tiempo se descartan
+EXPIRACION_SUBIDA = timedelta(hours=int(os.environ.get("SUBIDA_EXPIRACION_HORAS", "24")))
+
+_BLOQUES = REGISTRO.contador("upload_chunks_total", "Chunked upload PUT requests by result")
+
+
+class BloqueInvalido(Exception):
+    pass
+
+
+class BloqueFaltante(Exception):
+    """Falta un bloque en disco; `offset` es el primer byte que hay que volver a enviar."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Falta el bloque que empieza en el byte {offset}")
+        self.offset = offset
+
+
+def directorio(subida_id: str) -> Path:
+    return DIR_PARCIALES / subida_id
+
+
+def crear_directorio(subida_id: str):
+    directorio(subida_id).mkdir(parents=True, exist_ok=True)
+
+
+def eliminar(subida_id: str):
+    shutil.rmtree(directorio(subida_id), ignore_errors=True)
+
+
+def _ruta_bloque(subida_id: str, offset: int) -> Path:
+    return directorio(subida_id) / f"{offset:020d}"
+
+
+async def recibir_bloque(subida_id: str, stream, max_bytes: int, sha_esperado: str = None):
+    """Escribe el cuerpo de la petición (`request.stream()`) en un archivo temporal del bloque.
+
+    Devuelve (ruta temporal, tamaño). Lanza ArchivoDemasiadoGrande si se supera `max_bytes`
+    y BloqueInvalido si el bloque está vacío o no coincide con `sha_esperado`.
+    """
+    fd, tmp = tempfile.mkstemp(dir=directorio(subida_id), prefix=".bloque-")
+    sha = hashlib.sha256()
+    tamano = 0
+    try:
+        with os.fdopen(fd, "wb") as out_f:
+            async for trozo in stream:
+                if not trozo:
+                    continue
+                tamano += len(trozo)
+                if tamano > max_bytes:
+                    raise ArchivoDemasiadoGrande(f"El bloque supera el tamaño máximo permitido ({max_bytes} bytes)")
+                sha.update(trozo)
+                await run_in_threadpool(out_f.write, trozo)
+        if tamano == 0:
+            raise BloqueInvalido("El bloque está vacío")
+        if sha_esperado and sha.hexdigest() != sha_esperado.strip().lower():
+            raise BloqueInvalido("El SHA-256 del bloque no coincide con X-Chunk-Sha256")
+    except BaseException as e:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        _BLOQUES.inc(resultado="rechazado" if isinstance(e, Exception) else "cancelado")
+        raise
+    return Path(tmp), tamano
+
+
+def confirmar_bloque(tmp: Path, subida_id: str, offset: int):
+    """Da nombre definitivo al bloque una vez confirmado su offset en la base de datos."""
+    os.replace(tmp, _ruta_bloque(subida_id, offset))
+    _BLOQUES.inc(resultado="aceptado")
+
+
+def descartar_bloque(tmp: Path):
+    try:
+        os.unlink(tmp)
+    except OSError:
+        pass
+    _BLOQUES.inc(resultado="conflicto")
+
+
+def bloques(subida_id: str, tamano_total: int) -> List[Path]:
+    """Rutas de los bloques en orden; lanza BloqueFaltante si no cubren el archivo sin huecos."""
+    rutas = []
+    offset = 0
+    while offset < tamano_total:
+        ruta = _ruta_bloque(subida_id, offset)
+        try:
+            tamano = ruta.stat().st_size
+        except OSError:
+            raise BloqueFaltante(offset)
+        if tamano == 0:
+            raise BloqueFaltante(offset)
+        rutas.append(ruta)
+        offset += tamano
+    if offset != tamano_total:
+        raise BloqueFaltante(0)
+    return rutas
+
+
+class LectorBloques:
+    """Objeto tipo archivo (solo `read`) que encadena los bloques, para `recibir_upload`."""
+
+    def __init__(self, rutas: List[Path]):
+        self._rutas = list(rutas)
+        self._actual = None
+
+    def read(self, n: int = -1) -> bytes:
+        while True:
+            if self._actual is None:
+                if not self._rutas:
+                    return b""
+                self._actual = self._rutas.pop(0).open("rb")
+            datos = self._actual.read(n)
+            if datos:
+                return datos
+            self._actual.close()
+            self._actual = None
+
+    def close(self):
+        if self._actual is not None:
+            self._actual.close()
+            self._actual = None
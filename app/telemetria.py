@@ -0,0 +1,57 @@
+"""Métricas HTTP por ruta: peticiones, latencia y peticiones en curso.
+
+`MedirPeticiones` es un middleware ASGI puro: no envuelve el cuerpo, así que las
+descargas y exportaciones en streaming no se retrasan, y la latencia medida llega
+hasta el último bloque enviado. Las rutas se agrupan por su plantilla
+(`GET /proyectos/{proyecto_id}`), no por la URL concreta, para que el número de
+series no crezca con los ids; lo que no corresponde a ninguna ruta va a "(sin ruta)".
+"""
+import time
+
+from app.metrics import REGISTRO
+
+_PETICIONES = REGISTRO.contador("http_requests_total", "HTTP requests by route template and status code")
+_DURACION = REGISTRO.histograma("http_request_duration_seconds", "HTTP request latency until the last body chunk")
+_EN_CURSO = REGISTRO.medidor("http_requests_in_progress", "HTTP requests being served")
+
+_PLANTILLAS = {}
+
+
+def plantilla_ruta(scope) -> str:
+    """`MÉTODO /ruta/{param}` declarada del endpoint que atendió la petición."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return f"{scope.get('method', '')} (sin ruta)"
+    if endpoint not in _PLANTILLAS:
+        rutas = getattr(scope.get("app"), "routes", [])
+        _PLANTILLAS[endpoint] = next(
+            (r.path for r in rutas if getattr(r, "endpoint", None) is endpoint), scope.get("path", "")
+        )
+    return f"{scope.get('method', '')} {_PLANTILLAS[endpoint]}"
+
+
+class MedirPeticiones:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        estado = 500
+        inicio = time.perf_counter()
+        _EN_CURSO.inc()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            _EN_CURSO.dec()
+            ruta = plantilla_ruta(scope)
+            _PETICIONES.inc(ruta=ruta, status=estado)
+            _DURACION.observe(duracion, ruta=ruta)
@@ -0,0 +1,121 @@
+"""Subsistema de subida de archivos.
+
+Todas las rutas que reciben archivos guardan a través de `guardar_upload`, que copia
+el contenido en bloques grandes calculando a la vez el SHA-256 y el tamaño, aplica
+el límite de tamaño configurado y escribe de forma atómica (archivo temporal en el
+mismo directorio + rename), de modo que nunca queda un archivo a medio escribir con
+el nombre definitivo.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from starlette.responses import JSONResponse
+
+from app.metrics import REGISTRO
+
+# Carpeta donde se guardan los archivos subidos.
+# Intentamos crearla en orden: variable env -> /tmp/uploads. Si ninguna es escribible,
+# deshabilitamos temporalmente el soporte de uploads para evitar que la app falle al importar.
+UPLOAD_DIR = None
+_preferred = os.environ.get("UPLOAD_DIR") or "./uploads"
+try:
+    p = Path(_preferred)
+    p.mkdir(parents=True, exist_ok=True)
+    UPLOAD_DIR = p
+except Exception:
+    try:
+        p = Path("/tmp/uploads")
+        p.mkdir(parents=True, exist_ok=True)
+        UPLOAD_DIR = p
+    except Exception:
+        UPLOAD_DIR = None
+        print("WARNING: uploads disabled — cannot create upload directory.", file=sys.stderr)
+
+# Tamaño máximo por archivo (bytes) y tamaño de bloque de copia
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+# Margen para las cabeceras multipart y los demás campos del formulario
+_MARGEN_MULTIPART = 1024 * 1024
+
+_BYTES_SUBIDOS = REGISTRO.contador("upload_bytes_total", "Bytes written to disk by uploads")
+_DURACION_SUBIDA = REGISTRO.histograma("upload_duration_seconds", "Time to stream one uploaded file to disk")
+_THROUGHPUT_SUBIDA = REGISTRO.histograma(
+    "upload_throughput_bytes_per_second", "Per-file upload write throughput",
+    buckets=(256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9),
+)
+_RECHAZADOS = REGISTRO.contador("upload_rejected_total", "Uploads rejected for exceeding MAX_UPLOAD_BYTES")
+
+
+class ArchivoDemasiadoGrande(Exception):
+    pass
+
+
+class ArchivoGuardado(NamedTuple):
+    path: Path
+    sha256: str
+    tamano: int
+
+
+def recibir_upload(origen, directorio: Path, max_bytes: int = None) -> ArchivoGuardado:
+    """Copia `origen` (file-like) a un archivo temporal dentro de `directorio` en una sola pasada.
+
+    Devuelve la ruta temporal con su SHA-256 y tamaño; el llamador decide el nombre
+    definitivo (rename atómico). Lanza ArchivoDemasiadoGrande si se supera `max_bytes`
+    (MAX_UPLOAD_BYTES por defecto); en ese caso no queda nada escrito en disco.
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    inicio = time.perf_counter()
+    sha = hashlib.sha256()
+    tamano = 0
+    fd, tmp = tempfile.mkstemp(dir=directorio, prefix=".subida-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out_f:
+            while True:
+                bloque = origen.read(CHUNK_SIZE)
+                if not bloque:
+                    break
+                tamano += len(bloque)
+                if tamano > max_bytes:
+                    _RECHAZADOS.inc()
+                    raise ArchivoDemasiadoGrande(f"El archivo supera el tamaño máximo permitido ({max_bytes} bytes)")
+                sha.update(bloque)
+                out_f.write(bloque)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    duracion = time.perf_counter() - inicio
+    _BYTES_SUBIDOS.inc(tamano)
+    _DURACION_SUBIDA.observe(duracion)
+    if duracion > 0:
+        _THROUGHPUT_SUBIDA.observe(tamano / duracion)
+    return ArchivoGuardado(path=Path(tmp), sha256=sha.hexdigest(), tamano=tamano)
+
+
+def guardar_upload(origen, destino: Path, max_bytes: int = None) -> ArchivoGuardado:
+    """Copia el archivo `origen` (file-like) en `destino` de forma atómica."""
+    destino = Path(destino)
+    recibido = recibir_upload(origen, destino.parent, max_bytes)
+    os.replace(recibido.path, destino)
+    return recibido._replace(path=destino)
+
+
+async def limitar_tamano_subida(request, call_next):
+    """Middleware: rechaza con 413 antes de leer el cuerpo si Content-Length ya excede el límite."""
+    if request.method in ("POST", "PUT"):
+        longitud = request.headers.get("content-length")
+        if longitud and longitud.isdigit() and int(longitud) > MAX_UPLOAD_BYTES + _MARGEN_MULTIPART:
+            _RECHAZADOS.inc()
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"El archivo supera el tamaño máximo permitido ({MAX_UPLOAD_BYTES} bytes)"}
+            )
+    return await call_next(request)
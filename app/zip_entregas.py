@@ -0,0 +1,99 @@
+"""ZIP de entregas generado al vuelo.
+
+El archivo se escribe con `zipfile` sobre una salida no posicionable: cada bloque
+comprimido se entrega al cliente en cuanto se produce, así que la memoria usada es
+constante (un bloque) y no se crea ninguna copia temporal en disco, sea cual sea
+el tamaño total. Los archivos se guardan sin comprimir (ZIP_STORED): las entregas
+suelen ser ya .zip/.pdf/.docx y recomprimirlas solo gastaría CPU.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from app.metrics import REGISTRO
+from app.uploads import CHUNK_SIZE
+
+_BYTES_ZIP = REGISTRO.contador("zip_export_bytes_total", "Bytes streamed by submission ZIP exports")
+
+COLUMNAS_MANIFIESTO = [
+    "proyecto_id", "proyecto", "estudiante_id", "estudiante", "email", "version_id", "numero_version",
+    "es_version_actual", "fecha_subida", "archivo_zip", "tamano", "sha256", "calificacion", "comentarios",
+]
+
+
+class EntradaZip(NamedTuple):
+    """Un archivo a incluir en el ZIP y su fila del manifiesto."""
+    ruta_zip: str
+    origen: Optional[Path]  # None si la versión no tiene archivo o no se encontró
+    fila: dict
+
+
+class _Salida(io.RawIOBase):
+    """Salida no posicionable que acumula lo escrito hasta que el generador lo recoge."""
+
+    def __init__(self):
+        self._pendiente = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        if datos:
+            self._pendiente.append(bytes(datos))
+        return len(datos)
+
+    def recoger(self) -> bytes:
+        datos = b"".join(self._pendiente)
+        self._pendiente.clear()
+        return datos
+
+
+def nombre_seguro(texto: str, maximo: int = 80) -> str:
+    """Segmento de ruta apto para el ZIP (sin separadores ni caracteres problemáticos)."""
+    limpio = re.sub(r"[^\w.\- ]+", "_", str(texto), flags=re.UNICODE).strip(" .")
+    return (limpio or "_")[:maximo]
+
+
+def manifiesto_csv(filas: Iterable[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_MANIFIESTO, extrasaction="ignore")
+    writer.writeheader()
+    for fila in filas:
+        writer.writerow(fila)
+    # BOM para que Excel abra el CSV como UTF-8
+    return ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+
+def generar_zip(entradas: List[EntradaZip], nombre_manifiesto: str = "manifiesto.csv") -> Iterator[bytes]:
+    """Genera el ZIP por bloques: primero los archivos y al final el manifiesto CSV."""
+    salida = _Salida()
+    with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for entrada in entradas:
+            if entrada.origen is None:
+                continue
+            try:
+                origen = entrada.origen.open("rb")
+            except OSError:
+                entrada.fila["archivo_zip"] = "(archivo no encontrado)"
+                continue
+            with origen:
+                fecha = datetime.fromtimestamp(entrada.origen.stat().st_mtime)
+                info = zipfile.ZipInfo(entrada.ruta_zip, date_time=fecha.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                with zf.open(info, mode="w", force_zip64=True) as destino:
+                    for bloque in iter(lambda: origen.read(CHUNK_SIZE), b""):
+                        destino.write(bloque)
+                        datos = salida.recoger()
+                        if datos:
+                            _BYTES_ZIP.inc(len(datos))
+                            yield datos
+
+        info = zipfile.ZipInfo(nombre_manifiesto, date_time=datetime.now().timetuple()[:6])
+        zf.writestr(info, manifiesto_csv(e.fila for e in entradas), compress_type=zipfile.ZIP_DEFLATED)
+    datos = salida.recoger()
+    _BYTES_ZIP.inc(len(datos))
+    yield datos
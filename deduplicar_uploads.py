@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Script to move the existing version files of UPLOAD_DIR into the content-addressed
+store (UPLOAD_DIR/objetos), keeping a single copy of each distinct content.
+Run migrate_columnas.py first. Safe to run several times.
+
+It then removes orphan objects: contents no version uses any more, and files left in
+the store by uploads whose transaction was rolled back (the file is moved into the
+store before the commit). Reference counts are recomputed in a single UPDATE, so
+uploads committing meanwhile keep their references. Files without a row are only
+removed once older than --antiguedad minutes, so uploads in progress are not touched.
+Run this with: python deduplicar_uploads.py [--dry-run] [--antiguedad 60]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import delete, func, update
+from sqlmodel import Session, select
+
+from app import almacen
+from app.database import DATABASE_URL, engine, init_db
+from app.models.models import ArchivoContenido, ProyectoVersion
+from app.uploads import CHUNK_SIZE
+
+
+def hash_archivo(path: Path) -> str:
+    sha = hashlib.sha256()
+    with path.open("rb") as f:
+        for bloque in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def recontar_referencias(session):
+    """Recalcula `referencias` a partir de las versiones que apuntan a cada contenido.
+
+    Es una sola sentencia UPDATE con la cuenta como subconsulta, no una lectura seguida
+    de escrituras: así una subida que confirma entre medias no pierde su referencia.
+    En SQLite la sentencia se ejecuta con la base bloqueada para escritura. En MySQL
+    (InnoDB) bloquea las filas de `archivocontenido` y lee `proyectoversion` con bloqueo
+    compartido. Una subida que ya sumó su referencia sin confirmar hace esperar al
+    UPDATE; una que llega después espera a que termine el script.
+    """
+    cuenta = (
+        select(func.count())
+        .select_from(ProyectoVersion)
+        .where(ProyectoVersion.hash_archivo == ArchivoContenido.sha256)
+        .scalar_subquery()
+    )
+    session.exec(
+        update(ArchivoContenido).values(referencias=cuenta).execution_options(synchronize_session=False)
+    )
+
+
+def limpiar_huerfanos(session, antiguedad: float, dry_run: bool = False):
+    """Borra los objetos del almacén que ninguna versión usa. Devuelve (archivos, bytes).
+
+    Primero las filas sin referencias (tras `recontar_referencias`), con un DELETE
+    condicionado para no llevarse una que otra subida acabe de reutilizar; los archivos
+    se borran después del commit. Luego los archivos sin fila (subidas deshechas) y los
+    temporales abandonados, solo si llevan más de `antiguedad` segundos sin cambios.
+    """
+    borrar = []
+    for contenido in session.exec(select(ArchivoContenido).where(ArchivoContenido.referencias <= 0)).all():
+        if dry_run or session.exec(
+            delete(ArchivoContenido)
+            .where(ArchivoContenido.sha256 == contenido.sha256, ArchivoContenido.referencias <= 0)
+        ).rowcount:
+            borrar.append(Path(contenido.ruta))
+    if not dry_run:
+        session.commit()
+
+    conocidos = set(session.exec(select(ArchivoContenido.sha256)).all())
+    limite = time.time() - antiguedad
+    for path in almacen.DIR_OBJETOS.rglob("*"):
+        if not path.is_file() or path in borrar:
+            continue
+        temporal = path.name.startswith(".")
+        if (temporal or path.name not in conocidos) and path.stat().st_mtime < limite:
+            borrar.append(path)
+
+    archivos = tamano = 0
+    for path in borrar:
+        try:
+            tamano_archivo = path.stat().st_size
+            if not dry_run:
+                path.unlink()
+        except OSError:
+            continue
+        archivos += 1
+        tamano += tamano_archivo
+    return archivos, tamano
+
+
+def run_backfill(dry_run: bool = False, antiguedad: float = 3600):
+    print(f"Connecting to database: {DATABASE_URL}")
+    if almacen.DIR_OBJETOS is None:
+        raise SystemExit("❌ UPLOAD_DIR no está disponible")
+    init_db()
+    almacen.DIR_OBJETOS.mkdir(parents=True, exist_ok=True)
+
+    movidos = duplicados = faltantes = 0
+    bytes_liberados = 0
+    antiguos = set()
+    vistos = set()
+
+    with Session(engine) as session:
+        versiones = session.exec(
+            select(ProyectoVersion).where(ProyectoVersion.archivo_path.is_not(None)).order_by(ProyectoVersion.id)
+        ).all()
+        for v in versiones:
+            if almacen.es_objeto(v.archivo_path):
+                continue
+            path = Path(v.archivo_path)
+            if not path.exists():
+                faltantes += 1
+                print(f"⚠ Versión {v.id}: no existe {path}")
+                continue
+
+            sha = hash_archivo(path)
+            tamano = path.stat().st_size
+            if almacen.ruta_objeto(sha).exists() or sha in vistos:
+                duplicados += 1
+                bytes_liberados += tamano
+            else:
+                movidos += 1
+            vistos.add(sha)
+            if dry_run:
+                continue
+
+            # Copia temporal dentro del almacén y rename atómico; el original se borra al final
+            fd, tmp = tempfile.mkstemp(dir=almacen.DIR_OBJETOS, prefix=".backfill-")
+            os.close(fd)
+            shutil.copyfile(path, tmp)
+            guardado = almacen.incorporar(session, Path(tmp), sha, tamano)
+            v.nombre_archivo = v.nombre_archivo or almacen.nombre_original(path.name)
+            v.archivo_path = str(guardado.path)
+            v.hash_archivo = sha
+            v.tamano_archivo = tamano
+            session.add(v)
+            antiguos.add(path)
+
+        if not dry_run:
+            session.flush()
+            recontar_referencias(session)
+            session.commit()
+            for path in antiguos:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    print(f"⚠ No se pudo borrar {path}: {e}")
+
+        huerfanos, bytes_huerfanos = limpiar_huerfanos(session, antiguedad, dry_run)
+
+    accion = "Se moverían" if dry_run else "Movidos"
+    print(f"\n{accion} {movidos} archivos únicos al almacén; {duplicados} copias duplicadas "
+          f"({bytes_liberados / (1024 * 1024):.1f} MiB liberados); {faltantes} archivos no encontrados.")
+    accion = "Se borrarían" if dry_run else "Borrados"
+    print(f"{accion} {huerfanos} objetos huérfanos ({bytes_huerfanos / (1024 * 1024):.1f} MiB).")
+    print("\n✅ Backfill completed successfully!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="solo informar, sin mover ni borrar archivos")
+    parser.add_argument("--antiguedad", type=float, default=60,
+                        help="minutos sin cambios para borrar un archivo huérfano (default 60)")
+    args = parser.parse_args()
+    run_backfill(dry_run=args.dry_run, antiguedad=args.antiguedad * 60)
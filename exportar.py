@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script to export every grade (calificacion) or submitted version (proyectoversion)
+as CSV or NDJSON, streaming rows with a server-side cursor so memory stays constant.
+Run this with:
+  python exportar.py calificaciones --formato csv --curso-id 3 -o calificaciones.csv
+  python exportar.py versiones --formato ndjson --desde 2025-01-01T00:00:00 > versiones.ndjson
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from app import exportar
+from app.database import engine
+
+
+def run(tipo: str, formato: str, salida, **filtros):
+    statement = exportar.SENTENCIAS[tipo](**filtros)
+    with engine.connect() as conn:
+        for trozo in exportar.exportar(conn, statement, formato):
+            salida.write(trozo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tipo", choices=sorted(exportar.SENTENCIAS))
+    parser.add_argument("--formato", choices=sorted(exportar.FORMATOS), default="csv")
+    parser.add_argument("--curso-id", type=int)
+    parser.add_argument("--profesor-id", type=int)
+    parser.add_argument("--desde", type=datetime.fromisoformat, help="fecha ISO inicial (incluida)")
+    parser.add_argument("--hasta", type=datetime.fromisoformat, help="fecha ISO final (incluida)")
+    parser.add_argument("-o", "--salida", help="archivo de salida (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    filtros = dict(curso_id=args.curso_id, profesor_id=args.profesor_id, desde=args.desde, hasta=args.hasta)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8", newline="") as f:
+            run(args.tipo, args.formato, f, **filtros)
+        print(f"✅ Export written to {args.salida}", file=sys.stderr)
+    else:
+        run(args.tipo, args.formato, sys.stdout, **filtros)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script to add the nullable columns declared in app/models/models.py that are
+missing from an existing database (SQLite or MySQL), e.g. proyectoversion.hash_archivo.
+Safe to run several times. New tables are created by init_db on API startup.
+Run this with: python migrate_columnas.py
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+from app.models.models import SQLModel
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./plataforma_proyectos.db")
+
+
+def run_migration():
+    print(f"Connecting to database: {DATABASE_URL}")
+    engine = create_engine(DATABASE_URL)
+
+    try:
+        with engine.begin() as connection:
+            print("Running column migration...")
+            inspector = inspect(connection)
+            tablas = set(inspector.get_table_names())
+            preparer = engine.dialect.identifier_preparer
+
+            for table in SQLModel.metadata.sorted_tables:
+                if table.name not in tablas:
+                    continue
+                existentes = {c["name"] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existentes:
+                        continue
+                    if not column.nullable:
+                        print(f"⚠ {table.name}.{column.name} es NOT NULL; añádela manualmente con un valor por defecto")
+                        continue
+                    tipo = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(
+                        f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} {tipo} NULL"
+                    ))
+                    print(f"✓ Column '{table.name}.{column.name}' added")
+
+            print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        raise
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script to fill the cuenta table (email -> role, user id, see app/models/models.py)
+from the existing estudiante and profesor tables. Login and registration only look
+at cuenta, so run it once after upgrading. Safe to run several times.
+Run this with: python migrate_cuentas.py
+
+An email present in both tables can only keep one account: the student one wins,
+as it did with the previous login, and the professor rows are listed so they can
+be given another email.
+"""
+
+import os
+from sqlalchemy import create_engine, text
+
+from app.models.models import Cuenta
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./plataforma_proyectos.db")
+
+ROLES = [("estudiante", "estudiante"), ("profesor", "profesor")]
+
+
+def run_migration():
+    print(f"Connecting to database: {DATABASE_URL}")
+    engine = create_engine(DATABASE_URL)
+
+    try:
+        with engine.begin() as connection:
+            print("Running accounts migration...")
+            Cuenta.__table__.create(bind=connection, checkfirst=True)
+
+            for tabla, rol in ROLES:
+                result = connection.execute(text(f"""
+                    INSERT INTO cuenta (email, rol, usuario_id)
+                    SELECT u.email, '{rol}', u.id FROM {tabla} u
+                    WHERE u.email IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM cuenta c WHERE c.email = u.email)
+                """))
+                print(f"✓ {result.rowcount} cuentas de {tabla} añadidas")
+
+            conflictos = connection.execute(text("""
+                SELECT p.id, p.email FROM profesor p
+                JOIN cuenta c ON c.email = p.email AND c.rol <> 'profesor'
+                ORDER BY p.id
+            """)).fetchall()
+            for profesor_id, email in conflictos:
+                print(f"⚠ profesor {profesor_id} ({email}): el email ya es de un estudiante; "
+                      "no podrá iniciar sesión hasta cambiarlo")
+
+            huerfanas = connection.execute(text("""
+                SELECT COUNT(*) FROM cuenta c
+                WHERE (c.rol = 'estudiante' AND NOT EXISTS (
+                          SELECT 1 FROM estudiante e WHERE e.id = c.usuario_id AND e.email = c.email))
+                   OR (c.rol = 'profesor' AND NOT EXISTS (
+                          SELECT 1 FROM profesor p WHERE p.id = c.usuario_id AND p.email = c.email))
+            """)).fetchone()[0]
+            if huerfanas:
+                print(f"⚠ {huerfanas} cuentas apuntan a usuarios que ya no existen o cambiaron de email")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        raise
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Script to create the secondary/composite indexes declared in app/models/models.py
+on an existing database (SQLite or MySQL). Safe to run several times.
+Run this with: python migrate_indices.py
+
+Prints the EXPLAIN plan of the hot queries before and after the migration.
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+from app.models.models import SQLModel
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./plataforma_proyectos.db")
+
+# Consultas representativas de los accesos más frecuentes de la API
+CONSULTAS_EXPLAIN = [
+    ("login estudiante", "SELECT * FROM estudiante WHERE email = 'alguien@ejemplo.com'"),
+    ("login profesor", "SELECT * FROM profesor WHERE email = 'alguien@ejemplo.com'"),
+    ("proyectos de un curso", "SELECT * FROM proyecto WHERE curso_id = 1"),
+    ("inscripción en curso", "SELECT * FROM cursoestudiante WHERE curso_id = 1 AND estudiante_id = 1"),
+    ("versiones de un estudiante",
+     "SELECT * FROM proyectoversion WHERE proyecto_id = 1 AND estudiante_id = 1 ORDER BY numero_version DESC"),
+    ("última calificación",
+     "SELECT * FROM calificacion WHERE proyecto_id = 1 AND estudiante_id = 1 "
+     "ORDER BY fecha_calificacion DESC LIMIT 1"),
+]
+
+
+def explain(connection, dialect):
+    prefix = "EXPLAIN QUERY PLAN" if dialect == "sqlite" else "EXPLAIN"
+    tablas = set(inspect(connection).get_table_names())
+    for nombre, sql in CONSULTAS_EXPLAIN:
+        tabla = sql.split(" FROM ")[1].split()[0]
+        if tabla not in tablas:
+            continue
+        print(f"  - {nombre}")
+        try:
+            for fila in connection.execute(text(f"{prefix} {sql}")):
+                print(f"      {tuple(fila)}")
+        except Exception as e:
+            print(f"      (no disponible: {e.orig if hasattr(e, 'orig') else e})")
+
+
+def indices_existentes(inspector, tabla):
+    """Devuelve {tupla_de_columnas: es_unico} con los índices ya presentes en la tabla."""
+    existentes = {}
+    for idx in inspector.get_indexes(tabla):
+        cols = tuple(idx["column_names"])
+        existentes[cols] = existentes.get(cols, False) or bool(idx.get("unique"))
+    for uq in inspector.get_unique_constraints(tabla):
+        existentes[tuple(uq["column_names"])] = True
+    pk = inspector.get_pk_constraint(tabla).get("constrained_columns") or []
+    if pk:
+        existentes[tuple(pk)] = True
+    return existentes
+
+
+def indices_no_unicos(inspector, tabla, columnas):
+    return [idx["name"] for idx in inspector.get_indexes(tabla)
+            if tuple(idx["column_names"]) == columnas and not idx.get("unique")]
+
+
+def reemplazar_por_unico(connection, dialect, tabla, idx, anteriores):
+    columnas = ", ".join(c.name for c in idx.columns)
+    if dialect == "mysql":
+        # En una sola sentencia: MySQL no deja borrar un índice que usa una clave foránea
+        # hasta que hay otro que lo sustituya
+        cambios = [f"DROP INDEX {nombre}" for nombre in anteriores]
+        cambios.append(f"ADD UNIQUE INDEX {idx.name} ({columnas})")
+        connection.execute(text(f"ALTER TABLE {tabla} {', '.join(cambios)}"))
+        return
+    for nombre in anteriores:
+        connection.execute(text(f"DROP INDEX {nombre}"))
+    idx.create(bind=connection)
+
+
+def tiene_duplicados(connection, tabla, columnas):
+    cols = ", ".join(columnas)
+    no_nulos = " AND ".join(f"{c} IS NOT NULL" for c in columnas)
+    result = connection.execute(text(f"""
+        SELECT COUNT(*) FROM (
+            SELECT {cols} FROM {tabla} WHERE {no_nulos}
+            GROUP BY {cols} HAVING COUNT(*) > 1
+        ) duplicados
+    """))
+    return result.fetchone()[0] > 0
+
+
+def run_migration():
+    print(f"Connecting to database: {DATABASE_URL}")
+    engine = create_engine(DATABASE_URL)
+    dialect = engine.dialect.name
+
+    try:
+        with engine.connect() as connection:
+            print("\nEXPLAIN antes de la migración:")
+            explain(connection, dialect)
+
+        with engine.begin() as connection:
+            print("\nRunning index migration...")
+            inspector = inspect(connection)
+            tablas = set(inspector.get_table_names())
+
+            for table in SQLModel.metadata.sorted_tables:
+                if table.name not in tablas:
+                    print(f"  (Tabla '{table.name}' no existe todavía; la creará init_db)")
+                    continue
+                existentes = indices_existentes(inspector, table.name)
+                columnas_tabla = {c["name"] for c in inspector.get_columns(table.name)}
+                for idx in sorted(table.indexes, key=lambda i: i.name):
+                    columnas = tuple(c.name for c in idx.columns)
+                    if not set(columnas) <= columnas_tabla:
+                        print(f"⚠ {idx.name}: faltan columnas en {table.name}; ejecuta antes migrate_columnas.py")
+                        continue
+                    if columnas in existentes and (existentes[columnas] or not idx.unique):
+                        print(f"✓ {table.name}{columnas} ya está indexado")
+                        continue
+                    if idx.unique and tiene_duplicados(connection, table.name, columnas):
+                        print(f"⚠ {idx.name}: hay valores duplicados en {table.name}{columnas}; "
+                              "corrígelos y vuelve a ejecutar el script")
+                        continue
+                    if columnas in existentes:
+                        # Índice no único con las mismas columnas: se reemplaza por el único
+                        reemplazar_por_unico(connection, dialect, table.name, idx,
+                                             indices_no_unicos(inspector, table.name, columnas))
+                        print(f"✓ Index {idx.name} upgraded to unique")
+                        continue
+                    idx.create(bind=connection)
+                    print(f"✓ Index {idx.name} created")
+
+        with engine.connect() as connection:
+            print("\nEXPLAIN después de la migración:")
+            explain(connection, dialect)
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        raise
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the performance aggregate tables (ResumenProyectoEstudiante and
+DesempenoAgregado, see app/desempeno.py) from proyecto, proyectoversion and calificacion.
+Run it once after upgrading, and with --check periodically to detect drift.
+Run this with: python recalcular_desempeno.py [--check]
+"""
+
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from app import desempeno
+from app.database import DATABASE_URL, engine, init_db
+
+
+def run(check: bool = False):
+    print(f"Connecting to database: {DATABASE_URL}")
+    init_db()
+
+    with Session(engine) as session:
+        resumenes = desempeno.calcular_resumenes(session)
+        agregados = desempeno.calcular_agregados(resumenes)
+        diferencias = desempeno.comparar(session, resumenes, agregados)
+
+        for linea in diferencias[:50]:
+            print(f"⚠ {linea}")
+        if len(diferencias) > 50:
+            print(f"... y {len(diferencias) - 50} diferencias más")
+        print(f"\n{len(resumenes)} resúmenes y {len(agregados)} agregados esperados; "
+              f"{len(diferencias)} diferencias con lo guardado.")
+
+        if check:
+            return 1 if diferencias else 0
+
+        desempeno.reconstruir(session, resumenes, agregados)
+        session.commit()
+        print("\n✅ Aggregates rebuilt successfully!")
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="solo comparar; sale con código 1 si hay desviaciones")
+    args = parser.parse_args()
+    sys.exit(run(check=args.check))
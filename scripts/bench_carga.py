@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Load test: drives the main endpoints of a running API at several concurrency levels
+and writes throughput and latency percentiles to JSON.
+
+Uses the data and manifest created by scripts/generar_datos.py (same DATABASE_URL and
+UPLOAD_DIR as the server). Scenarios:
+
+  login           POST /auth/login
+  subir_version   POST /proyectos/{id}/versiones (student token, real file)
+  entregas_curso  GET  /cursos/{id}/entregas
+  descarga        GET  /proyectos/{id}/versiones/{id}/archivo
+  reporte         GET  /reportes/desempeño/estudiante/{id}
+
+Each result file records the commit it was measured on; --comparar prints the change
+against an earlier result file and exits with status 1 if a scenario got slower or
+lost throughput by more than --umbral percent.
+
+Run this with:
+  python scripts/bench_carga.py --url http://127.0.0.1:8000 --manifiesto bench_datos.json \\
+      [--concurrencia 1,8,32] [--duracion 10] [--salida resultados.json] [--comparar base.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+ESCENARIOS = ("login", "subir_version", "entregas_curso", "descarga", "reporte")
+# Estudiantes que inician sesión antes de medir las subidas
+MAX_TOKENS = 50
+
+
+class Escenario:
+    """Genera peticiones aleatorias (reproducibles con la semilla) de un tipo."""
+
+    def __init__(self, nombre: str, manifiesto: dict, tokens: dict, tamano_subida: int):
+        self.nombre = nombre
+        self.manifiesto = manifiesto
+        self.tokens = tokens
+        self.tamano_subida = tamano_subida
+
+    def peticion(self, cliente: httpx.Client, rng: random.Random) -> httpx.Response:
+        m = self.manifiesto
+        if self.nombre == "login":
+            estudiante = rng.choice(m["estudiantes"])
+            return cliente.post("/auth/login", data={"email": estudiante["email"], "password": m["password"]})
+        if self.nombre == "subir_version":
+            estudiante_id, token = rng.choice(list(self.tokens.items()))
+            estudiante = next(e for e in m["estudiantes"] if e["id"] == estudiante_id)
+            return cliente.post(
+                f"/proyectos/{rng.choice(estudiante['asignaciones'])}/versiones",
+                data={"descripcion": "bench_carga"},
+                files={"file": ("bench.pdf", rng.randbytes(self.tamano_subida), "application/pdf")},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        if self.nombre == "entregas_curso":
+            return cliente.get(f"/cursos/{rng.choice(m['cursos'])}/entregas")
+        if self.nombre == "descarga":
+            proyecto_id, version_id = rng.choice(m["versiones"])
+            return cliente.get(f"/proyectos/{proyecto_id}/versiones/{version_id}/archivo")
+        if self.nombre == "reporte":
+            return cliente.get(f"/reportes/desempeño/estudiante/{rng.choice(m['estudiantes'])['id']}")
+        raise ValueError(self.nombre)
+
+
+def _percentil(ordenados: list, q: float) -> float:
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+def ejecutar(url: str, escenario: Escenario, concurrencia: int, duracion: float, semilla: int) -> dict:
+    """`concurrencia` clientes lanzan peticiones sin pausa durante `duracion` segundos."""
+    latencias, errores = [], {}
+    lock = threading.Lock()
+    fin = time.perf_counter() + duracion
+
+    def trabajador(n: int):
+        rng = random.Random(f"{semilla}-{escenario.nombre}-{concurrencia}-{n}")
+        propias, fallos = [], {}
+        with httpx.Client(base_url=url, timeout=60) as cliente:
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    r = escenario.peticion(cliente, rng)
+                    codigo = r.status_code
+                except httpx.HTTPError as e:
+                    codigo = type(e).__name__
+                propias.append(time.perf_counter() - inicio)
+                if not isinstance(codigo, int) or codigo >= 400:
+                    fallos[str(codigo)] = fallos.get(str(codigo), 0) + 1
+        with lock:
+            latencias.extend(propias)
+            for codigo, n in fallos.items():
+                errores[codigo] = errores.get(codigo, 0) + n
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        list(pool.map(trabajador, range(concurrencia)))
+    transcurrido = time.perf_counter() - inicio
+
+    ordenadas = sorted(latencias)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+    return {
+        "escenario": escenario.nombre,
+        "concurrencia": concurrencia,
+        "peticiones": len(ordenadas),
+        "errores": errores,
+        "rps": round(len(ordenadas) / transcurrido, 1),
+        "latencia_ms": {
+            "media": ms(sum(ordenadas) / len(ordenadas)) if ordenadas else None,
+            "p50": ms(_percentil(ordenadas, 0.50)),
+            "p90": ms(_percentil(ordenadas, 0.90)),
+            "p95": ms(_percentil(ordenadas, 0.95)),
+            "p99": ms(_percentil(ordenadas, 0.99)),
+            "max": ms(ordenadas[-1] if ordenadas else None),
+        },
+    }
+
+
+def obtener_tokens(url: str, manifiesto: dict, semilla: int) -> dict:
+    candidatos = [e for e in manifiesto["estudiantes"] if e["asignaciones"]]
+    elegidos = random.Random(semilla).sample(candidatos, min(MAX_TOKENS, len(candidatos)))
+    tokens = {}
+    with httpx.Client(base_url=url, timeout=60) as cliente:
+        for e in elegidos:
+            r = cliente.post("/auth/login", data={"email": e["email"], "password": manifiesto["password"]})
+            r.raise_for_status()
+            tokens[e["id"]] = r.json()["access_token"]
+    return tokens
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados: list, base: dict, umbral: float) -> bool:
+    """Imprime la variación frente a `base`; True si hay alguna regresión por encima del umbral."""
+    anteriores = {(r["escenario"], r["concurrencia"]): r for r in base["resultados"]}
+    print(f"\nComparison with {base.get('commit') or '?'} ({base.get('fecha', '?')}):")
+    regresion = False
+    for r in resultados:
+        b = anteriores.get((r["escenario"], r["concurrencia"]))
+        if b is None or not b["rps"] or not b["latencia_ms"]["p95"] or not r["latencia_ms"]["p95"]:
+            continue
+        d_rps = 100 * (r["rps"] - b["rps"]) / b["rps"]
+        d_p95 = 100 * (r["latencia_ms"]["p95"] - b["latencia_ms"]["p95"]) / b["latencia_ms"]["p95"]
+        peor = d_rps < -umbral or d_p95 > umbral
+        regresion |= peor
+        print(f"  {'⚠' if peor else ' '} {r['escenario']:15} c={r['concurrencia']:<4} "
+              f"rps {b['rps']:8.1f} -> {r['rps']:8.1f} ({d_rps:+6.1f}%)  "
+              f"p95 {b['latencia_ms']['p95']:8.2f} -> {r['latencia_ms']['p95']:8.2f} ms ({d_p95:+6.1f}%)")
+    return regresion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.environ.get("API_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--manifiesto", default="bench_datos.json")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    parser.add_argument("--concurrencia", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duracion", type=float, default=10, help="seconds per scenario and level")
+    parser.add_argument("--tamano-subida", type=int, default=64 * 1024, help="bytes per uploaded version")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=None, help="result file (default bench_<commit>_<time>.json)")
+    parser.add_argument("--comparar", default=None, help="earlier result file to compare with")
+    parser.add_argument("--umbral", type=float, default=10, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    manifiesto = json.loads(Path(args.manifiesto).read_text())
+    escenarios = [e for e in args.escenarios.split(",") if e]
+    for e in escenarios:
+        if e not in ESCENARIOS:
+            parser.error(f"unknown scenario {e!r} (choose from {', '.join(ESCENARIOS)})")
+    if "descarga" in escenarios and not manifiesto["versiones"]:
+        print("⚠ The manifest has no versions with files; skipping 'descarga'")
+        escenarios.remove("descarga")
+    niveles = [int(c) for c in args.concurrencia.split(",")]
+
+    tokens = obtener_tokens(args.url, manifiesto, args.semilla) if "subir_version" in escenarios else {}
+    commit = _commit()
+    resultados = []
+    print(f"Load test against {args.url} (commit {commit or '?'}), {args.duracion:g} s per level")
+    for nombre in escenarios:
+        escenario = Escenario(nombre, manifiesto, tokens, args.tamano_subida)
+        for concurrencia in niveles:
+            r = ejecutar(args.url, escenario, concurrencia, args.duracion, args.semilla)
+            resultados.append(r)
+            lat = r["latencia_ms"]
+            errores = sum(r["errores"].values())
+            print(f"  {nombre:15} c={concurrencia:<4} {r['rps']:8.1f} req/s  p50 {lat['p50']} ms  "
+                  f"p95 {lat['p95']} ms  p99 {lat['p99']} ms" + (f"  ⚠ {errores} errors {r['errores']}" if errores else ""))
+
+    salida = args.salida or f"bench_{commit or 'sin-commit'}_{datetime.utcnow():%Y%m%d%H%M%S}.json"
+    Path(salida).write_text(json.dumps({
+        "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit,
+        "url": args.url,
+        "datos": {
+            "prefijo": manifiesto["prefijo"],
+            "estudiantes": len(manifiesto["estudiantes"]),
+            "cursos": len(manifiesto["cursos"]),
+            "versiones_con_archivo": len(manifiesto["versiones"]),
+        },
+        "parametros": {"duracion": args.duracion, "tamano_subida": args.tamano_subida, "semilla": args.semilla},
+        "resultados": resultados,
+    }, indent=2))
+    print(f"\n✅ Results written to {salida}")
+
+    if args.comparar and comparar(resultados, json.loads(Path(args.comparar).read_text()), args.umbral):
+        print(f"❌ Regression above {args.umbral:g}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
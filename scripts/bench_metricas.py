@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: overhead of the request telemetry middlewares (app.telemetria.MedirPeticiones
+and app.perfil_sql.MedirConsultasSQL) relative to real request latency.
+
+1. Times a no-op ASGI endpoint bare and wrapped in both middlewares: the difference
+   is the per-request cost of the metrics.
+2. Times real requests (GET /proyectos/{id}, GET /cursos/{id}/estudiantes) through the
+   full app against a throwaway SQLite database, in process (no network).
+3. Times rendering /metrics in Prometheus text format.
+
+Exits with status 1 if the overhead exceeds --limite percent of the median latency.
+Run this with: python scripts/bench_metricas.py [--iteraciones 20000] [--peticiones 500] [--limite 2]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db?check_same_thread=false"
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp())
+os.environ.setdefault("HASH_WORKERS", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import main, perfil_sql, telemetria  # noqa: E402
+from app.metrics import REGISTRO  # noqa: E402
+
+
+async def _recibir():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _enviar(mensaje):
+    pass
+
+
+async def _endpoint_vacio(scope, receive, send):
+    # Lo que hace el router: anotar el endpoint para que se resuelva la plantilla de la ruta
+    scope["endpoint"] = main.obtener_proyecto
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def medir_middleware(iteraciones: int) -> float:
+    """Coste por petición (segundos) de los middlewares de métricas."""
+    envuelto = telemetria.MedirPeticiones(perfil_sql.MedirConsultasSQL(_endpoint_vacio))
+
+    async def correr(aplicacion):
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            scope = {"type": "http", "method": "GET", "path": "/proyectos/1", "headers": [], "app": main.app}
+            await aplicacion(scope, _recibir, _enviar)
+        return (time.perf_counter() - inicio) / iteraciones
+
+    sin = asyncio.run(correr(_endpoint_vacio))
+    con = asyncio.run(correr(envuelto))
+    return max(0.0, con - sin)
+
+
+def medir_peticiones(client: TestClient, url: str, n: int) -> list:
+    tiempos = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        r = client.get(url)
+        tiempos.append(time.perf_counter() - inicio)
+        if r.status_code != 200:
+            raise RuntimeError(f"{url}: {r.status_code} {r.text[:200]}")
+    return tiempos
+
+
+def preparar(client: TestClient):
+    """Profesor, curso con 30 estudiantes inscritos y una asignación con archivo."""
+    def registrar(email, rol):
+        r = client.post("/auth/registro", data={
+            "nombre": "Bench", "apellido": "Test", "email": email, "password": "bench", "rol": rol,
+        })
+        r.raise_for_status()
+        return r.json()["id"]
+
+    profesor_id = registrar("bench-profesor@ejemplo.com", "profesor")
+    curso_id = client.post("/cursos", json={"nombre": "Bench", "profesor_id": profesor_id}).json()["id"]
+    for i in range(30):
+        estudiante_id = registrar(f"bench-{i}@ejemplo.com", "estudiante")
+        client.post(f"/cursos/{curso_id}/estudiantes", json={"curso_id": curso_id, "estudiante_id": estudiante_id})
+    proyecto_id = client.post("/asignaciones", data={
+        "titulo": "Bench", "descripcion": "Bench", "curso_id": curso_id, "profesor_id": profesor_id,
+    }, files={"file": ("bench.pdf", b"%PDF-1.4 bench")}).json()["id"]
+    return curso_id, proyecto_id
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iteraciones", type=int, default=20000, help="calls of the no-op endpoint")
+    parser.add_argument("--peticiones", type=int, default=500, help="real requests per route")
+    parser.add_argument("--limite", type=float, default=2.0, help="max overhead, percent of median latency")
+    args = parser.parse_args()
+
+    with TestClient(main.app) as client:
+        curso_id, proyecto_id = preparar(client)
+        rutas = [f"/proyectos/{proyecto_id}", f"/cursos/{curso_id}/estudiantes"]
+        latencias = {url: medir_peticiones(client, url, args.peticiones) for url in rutas}
+        metricas = medir_peticiones(client, "/metrics", 50)
+
+    overhead = medir_middleware(args.iteraciones)
+    series = sum(1 for linea in REGISTRO.prometheus().splitlines() if not linea.startswith("#"))
+    print(f"Metrics middleware overhead: {overhead * 1e6:.1f} µs/request ({args.iteraciones} calls)")
+    peor = 0.0
+    for url, tiempos in latencias.items():
+        mediana = statistics.median(tiempos)
+        porcentaje = 100 * overhead / mediana
+        peor = max(peor, porcentaje)
+        print(f"  GET {url:32} median {mediana * 1e3:7.2f} ms  p95 "
+              f"{statistics.quantiles(tiempos, n=20)[-1] * 1e3:7.2f} ms  overhead {porcentaje:5.2f}%")
+    etiqueta = f"/metrics ({series} samples)"
+    print(f"  GET {etiqueta:32} median {statistics.median(metricas) * 1e3:7.2f} ms")
+
+    if peor > args.limite:
+        print(f"❌ Overhead {peor:.2f}% above the {args.limite:g}% limit")
+        sys.exit(1)
+    print(f"✅ Overhead below {args.limite:g}% of request latency")
+
+
+if __name__ == "__main__":
+    main_()
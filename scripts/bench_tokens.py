@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: bearer token decoding with and without the verified-token cache
+(app.auth.decode_access_token vs decode_access_token_cached).
+
+Simulates a set of clients polling the API with their tokens: each iteration
+decodes one of `--clientes` tokens. Prints the cost per decode of both paths.
+Run this with: python scripts/bench_tokens.py [--iteraciones 20000] [--clientes 50]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import auth  # noqa: E402
+
+
+def medir(funcion, tokens, iteraciones: int) -> float:
+    inicio = time.perf_counter()
+    for i in range(iteraciones):
+        if not funcion(tokens[i % len(tokens)]):
+            raise RuntimeError("token no válido")
+    return (time.perf_counter() - inicio) / iteraciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iteraciones", type=int, default=20000)
+    parser.add_argument("--clientes", type=int, default=50)
+    args = parser.parse_args()
+
+    tokens = [
+        auth.create_access_token({"sub": f"usuario{i}@ejemplo.com", "id": i, "role": "estudiante"})
+        for i in range(args.clientes)
+    ]
+    auth.cache_tokens.limpiar()
+
+    sin_cache = medir(auth.decode_access_token, tokens, args.iteraciones)
+    con_cache = medir(auth.decode_access_token_cached, tokens, args.iteraciones)
+
+    print(f"{args.iteraciones} decodificaciones, {args.clientes} tokens distintos "
+          f"(caché de {auth.TOKEN_CACHE_SIZE} entradas, TTL {auth.TOKEN_CACHE_TTL:g} s)")
+    print(f"  sin caché: {sin_cache * 1e6:8.1f} µs/token")
+    print(f"  con caché: {con_cache * 1e6:8.1f} µs/token  ({sin_cache / con_cache:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
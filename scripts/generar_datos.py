@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Synthetic school data generator for load tests and benchmarks.
+
+Fills the database configured by DATABASE_URL (SQLite or MySQL) with professors,
+courses, students, enrollments, course assignments, versions with real files (stored
+in the content-addressed store under UPLOAD_DIR, like real uploads) and grades, then
+rebuilds the performance aggregates. The same --semilla always produces the same data.
+All emails carry --prefijo, so several data sets can live in the same database.
+
+Writes a manifest (JSON) with the ids and the password used by scripts/bench_carga.py.
+Run this with: python scripts/generar_datos.py [--estudiantes 500] [--manifiesto bench_datos.json]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlmodel import Session  # noqa: E402
+
+from app import almacen, desempeno  # noqa: E402
+from app.auth import get_password_hash  # noqa: E402
+from app.database import DATABASE_URL, engine, init_db  # noqa: E402
+from app.models.models import (  # noqa: E402
+    Calificacion, Cuenta, Curso, CursoEstudiante, Estudiante, Profesor, Proyecto, ProyectoVersion,
+)
+
+# Filas por flush al insertar en bloque
+LOTE = 500
+
+
+def _insertar(session, filas: list) -> list:
+    for i in range(0, len(filas), LOTE):
+        session.add_all(filas[i:i + LOTE])
+        session.flush()
+    return filas
+
+
+def _guardar_archivo(session, rng: random.Random, tamano: int):
+    """Contenido aleatorio (distinto en cada versión) guardado como una subida real."""
+    contenido = rng.randbytes(tamano)
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    almacen.DIR_OBJETOS.mkdir(parents=True, exist_ok=True)
+    tmp = almacen.DIR_OBJETOS / f".seed-{uuid.uuid4().hex}"
+    tmp.write_bytes(contenido)
+    return almacen.incorporar(session, tmp, sha256, tamano)
+
+
+def generar(args) -> dict:
+    rng = random.Random(args.semilla)
+    ahora = datetime.utcnow().replace(microsecond=0)
+    password_hash = get_password_hash(args.password)
+    con_archivos = almacen.DIR_OBJETOS is not None and args.tamano_archivo > 0
+    if not con_archivos:
+        print("⚠ UPLOAD_DIR is not writable (or --tamano-archivo 0): versions are created without files")
+
+    # Sin expirar en cada commit: los objetos creados se siguen usando para las filas siguientes
+    with Session(engine, expire_on_commit=False) as session:
+        if session.get(Cuenta, f"{args.prefijo}-prof0@ejemplo.com"):
+            raise SystemExit(f"❌ The database already has data with prefix '{args.prefijo}'; use another --prefijo")
+
+        print("Creating users and courses...")
+        profesores = _insertar(session, [
+            Profesor(nombre="Profesor", apellido=str(i), email=f"{args.prefijo}-prof{i}@ejemplo.com",
+                     password_hash=password_hash)
+            for i in range(args.profesores)
+        ])
+        estudiantes = _insertar(session, [
+            Estudiante(nombre="Estudiante", apellido=str(i), email=f"{args.prefijo}-est{i}@ejemplo.com",
+                       password_hash=password_hash)
+            for i in range(args.estudiantes)
+        ])
+        _insertar(session, [Cuenta(email=p.email, rol="profesor", usuario_id=p.id) for p in profesores] +
+                  [Cuenta(email=e.email, rol="estudiante", usuario_id=e.id) for e in estudiantes])
+        cursos = _insertar(session, [
+            Curso(nombre=f"{args.prefijo} curso {p.id}-{j}", profesor_id=p.id)
+            for p in profesores for j in range(args.cursos_por_profesor)
+        ])
+
+        inscripciones = {
+            e.id: rng.sample(cursos, min(args.cursos_por_estudiante, len(cursos))) for e in estudiantes
+        }
+        _insertar(session, [
+            CursoEstudiante(curso_id=c.id, estudiante_id=est_id)
+            for est_id, cursos_est in inscripciones.items() for c in cursos_est
+        ])
+
+        asignaciones = {}
+        for c in cursos:
+            asignaciones[c.id] = _insertar(session, [
+                Proyecto(titulo=f"Tarea {j + 1}", descripcion="Generada por generar_datos.py", curso_id=c.id,
+                         profesor_id=c.profesor_id, fecha_entrega=ahora + timedelta(days=rng.randint(-30, 30)))
+                for j in range(args.asignaciones_por_curso)
+            ])
+        session.commit()
+
+        print("Creating versions and grades...")
+        manifiesto_estudiantes, versiones_manifiesto = [], []
+        n_versiones = n_calificaciones = bytes_archivos = 0
+        for e in estudiantes:
+            propias = []
+            for c in inscripciones[e.id]:
+                for asignacion in asignaciones[c.id]:
+                    propias.append(asignacion.id)
+                    if rng.random() >= args.entregan:
+                        continue
+                    total = rng.randint(1, args.versiones)
+                    fecha = ahora - timedelta(days=rng.randint(1, 60), seconds=rng.randint(0, 86400))
+                    versiones = []
+                    for numero in range(1, total + 1):
+                        guardado = _guardar_archivo(session, rng, args.tamano_archivo) if con_archivos else None
+                        versiones.append(ProyectoVersion(
+                            proyecto_id=asignacion.id, estudiante_id=e.id, numero_version=numero,
+                            descripcion=f"Entrega {numero}",
+                            archivo_path=str(guardado.path) if guardado else None,
+                            nombre_archivo=f"entrega_v{numero}.pdf" if guardado else None,
+                            tamano_archivo=guardado.tamano if guardado else None,
+                            hash_archivo=guardado.sha256 if guardado else None,
+                            fecha_subida=fecha + timedelta(hours=numero),
+                            es_version_actual=numero == total,
+                        ))
+                        bytes_archivos += guardado.tamano if guardado else 0
+                    _insertar(session, versiones)
+                    asignacion.version_actual = max(asignacion.version_actual, total)
+                    session.add(asignacion)
+                    n_versiones += total
+                    if con_archivos:
+                        versiones_manifiesto.append([asignacion.id, versiones[-1].id])
+                    if rng.random() < args.calificadas:
+                        session.add(Calificacion(
+                            proyecto_id=asignacion.id, profesor_id=asignacion.profesor_id, estudiante_id=e.id,
+                            version_id=versiones[-1].id, puntaje=round(rng.uniform(1.0, 5.0), 1),
+                            comentarios="Calificación generada", fecha_calificacion=fecha + timedelta(days=2),
+                        ))
+                        n_calificaciones += 1
+            manifiesto_estudiantes.append({"id": e.id, "email": e.email, "asignaciones": propias})
+            session.commit()
+
+        print("Rebuilding performance aggregates...")
+        resumenes = desempeno.calcular_resumenes(session)
+        desempeno.reconstruir(session, resumenes, desempeno.calcular_agregados(resumenes))
+        session.commit()
+
+    print(f"✓ {len(profesores)} profesores, {len(cursos)} cursos, {len(estudiantes)} estudiantes, "
+          f"{sum(len(v) for v in inscripciones.values())} inscripciones, "
+          f"{sum(len(v) for v in asignaciones.values())} asignaciones")
+    print(f"✓ {n_versiones} versiones ({bytes_archivos / 1e6:.1f} MB de archivos), {n_calificaciones} calificaciones")
+    return {
+        "prefijo": args.prefijo,
+        "semilla": args.semilla,
+        "password": args.password,
+        "profesores": [{"id": p.id, "email": p.email} for p in profesores],
+        "cursos": [c.id for c in cursos],
+        "estudiantes": manifiesto_estudiantes,
+        "versiones": versiones_manifiesto,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profesores", type=int, default=10)
+    parser.add_argument("--cursos-por-profesor", type=int, default=3)
+    parser.add_argument("--estudiantes", type=int, default=300)
+    parser.add_argument("--cursos-por-estudiante", type=int, default=3, help="enrollments per student")
+    parser.add_argument("--asignaciones-por-curso", type=int, default=5)
+    parser.add_argument("--entregan", type=float, default=0.8, help="share of assignments with submissions")
+    parser.add_argument("--versiones", type=int, default=3, help="max versions per submission")
+    parser.add_argument("--calificadas", type=float, default=0.6, help="share of submissions graded")
+    parser.add_argument("--tamano-archivo", type=int, default=32 * 1024, help="bytes per version file (0: none)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--prefijo", default=None, help="email prefix (default bench<semilla>)")
+    parser.add_argument("--password", default="bench1234")
+    parser.add_argument("--manifiesto", default="bench_datos.json")
+    args = parser.parse_args()
+    args.prefijo = args.prefijo or f"bench{args.semilla}"
+
+    print(f"Connecting to database: {DATABASE_URL}")
+    init_db()
+    inicio = time.perf_counter()
+    manifiesto = generar(args)
+    Path(args.manifiesto).write_text(json.dumps(manifiesto))
+    print(f"\n✅ Data generated in {time.perf_counter() - inicio:.1f} s; manifest written to {args.manifiesto}")
+
+
+if __name__ == "__main__":
+    main()
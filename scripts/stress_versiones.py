@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for version numbering (crud.siguiente_numero_version).
+
+Several threads (or processes) register versions of the same project for the same
+student at once, then the script checks that there are no duplicate or missing
+version numbers and that exactly one version per student is marked as current.
+
+Run this with: python scripts/stress_versiones.py [--workers 8] [--subidas 25] [--procesos]
+
+Without DATABASE_URL it uses a throwaway SQLite file; with DATABASE_URL (e.g. MySQL)
+it creates its own professor, students and projects in that database.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress.db"
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp())
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlmodel import Session, func, select  # noqa: E402
+
+from app.database import DATABASE_URL, engine, init_db  # noqa: E402
+from app.main import _registrar_version  # noqa: E402
+from app.models.models import Curso, Estudiante, Profesor, Proyecto, ProyectoVersion  # noqa: E402
+
+REINTENTOS = 20
+
+
+def preparar(n_estudiantes: int):
+    """Crea un profesor, un curso con una asignación y un proyecto directo por estudiante."""
+    sufijo = uuid.uuid4().hex[:8]
+    with Session(engine) as session:
+        profesor = Profesor(nombre="Stress", apellido="Test", email=f"stress-{sufijo}@ejemplo.com")
+        session.add(profesor)
+        session.commit()
+        curso = Curso(nombre=f"Stress {sufijo}", profesor_id=profesor.id)
+        session.add(curso)
+        estudiantes = [
+            Estudiante(nombre="Est", apellido=str(i), email=f"stress-{sufijo}-{i}@ejemplo.com")
+            for i in range(n_estudiantes)
+        ]
+        session.add_all(estudiantes)
+        session.commit()
+        asignacion = Proyecto(titulo="Asignación", curso_id=curso.id, profesor_id=profesor.id)
+        session.add(asignacion)
+        directos = [Proyecto(titulo="Directo", estudiante_id=e.id, profesor_id=profesor.id) for e in estudiantes]
+        session.add_all(directos)
+        session.commit()
+        return asignacion.id, [(d.id, e.id) for d, e in zip(directos, estudiantes)], [e.id for e in estudiantes]
+
+
+def subir(proyecto_id: int, estudiante_id: int) -> int:
+    """Registra una versión en su propia transacción; reintenta si la base está bloqueada."""
+    for intento in range(REINTENTOS):
+        with Session(engine) as session:
+            try:
+                proyecto = session.get(Proyecto, proyecto_id)
+                version = _registrar_version(session, proyecto, estudiante_id, "stress", None, None)
+                session.commit()
+                return version.numero_version
+            except OperationalError:
+                # SQLite: "database is locked" si la espera supera el timeout; MySQL: deadlock
+                session.rollback()
+                time.sleep(0.01 * (intento + 1))
+    raise RuntimeError(f"No se pudo registrar la versión de ({proyecto_id}, {estudiante_id})")
+
+
+def verificar(proyecto_id: int, estudiante_id: int, esperadas: int) -> list:
+    with Session(engine) as session:
+        filas = session.exec(
+            select(ProyectoVersion.numero_version, ProyectoVersion.es_version_actual).where(
+                ProyectoVersion.proyecto_id == proyecto_id, ProyectoVersion.estudiante_id == estudiante_id
+            )
+        ).all()
+    numeros = Counter(n for n, _ in filas)
+    errores = [f"({proyecto_id}, {estudiante_id}) número {n} repetido {c} veces" for n, c in numeros.items() if c > 1]
+    if sorted(numeros) != list(range(1, esperadas + 1)):
+        errores.append(f"({proyecto_id}, {estudiante_id}) números {sorted(numeros)} != 1..{esperadas}")
+    actuales = [n for n, actual in filas if actual]
+    if actuales != [esperadas]:
+        errores.append(f"({proyecto_id}, {estudiante_id}) versiones actuales {actuales} != [{esperadas}]")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--subidas", type=int, default=25, help="versiones por (proyecto, estudiante)")
+    parser.add_argument("--estudiantes", type=int, default=3)
+    parser.add_argument("--procesos", action="store_true", help="procesos en lugar de hilos")
+    args = parser.parse_args()
+
+    print(f"Connecting to database: {DATABASE_URL}")
+    init_db()
+    asignacion_id, directos, estudiantes = preparar(args.estudiantes)
+    pares = [(asignacion_id, e) for e in estudiantes] + directos
+    tareas = [par for par in pares for _ in range(args.subidas)]
+
+    executor = ProcessPoolExecutor if args.procesos else ThreadPoolExecutor
+    opciones = {"initializer": engine.dispose} if args.procesos else {}
+    inicio = time.perf_counter()
+    with executor(max_workers=args.workers, **opciones) as pool:
+        list(pool.map(subir, *zip(*tareas)))
+    duracion = time.perf_counter() - inicio
+
+    errores = [e for p, est in pares for e in verificar(p, est, args.subidas)]
+    with Session(engine) as session:
+        total = session.exec(
+            select(func.count()).select_from(ProyectoVersion)
+            .where(ProyectoVersion.proyecto_id.in_([p for p, _ in pares]))
+        ).one()
+    print(f"{len(tareas)} versiones en {duracion:.2f} s con {args.workers} "
+          f"{'procesos' if args.procesos else 'hilos'}; {total} guardadas")
+    for error in errores[:50]:
+        print(f"⚠ {error}")
+    if errores:
+        print(f"\n❌ {len(errores)} problemas de numeración")
+        return 1
+    print("\n✅ Sin números duplicados ni huecos; una versión actual por estudiante")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 # Small integration test script for the API (happy path).
 # Requires: curl, jq
+# Progress messages go to stderr so that the functions' stdout is just the JSON response.
 # Usage: ./test_endpoints.sh [API_URL]
 # Example: ./test_endpoints.sh http://127.0.0.1:8000
 
@@ -11,7 +12,7 @@ echo "Using API: $API_URL"
 
 function register() {
   local email=$1; local password=$2; local nombre=$3; local apellido=$4; local rol=$5
-  echo "\nRegistering $rol: $email"
+  echo -e "\nRegistering $rol: $email" >&2
   curl -s -X POST "$API_URL/auth/registro" \
     -F "email=$email" \
     -F "password=$password" \
@@ -21,24 +22,38 @@ function register() {
 }
 
 function create_project() {
-  local titulo=$1; local descripcion=$2; local estudiante_id=$3; local profesor_id=$4; local fecha_entrega=$5; local nombre_archivo=$6; local comentarios_version=$7
-  echo "\nCreating project: $titulo"
+  # /proyectos takes multipart/form-data (optional initial file in "file")
+  local titulo=$1; local descripcion=$2; local estudiante_id=$3; local profesor_id=$4; local fecha_entrega=$5; local archivo=$6; local comentarios_version=$7
+  echo -e "\nCreating project: $titulo" >&2
   curl -s -X POST "$API_URL/proyectos" \
-    -H 'Content-Type: application/json' \
-    -d "{\"titulo\":\"$titulo\",\"descripcion\":\"$descripcion\",\"estudiante_id\":$estudiante_id,\"profesor_id\":$profesor_id,\"fecha_entrega\":\"$fecha_entrega\",\"nombre_archivo\":\"$nombre_archivo\",\"comentarios_version\":\"$comentarios_version\"}" | jq .
+    -F "titulo=$titulo" \
+    -F "descripcion=$descripcion" \
+    -F "estudiante_id=$estudiante_id" \
+    -F "profesor_id=$profesor_id" \
+    -F "fecha_entrega=$fecha_entrega" \
+    -F "comentarios_version=$comentarios_version" \
+    -F "file=@$archivo" | jq .
+}
+
+function login() {
+  local email=$1; local password=$2
+  curl -s -X POST "$API_URL/auth/login" \
+    -F "email=$email" \
+    -F "password=$password" | jq -r '.access_token'
 }
 
 function upload_version() {
-  local proyecto_id=$1; local descripcion=$2
-  echo "\nUploading version to project $proyecto_id"
+  local proyecto_id=$1; local descripcion=$2; local archivo=$3; local token=$4
+  echo -e "\nUploading version to project $proyecto_id" >&2
   curl -s -X POST "$API_URL/proyectos/$proyecto_id/versiones" \
-    -H 'Content-Type: application/x-www-form-urlencoded' \
-    -d "descripcion=$descripcion" | jq .
+    -H "Authorization: Bearer $token" \
+    -F "descripcion=$descripcion" \
+    -F "file=@$archivo" | jq .
 }
 
 function grade_project() {
   local proyecto_id=$1; local profesor_id=$2; local puntaje=$3; local comentarios=$4
-  echo "\nGrading project $proyecto_id by profesor $profesor_id"
+  echo -e "\nGrading project $proyecto_id by profesor $profesor_id" >&2
   curl -s -X POST "$API_URL/calificaciones" \
     -H 'Content-Type: application/json' \
     -d "{\"proyecto_id\":$proyecto_id,\"profesor_id\":$profesor_id,\"puntaje\":$puntaje,\"comentarios\":\"$comentarios\"}" | jq .
@@ -46,7 +61,7 @@ function grade_project() {
 
 function get_report() {
   local estudiante_id=$1
-  echo "\nGetting report for estudiante $estudiante_id"
+  echo -e "\nGetting report for estudiante $estudiante_id" >&2
   curl -s "$API_URL/reportes/desempeño/estudiante/$estudiante_id" | jq .
 }
 
@@ -62,26 +77,34 @@ prof_json=$(register "$TEACHER_EMAIL" "$PASSWORD" "Profesor" "Uno" "profesor")
 student_id=$(echo "$student_json" | jq -r '.id')
 prof_id=$(echo "$prof_json" | jq -r '.id')
 
-echo "\nRegistered student id: $student_id, professor id: $prof_id"
+echo -e "\nRegistered student id: $student_id, professor id: $prof_id"
+
+# Sample files for the initial upload and the new version
+tmp_dir=$(mktemp -d)
+trap 'rm -rf "$tmp_dir"' EXIT
+echo "Primera entrega" > "$tmp_dir/entrega1.txt"
+echo "Segunda entrega con correcciones" > "$tmp_dir/entrega2.txt"
 
 # Create project
 fecha_entrega="2025-12-01T23:59:00"
-proj_json=$(create_project "Proyecto Demo" "Descripción de prueba" "$student_id" "$prof_id" "$fecha_entrega" "entrega1.zip" "Primera entrega")
+proj_json=$(create_project "Proyecto Demo" "Descripción de prueba" "$student_id" "$prof_id" "$fecha_entrega" "$tmp_dir/entrega1.txt" "Primera entrega")
+echo "$proj_json"
 project_id=$(echo "$proj_json" | jq -r '.id')
 
-echo "\nCreated project id: $project_id"
+echo -e "\nCreated project id: $project_id"
 
-# Upload a new version
-upload_version "$project_id" "Segunda versión con correcciones"
+# Upload a new version as the student
+student_token=$(login "$STUDENT_EMAIL" "$PASSWORD")
+upload_version "$project_id" "Segunda versión con correcciones" "$tmp_dir/entrega2.txt" "$student_token"
 
 # Grade project
 grade_project "$project_id" "$prof_id" 4.5 "Buen trabajo"
 
 # Get grades
-echo "\nProject grades:"
+echo -e "\nProject grades:"
 curl -s "$API_URL/calificaciones/proyecto/$project_id" | jq .
 
 # Get report
 get_report "$student_id"
 
-echo "\nDone."
+echo -e "\nDone."
@@ -0,0 +1,76 @@
+"""Configuración común de las pruebas.
+
+La API se importa contra una base de datos SQLite temporal y un UPLOAD_DIR temporal,
+así que las pruebas no tocan `plataforma_proyectos.db` ni `uploads/`. Las variables se
+fijan antes de importar `app`, que las lee al cargarse.
+"""
+import os
+import tempfile
+import uuid
+from typing import List, NamedTuple
+
+_TMP = tempfile.mkdtemp(prefix="pruebas_api_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/pruebas.db?check_same_thread=false"
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "uploads")
+# Hash de contraseñas en el propio proceso: sin pool de procesos que arrancar
+os.environ["HASH_WORKERS"] = "0"
+# Una ruta que supera su presupuesto de sentencias SQL falla en vez de solo avisar
+os.environ["SQL_PRESUPUESTO_ESTRICTO"] = "1"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.models import Curso, CursoEstudiante, Estudiante, Profesor  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def session(client):
+    # `client` primero: el arranque de la app crea las tablas
+    with Session(engine, expire_on_commit=False) as s:
+        yield s
+
+
+def _marca() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+class Escenario(NamedTuple):
+    marca: str
+    profesor: Profesor
+    curso: Curso
+    estudiantes: List[Estudiante]
+
+
+@pytest.fixture
+def marca() -> str:
+    """Sufijo único para emails y nombres: todas las pruebas comparten la base de datos."""
+    return _marca()
+
+
+@pytest.fixture
+def profesor_y_curso(session):
+    """Fábrica: un profesor con un curso y `estudiantes` inscritos, ya confirmados."""
+    def crear(estudiantes: int = 0) -> Escenario:
+        marca = _marca()
+        profesor = Profesor(nombre="Profesor", apellido=marca, email=f"prof-{marca}@ejemplo.com")
+        alumnos = [Estudiante(nombre="Estudiante", apellido=str(i), email=f"est{i}-{marca}@ejemplo.com")
+                   for i in range(estudiantes)]
+        session.add(profesor)
+        session.add_all(alumnos)
+        session.flush()
+        curso = Curso(nombre=f"Curso {marca}", profesor_id=profesor.id)
+        session.add(curso)
+        session.flush()
+        session.add_all([CursoEstudiante(curso_id=curso.id, estudiante_id=e.id) for e in alumnos])
+        session.commit()
+        return Escenario(marca, profesor, curso, alumnos)
+    return crear
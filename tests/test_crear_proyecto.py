@@ -0,0 +1,18 @@
+"""Crear un proyecto con un archivo demasiado grande no deja el proyecto a medias."""
+from sqlmodel import select
+
+from app import uploads
+from app.models.models import Proyecto
+
+
+def test_archivo_demasiado_grande_no_crea_el_proyecto(client, session, profesor_y_curso, monkeypatch):
+    marca, profesor, curso, _ = profesor_y_curso()
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 16)
+
+    for ruta in ("/proyectos", "/asignaciones"):
+        titulo = f"{ruta} {marca}"
+        r = client.post(ruta, data={
+            "titulo": titulo, "descripcion": "d", "curso_id": curso.id, "profesor_id": profesor.id,
+        }, files={"file": ("grande.pdf", b"x" * 1024, "application/pdf")})
+        assert r.status_code == 413, r.text
+        assert session.exec(select(Proyecto).where(Proyecto.titulo == titulo)).first() is None
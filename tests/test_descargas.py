@@ -0,0 +1,52 @@
+"""Validadores HTTP de las descargas (app.descargas)."""
+import time
+
+import pytest
+
+
+@pytest.fixture
+def proyecto_id(client, profesor_y_curso):
+    marca, profesor, curso, _ = profesor_y_curso()
+    # Contenido propio de cada prueba: los objetos del almacén se comparten por contenido
+    r = client.post("/proyectos", data={
+        "titulo": marca, "descripcion": "d", "curso_id": curso.id, "profesor_id": profesor.id,
+    }, files={"file": ("a.txt", f"A-{marca}".encode(), "text/plain")})
+    assert r.status_code == 200, r.text
+    return r.json()["id"], marca
+
+
+def _subir(client, proyecto_id: int, contenido: bytes):
+    r = client.post(f"/proyectos/{proyecto_id}/versiones", data={"descripcion": "v"},
+                    files={"file": ("a.txt", contenido, "text/plain")})
+    assert r.status_code == 200, r.text
+
+
+def test_volver_a_subir_un_contenido_anterior_no_da_304(client, proyecto_id):
+    pid, marca = proyecto_id
+    _subir(client, pid, f"B-{marca}".encode())
+    r = client.get(f"/proyectos/{pid}/archivo")
+    assert r.content == f"B-{marca}".encode()
+    fecha_b = r.headers["Last-Modified"]
+
+    time.sleep(1.1)
+    # El contenido A ya está en el almacén: el objeto (y su fecha en disco) es el de la primera versión
+    _subir(client, pid, f"A-{marca}".encode())
+    r = client.get(f"/proyectos/{pid}/archivo", headers={"If-Modified-Since": fecha_b})
+    assert r.status_code == 200
+    assert r.content == f"A-{marca}".encode()
+    assert r.headers["Last-Modified"] != fecha_b
+
+
+@pytest.mark.parametrize("rango, estado", [
+    ("bytes=abc", 200),
+    ("bytes=5-2", 200),
+    ("bytes=-", 200),
+    ("bytes=1-2", 206),
+    ("bytes=-3", 206),
+    ("bytes=1000-", 416),
+    ("bytes=-0", 416),
+])
+def test_rangos(client, proyecto_id, rango, estado):
+    pid, _ = proyecto_id
+    r = client.get(f"/proyectos/{pid}/archivo", headers={"Range": rango})
+    assert r.status_code == estado
@@ -0,0 +1,35 @@
+"""GET /cursos/{id}/entregas hace el mismo número de consultas sea cual sea el tamaño del curso."""
+from app.models.models import Calificacion, Proyecto, ProyectoVersion
+
+
+def _crear_curso(session, profesor_y_curso, estudiantes: int, asignaciones: int) -> int:
+    """Curso con `estudiantes` inscritos, `asignaciones` proyectos, dos versiones y una nota por entrega."""
+    _, profesor, curso, alumnos = profesor_y_curso(estudiantes)
+    proyectos = [Proyecto(titulo=f"Tarea {j}", curso_id=curso.id, profesor_id=profesor.id)
+                 for j in range(asignaciones)]
+    session.add_all(proyectos)
+    session.flush()
+    for p in proyectos:
+        for e in alumnos:
+            versiones = [ProyectoVersion(proyecto_id=p.id, estudiante_id=e.id, numero_version=n,
+                                         es_version_actual=n == 2) for n in (1, 2)]
+            session.add_all(versiones)
+            session.flush()
+            session.add(Calificacion(proyecto_id=p.id, profesor_id=profesor.id, estudiante_id=e.id,
+                                     version_id=versiones[-1].id, puntaje=4.0))
+    session.commit()
+    return curso.id
+
+
+def test_consultas_constantes_al_crecer_el_curso(client, session, profesor_y_curso):
+    pequeno = _crear_curso(session, profesor_y_curso, estudiantes=2, asignaciones=1)
+    grande = _crear_curso(session, profesor_y_curso, estudiantes=25, asignaciones=4)
+
+    r_pequeno = client.get(f"/cursos/{pequeno}/entregas")
+    r_grande = client.get(f"/cursos/{grande}/entregas")
+
+    assert r_pequeno.status_code == 200 and r_grande.status_code == 200
+    entregas = [e for p in r_grande.json()["entregas"] for e in p["entregas_por_estudiante"]]
+    assert len(entregas) == 25 * 4
+    assert all(e["total_versiones"] == 2 and e["calificacion"]["puntaje"] == 4.0 for e in entregas)
+    assert r_grande.headers["X-DB-Queries"] == r_pequeno.headers["X-DB-Queries"]
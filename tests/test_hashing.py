@@ -0,0 +1,29 @@
+"""Un hash que expira sigue ocupando su hueco en la cola hasta que termina."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import hashing
+
+
+def test_timeout_no_libera_el_hueco_hasta_que_termina(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    monkeypatch.setattr(hashing, "HASH_TIMEOUT", 0.05)
+    monkeypatch.setattr(hashing, "_pendientes", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, "_obtener_pool", lambda: pool)
+    terminar = threading.Event()
+    try:
+        with pytest.raises(hashing.HashingSaturado, match="tardó demasiado"):
+            hashing._ejecutar("hash", terminar.wait)
+        # La primera tarea sigue en curso: la cola está llena
+        with pytest.raises(hashing.HashingSaturado, match="Demasiadas solicitudes"):
+            hashing._ejecutar("hash", str, "x")
+
+        terminar.set()
+        pool.submit(lambda: None).result()
+        assert hashing._ejecutar("hash", str, "x") == "x"
+    finally:
+        terminar.set()
+        pool.shutdown()
@@ -0,0 +1,21 @@
+"""Los listados solo se paginan si el cliente lo pide con `limit` o `after`."""
+
+
+def test_sin_limit_devuelve_la_lista_completa(client, profesor_y_curso):
+    curso_id = profesor_y_curso(120).curso.id
+    r = client.get(f"/cursos/{curso_id}/estudiantes")
+    assert r.status_code == 200
+    assert len(r.json()) == 120
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_con_limit_se_recorren_todas_las_paginas(client, profesor_y_curso):
+    curso_id = profesor_y_curso(120).curso.id
+    vistos, url = [], f"/cursos/{curso_id}/estudiantes?limit=50&total=true"
+    while url:
+        r = client.get(url)
+        assert r.status_code == 200 and r.headers["X-Total-Count"] == "120"
+        vistos += [e["estudiante_id"] for e in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        url = f"/cursos/{curso_id}/estudiantes?limit=50&total=true&after={cursor}" if cursor else None
+    assert len(vistos) == len(set(vistos)) == 120
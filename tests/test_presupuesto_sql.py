@@ -0,0 +1,72 @@
+"""Las rutas de escritura caben en su presupuesto de sentencias SQL.
+
+conftest activa `SQL_PRESUPUESTO_ESTRICTO`: una ruta que lo supera lanza
+`PresupuestoSQLExcedido` y la petición falla.
+"""
+import hashlib
+import uuid
+
+
+def _ok(r):
+    assert r.status_code < 400, f"{r.request.method} {r.request.url.path}: {r.status_code} {r.text[:300]}"
+    return r.json()
+
+
+def _registrar(client, email: str, rol: str) -> int:
+    return _ok(client.post("/auth/registro", data={
+        "email": email, "password": "pw", "nombre": "N", "apellido": "A", "rol": rol,
+    }))["id"]
+
+
+def _token(client, email: str) -> dict:
+    token = _ok(client.post("/auth/login", data={"email": email, "password": "pw"}))["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _archivo(nombre: str):
+    # Contenido nuevo en cada llamada: un contenido ya guardado ahorra sentencias
+    return {"file": (nombre, uuid.uuid4().bytes * 64, "application/pdf")}
+
+
+def test_rutas_de_escritura_en_modo_estricto(client, marca):
+    profesor = _registrar(client, f"prof-{marca}@ejemplo.com", "profesor")
+    estudiante = _registrar(client, f"est-{marca}@ejemplo.com", "estudiante")
+    otro = _registrar(client, f"otro-{marca}@ejemplo.com", "estudiante")
+    auth = _token(client, f"est-{marca}@ejemplo.com")
+
+    curso = _ok(client.post("/cursos", json={"nombre": f"Curso {marca}", "profesor_id": profesor}))["id"]
+    _ok(client.post(f"/cursos/{curso}/estudiantes", json={"curso_id": curso, "estudiante_id": estudiante}))
+    _ok(client.post(f"/cursos/{curso}/estudiantes/lote", json=[otro, f"est-{marca}@ejemplo.com"]))
+    _ok(client.post(f"/cursos/{curso}/tareas", data={"titulo": "Tarea"}, files=_archivo("tarea.pdf")))
+
+    datos = {"titulo": "P", "descripcion": "d", "profesor_id": profesor}
+    directo = _ok(client.post("/proyectos", data={**datos, "estudiante_id": estudiante},
+                              files=_archivo("p.pdf")))["id"]
+    _ok(client.post("/proyectos", data={**datos, "curso_id": curso}, files=_archivo("p.pdf")))
+    asignacion = _ok(client.post("/asignaciones", data={**datos, "curso_id": curso}, files=_archivo("a.pdf")))["id"]
+
+    _ok(client.post(f"/asignaciones/{asignacion}/entregas", data={"descripcion": "e"},
+                    files=_archivo("e.pdf"), headers=auth))
+    version = _ok(client.post(f"/proyectos/{directo}/versiones", data={"descripcion": "v"},
+                              files=_archivo("v.pdf"), headers=auth))
+    _ok(client.post(f"/proyectos/{asignacion}/versiones", data={"descripcion": "v"}, files=_archivo("v.pdf")))
+
+    contenido = uuid.uuid4().bytes * 64
+    subida = _ok(client.post(f"/proyectos/{asignacion}/subidas", headers=auth, json={
+        "nombre_archivo": "s.pdf", "tamano": len(contenido), "sha256": hashlib.sha256(contenido).hexdigest(),
+    }))["id"]
+    _ok(client.put(f"/subidas/{subida}?offset=0", content=contenido,
+                   headers={**auth, "Content-Type": "application/octet-stream"}))
+    _ok(client.post(f"/subidas/{subida}/finalizar", headers=auth))
+    cancelada = _ok(client.post(f"/proyectos/{asignacion}/subidas", headers=auth,
+                                json={"nombre_archivo": "c.pdf", "tamano": 10}))["id"]
+    _ok(client.delete(f"/subidas/{cancelada}", headers=auth))
+
+    for estudiante_id in (estudiante, None):
+        _ok(client.post("/calificaciones", json={
+            "proyecto_id": asignacion, "profesor_id": profesor, "estudiante_id": estudiante_id, "puntaje": 4.5,
+        }))
+    _ok(client.post("/calificaciones", json={
+        "proyecto_id": directo, "profesor_id": profesor, "estudiante_id": estudiante,
+        "version_id": version["id"], "puntaje": 3.5,
+    }))
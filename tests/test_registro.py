@@ -0,0 +1,30 @@
+"""El registro calcula el hash fuera del event loop: no bloquea otras peticiones."""
+import threading
+import time
+
+from app import hashing
+
+HASH_LENTO = 0.5
+
+
+def test_registro_no_bloquea_el_event_loop(client, marca, monkeypatch):
+    calcular_hash = hashing.calcular_hash
+
+    def lento(password):
+        time.sleep(HASH_LENTO)
+        return calcular_hash(password)
+
+    monkeypatch.setattr(hashing, "calcular_hash", lento)
+    respuestas = []
+    registro = threading.Thread(target=lambda: respuestas.append(client.post("/auth/registro", data={
+        "email": f"{marca}@ejemplo.com", "password": "pw", "nombre": "N", "apellido": "A",
+    })))
+    registro.start()
+    time.sleep(HASH_LENTO / 5)
+    inicio = time.perf_counter()
+    assert client.get("/").status_code == 200
+    espera = time.perf_counter() - inicio
+    registro.join()
+
+    assert respuestas[0].status_code == 200, respuestas[0].text
+    assert espera < HASH_LENTO / 2
@@ -0,0 +1,49 @@
+"""Numeración de versiones con subidas simultáneas (crud.siguiente_numero_version)."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.main import _registrar_version
+from app.models.models import Proyecto, ProyectoVersion
+
+HILOS = 6
+SUBIDAS = 10
+
+
+def _subir(proyecto_id: int, estudiante_id):
+    """Una versión por transacción; SQLite responde "database is locked" si la espera se alarga."""
+    for intento in range(50):
+        with Session(engine) as session:
+            try:
+                proyecto = session.get(Proyecto, proyecto_id)
+                _registrar_version(session, proyecto, estudiante_id, "concurrente", None, None)
+                session.commit()
+                return
+            except OperationalError:
+                session.rollback()
+                time.sleep(0.01 * (intento + 1))
+    raise RuntimeError("base de datos bloqueada")
+
+
+@pytest.mark.parametrize("con_estudiante", [True, False], ids=["estudiante", "sin_estudiante"])
+def test_numeros_unicos_y_sin_huecos(client, session, profesor_y_curso, con_estudiante):
+    _, profesor, curso, (estudiante,) = profesor_y_curso(1)
+    proyecto = Proyecto(titulo="Asignación", curso_id=curso.id, profesor_id=profesor.id)
+    session.add(proyecto)
+    session.commit()
+    estudiante_id = estudiante.id if con_estudiante else None
+
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        list(pool.map(lambda _: _subir(proyecto.id, estudiante_id), range(HILOS * SUBIDAS)))
+
+    filas = session.exec(
+        select(ProyectoVersion.numero_version, ProyectoVersion.es_version_actual)
+        .where(ProyectoVersion.proyecto_id == proyecto.id, ProyectoVersion.estudiante_id == estudiante_id)
+    ).all()
+    numeros = sorted(n for n, _ in filas)
+    assert numeros == list(range(1, HILOS * SUBIDAS + 1))
+    assert [n for n, actual in filas if actual] == [HILOS * SUBIDAS]